@@ -0,0 +1,62 @@
+"""
+Micro-benchmark of the subscriber lookup done on every emit.
+
+Compares EventDispatcher._collect_callbacks (immutable registry, per-class dispatch table)
+with the previous lookup (lock, name resolution and copy of the subscriber list).
+
+    python benchmarks/emit_benchmark.py
+"""
+import timeit
+from dataclasses import dataclass
+from threading import Lock
+
+from core.event.event_dispatcher import EventDispatcher
+
+SUBSCRIBERS = 3
+NUMBER = 1_000_000
+
+
+@dataclass
+class TickEvent:
+    motor_id: int
+
+
+class SyncDispatcher(EventDispatcher):
+    def emit_async(self, event):
+        self.emit(event)
+
+
+class LockedCopyLookup:
+    """The lookup before the copy-on-write registry."""
+
+    def __init__(self, event_name: str, callbacks: list):
+        self._subscribers = {event_name: list(callbacks)}
+        self._lock = Lock()
+
+    def collect(self, event):
+        with self._lock:
+            event_name = EventDispatcher.resolve_event_name(type(event))
+            callbacks = list(self._subscribers.get(event_name, []))
+        return callbacks
+
+
+def main():
+    callbacks = [lambda e: None for _ in range(SUBSCRIBERS)]
+    dispatcher = SyncDispatcher()
+    for cb in callbacks:
+        dispatcher.subscribe(TickEvent, cb)
+    previous = LockedCopyLookup(TickEvent.__name__, callbacks)
+    event = TickEvent(motor_id=1)
+
+    results = {
+        "locked copy": min(timeit.repeat(lambda: previous.collect(event), number=NUMBER, repeat=5)),
+        "copy-on-write": min(timeit.repeat(lambda: dispatcher._collect_callbacks(event), number=NUMBER, repeat=5)),
+        "copy-on-write (subscriptions)": min(timeit.repeat(lambda: dispatcher._collect_subscriptions(event), number=NUMBER, repeat=5)),
+    }
+    baseline = results["locked copy"]
+    for name, seconds in results.items():
+        print(f"{name:32s} {seconds / NUMBER * 1e9:8.1f} ns/emit  x{baseline / seconds:.2f}")
+
+
+if __name__ == "__main__":
+    main()
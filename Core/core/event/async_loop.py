@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import traceback
+from concurrent.futures import Future
+from typing import Any, Awaitable, Optional
+
+
+class AsyncLoopThread:
+    """
+    Persistent asyncio event loop running in a daemon thread, started on first use.
+
+    Coroutines of async subscribers are scheduled on it instead of creating and closing an
+    event loop per call (asyncio.run). Failures are reported when the coroutine finishes.
+    Under eventlet.monkey_patch() the thread is a green thread and the loop's selector yields
+    to the hub, so it runs alongside the server's green threads (see tests/test_async_loop.py).
+    """
+
+    def __init__(self, name: str = "event-loop"):
+        self.__name = name
+        self.__lock = threading.Lock()
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self.__lock:
+            if self.__loop is None or self.__loop.is_closed():
+                self.__loop = asyncio.new_event_loop()
+                self.__thread = threading.Thread(target=self.__run, args=(self.__loop,), name=self.__name, daemon=True)
+                self.__thread.start()
+            return self.__loop
+
+    def in_loop_thread(self) -> bool:
+        return self.__thread is not None and threading.current_thread() is self.__thread
+
+    def submit(self, awaitable: Awaitable[Any], label: Any = None) -> Future:
+        """Schedule awaitable on the loop, label names it in error reports."""
+        future = asyncio.run_coroutine_threadsafe(self.__await(awaitable), self.loop)
+        future.add_done_callback(lambda f: self.__report(f, label if label is not None else awaitable))
+        return future
+
+    def stop(self) -> None:
+        with self.__lock:
+            loop, thread = self.__loop, self.__thread
+            self.__loop = None
+            self.__thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    @staticmethod
+    async def __await(awaitable: Awaitable[Any]) -> Any:
+        return await awaitable
+
+    @staticmethod
+    def __run(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    @staticmethod
+    def __report(future: Future, label: Any) -> None:
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            print(f"[dispatcher.async] subscriber error in {label}: {error}")
+            traceback.print_exception(type(error), error, error.__traceback__)
@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Any, Dict, Hashable, List, Optional
+
+
+class EBackpressure(str, Enum):
+    BLOCK = "block"              # the emitter waits for room (a worker never waits for itself)
+    DROP_OLDEST = "drop_oldest"  # the oldest pending event of the type is discarded
+    COALESCE = "coalesce"        # a pending event of the type with the same ordering key is replaced, else BLOCK
+
+
+@dataclass(eq=False)
+class _PendingEvent:
+    seq: int
+    event_name: str
+    order_key: Hashable
+    event: Any
+    callbacks: List[Callable[[Any], None]]
+    coalesce_key: Optional[Hashable] = None
+    enqueued_at: float = 0.0  # time.perf_counter() of the (last) submit
+
+
+class DispatchPool:
+    """
+    Fixed set of workers running event callbacks, instead of one background task per callback.
+
+    Events are queued in lanes chosen from their ordering key, one worker per lane, so events
+    with the same key (e.g. of one motor) are handled one after the other in emission order.
+    Each event type may have up to `capacity` pending events; past that, its backpressure
+    policy applies. An event submitted with a coalesce key replaces the pending one with the
+    same key, whatever the policy: the pending one is dropped and the new one queued at the tail
+    of the lane, so it is never delivered before events emitted ahead of it.
+
+    A worker emitting into its own lane never waits: nothing else would drain it. Into another
+    lane it waits like any emitter, unless no free worker holds events of the type.
+
+    run_callback gets the enqueue time (enqueued_at=) to measure the time spent queued.
+    """
+
+    WORKERS = 4
+    CAPACITY = 256  # pending events per event type
+
+    def __init__(self,
+                 start_task: Callable[..., Any],
+                 run_callback: Callable[..., None],
+                 workers: int = WORKERS,
+                 capacity: int = CAPACITY,
+                 backpressure: EBackpressure = EBackpressure.BLOCK):
+        if workers <= 0 or capacity <= 0:
+            raise ValueError(f"workers and capacity must be > 0, got {workers} and {capacity}")
+        self.__start_task = start_task
+        self.__run_callback = run_callback
+        self.__capacity = capacity
+        self.__default_policy = backpressure
+        self.__policies: dict[str, EBackpressure] = {}
+
+        self.__lock = threading.Lock()
+        self.__space = threading.Condition(self.__lock)
+        self.__lanes: list[deque[_PendingEvent]] = [deque() for _ in range(workers)]
+        self.__ready = [threading.Condition(self.__lock) for _ in range(workers)]
+        self.__pending_by_name: dict[str, int] = {}
+        self.__dropped_by_name: dict[str, int] = {}
+        self.__coalesced_by_name: dict[str, int] = {}
+        self.__worker_lanes: dict[int, int] = {}  # thread ident -> lane of the worker
+        self.__waiting_lanes: set[int] = set()    # lanes whose worker waits for room in submit()
+        self.__started = False
+        self.__seq = 0
+
+    def set_backpressure(self, event_name: str, policy: EBackpressure) -> None:
+        with self.__lock:
+            self.__policies[event_name] = policy
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, dropped and coalesced events per event type, depth per lane."""
+        with self.__lock:
+            return {
+                "workers": len(self.__lanes),
+                "capacity": self.__capacity,
+                "lanes": [len(lane) for lane in self.__lanes],
+                "pending": {name: count for name, count in self.__pending_by_name.items() if count},
+                "dropped": dict(self.__dropped_by_name),
+                "coalesced": dict(self.__coalesced_by_name),
+            }
+
+    def submit(self,
+               event_name: str,
+               order_key: Hashable,
+               event: Any,
+               callbacks: List[Callable[[Any], None]],
+               coalesce_key: Optional[Hashable] = None) -> None:
+        index = hash(order_key) % len(self.__lanes)
+        now = time.perf_counter()
+        with self.__lock:
+            if not self.__started:
+                self.__started = True
+                for i in range(len(self.__lanes)):
+                    self.__start_task(self.__work, i)
+
+            policy = self.__policies.get(event_name, self.__default_policy)
+            if coalesce_key is not None:
+                for pending in self.__lanes[index]:
+                    if pending.coalesce_key == coalesce_key:
+                        self.__coalesce(index, pending, event, callbacks, now)
+                        return
+            elif policy == EBackpressure.COALESCE:
+                for pending in self.__lanes[index]:
+                    if pending.event_name == event_name and pending.order_key == order_key and pending.coalesce_key is None:
+                        self.__coalesce(index, pending, event, callbacks, now)
+                        return
+
+            own_lane = self.__worker_lanes.get(threading.get_ident())
+            while self.__pending_by_name.get(event_name, 0) >= self.__capacity:
+                if policy == EBackpressure.DROP_OLDEST:
+                    if not self.__drop_oldest(event_name):
+                        break
+                    continue
+                # BLOCK, or COALESCE with nothing to replace: never drop an unrelated event
+                if own_lane is not None:
+                    # A worker waiting for itself, or for workers all waiting, would never wake up
+                    if own_lane == index or not self.__can_drain(event_name, own_lane):
+                        break
+                    self.__waiting_lanes.add(own_lane)
+                    self.__space.notify_all()  # other waiting workers check again
+                try:
+                    self.__space.wait()
+                finally:
+                    self.__waiting_lanes.discard(own_lane)
+
+            self.__seq += 1
+            self.__lanes[index].append(_PendingEvent(self.__seq, event_name, order_key, event, callbacks, coalesce_key, now))
+            self.__pending_by_name[event_name] = self.__pending_by_name.get(event_name, 0) + 1
+            self.__ready[index].notify()
+
+    def __coalesce(self, index: int, pending: _PendingEvent, event: Any, callbacks: List[Callable[[Any], None]], now: float) -> None:
+        # Replacing in place would deliver the new event ahead of the ones queued after the old one
+        lane = self.__lanes[index]
+        lane.remove(pending)
+        self.__seq += 1
+        # Latency is measured for the event delivered, not the one it replaced
+        lane.append(_PendingEvent(self.__seq, pending.event_name, pending.order_key, event, callbacks, pending.coalesce_key, now))
+        self.__coalesced_by_name[pending.event_name] = self.__coalesced_by_name.get(pending.event_name, 0) + 1
+
+    def __can_drain(self, event_name: str, own_lane: int) -> bool:
+        """Some other worker, not waiting itself, has pending events of the type to run."""
+        return any(i != own_lane and i not in self.__waiting_lanes and any(p.event_name == event_name for p in lane)
+                   for i, lane in enumerate(self.__lanes))
+
+    def __drop_oldest(self, event_name: str) -> bool:
+        oldest = None
+        for lane in self.__lanes:
+            # Lanes are in emission order, the first event of the type is the oldest of the lane
+            pending = next((p for p in lane if p.event_name == event_name), None)
+            if pending is not None and (oldest is None or pending.seq < oldest[1].seq):
+                oldest = (lane, pending)
+        if oldest is None:
+            return False
+        oldest[0].remove(oldest[1])
+        self.__pending_by_name[event_name] -= 1
+        self.__dropped_by_name[event_name] = self.__dropped_by_name.get(event_name, 0) + 1
+        print(f"[dispatcher] queue of {event_name} full, oldest event dropped")
+        return True
+
+    def __work(self, index: int) -> None:
+        lane = self.__lanes[index]
+        with self.__lock:
+            self.__worker_lanes[threading.get_ident()] = index
+        while True:
+            with self.__lock:
+                while not lane:
+                    self.__ready[index].wait()
+                pending = lane.popleft()
+                self.__pending_by_name[pending.event_name] -= 1
+                self.__space.notify_all()
+
+            for cb in pending.callbacks:
+                self.__run_callback(cb, pending.event, enqueued_at=pending.enqueued_at)
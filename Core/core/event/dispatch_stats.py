@@ -0,0 +1,148 @@
+import bisect
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+
+class LatencyHistogram:
+    """Durations in fixed buckets (upper bounds in ms), enough for percentiles without keeping samples."""
+
+    BOUNDS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float("inf"))
+
+    def __init__(self):
+        self.__counts = [0] * len(self.BOUNDS_MS)
+        self.__count = 0
+        self.__total_s = 0.0
+        self.__max_s = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.__counts[bisect.bisect_left(self.BOUNDS_MS, seconds * 1000)] += 1
+        self.__count += 1
+        self.__total_s += seconds
+        self.__max_s = max(self.__max_s, seconds)
+
+    def percentile_ms(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of the samples."""
+        if self.__count == 0:
+            return 0.0
+        rank = fraction * self.__count
+        seen = 0
+        for bound, count in zip(self.BOUNDS_MS, self.__counts):
+            seen += count
+            if seen >= rank:
+                return bound if bound != float("inf") else self.__max_s * 1000
+        return self.__max_s * 1000
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.__count,
+            "avg_ms": self.__total_s / self.__count * 1000 if self.__count else 0.0,
+            "max_ms": self.__max_s * 1000,
+            "p50_ms": self.percentile_ms(0.5),
+            "p95_ms": self.percentile_ms(0.95),
+            "p99_ms": self.percentile_ms(0.99),
+            "buckets": {("inf" if bound == float("inf") else str(bound)): count
+                        for bound, count in zip(self.BOUNDS_MS, self.__counts) if count},
+        }
+
+
+@dataclass
+class _EventTypeStats:
+    emitted: int = 0
+    delivered: int = 0  # callback calls
+    errors: int = 0
+    queue_latency: LatencyHistogram = field(default_factory=LatencyHistogram)  # emit_async to callback start
+    callback_duration: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+
+@dataclass
+class _SubscriberStats:
+    event_name: str
+    calls: int = 0
+    errors: int = 0
+    slow_calls: int = 0
+    duration: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+
+class DispatchStats:
+    """
+    Counters and latency histograms of a dispatcher, per event type and per subscriber.
+    A callback running longer than slow_callback_s flags its subscriber (reported once).
+    """
+
+    SLOW_CALLBACK_S = 0.05
+
+    def __init__(self, slow_callback_s: float = SLOW_CALLBACK_S):
+        self.__lock = threading.Lock()
+        self.__slow_callback_s = slow_callback_s
+        self.__by_event: dict[str, _EventTypeStats] = {}
+        self.__by_subscriber: dict[tuple[str, Callable[[Any], Any]], _SubscriberStats] = {}
+
+    def record_emit(self, event_name: str) -> None:
+        with self.__lock:
+            self.__event(event_name).emitted += 1
+
+    def record_start(self, event_name: str, queued_s: float) -> None:
+        with self.__lock:
+            self.__event(event_name).queue_latency.add(queued_s)
+
+    def record_callback(self, event_name: str, callback: Callable[[Any], Any], duration_s: float, failed: bool) -> None:
+        slow = duration_s > self.__slow_callback_s
+        with self.__lock:
+            stats = self.__event(event_name)
+            stats.delivered += 1
+            stats.callback_duration.add(duration_s)
+            subscriber = self.__by_subscriber.get((event_name, callback))
+            if subscriber is None:
+                subscriber = self.__by_subscriber[(event_name, callback)] = _SubscriberStats(event_name)
+            subscriber.calls += 1
+            subscriber.duration.add(duration_s)
+            if failed:
+                stats.errors += 1
+                subscriber.errors += 1
+            if slow:
+                subscriber.slow_calls += 1
+                first_slow = subscriber.slow_calls == 1
+        if slow and first_slow:
+            print(f"[dispatcher] slow subscriber {self.__name(callback)} on {event_name}: {duration_s * 1000:.1f} ms")
+
+    def snapshot(self) -> dict[str, Any]:
+        with self.__lock:
+            events = {
+                name: {
+                    "emitted": stats.emitted,
+                    "delivered": stats.delivered,
+                    "errors": stats.errors,
+                    "queue_latency": stats.queue_latency.to_dict(),
+                    "callback_duration": stats.callback_duration.to_dict(),
+                }
+                for name, stats in self.__by_event.items()
+            }
+            subscribers = [
+                {
+                    "subscriber": self.__name(callback),
+                    "event": stats.event_name,
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "slow_calls": stats.slow_calls,
+                    "duration": stats.duration.to_dict(),
+                }
+                for (_, callback), stats in self.__by_subscriber.items()
+            ]
+        subscribers.sort(key=lambda s: s["duration"]["max_ms"], reverse=True)
+        return {
+            "slow_callback_ms": self.__slow_callback_s * 1000,
+            "events": events,
+            "subscribers": subscribers,
+            "slow_subscribers": [s for s in subscribers if s["slow_calls"] > 0],
+        }
+
+    def __event(self, event_name: str) -> _EventTypeStats:
+        stats = self.__by_event.get(event_name)
+        if stats is None:
+            stats = self.__by_event[event_name] = _EventTypeStats()
+        return stats
+
+    @staticmethod
+    def __name(callback: Callable[[Any], Any]) -> str:
+        return getattr(callback, "__qualname__", None) or repr(callback)
@@ -1,15 +1,63 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import wait as wait_futures
+from dataclasses import dataclass
 from threading import Lock
-from typing import Callable, Dict, List, Any, TypeVar, Type, Union
-from core.event.base_event import BaseEvent
+from typing import Callable, Dict, Any, TypeVar, Type, Union, Optional, Hashable, Tuple
+from core.event.async_loop import AsyncLoopThread
+from core.event.dispatch_stats import DispatchStats
 import inspect
+import time
 
 E = TypeVar("E")
 
+# Events of a subscription with equal keys are interchangeable: a newer one may replace a queued one
+CoalesceKey = Callable[[Any], Hashable]
+
+@dataclass(frozen=True)
+class Subscription:
+    callback: Callable[[Any], None]
+    coalesce_key: Optional[CoalesceKey] = None
+
+class _Registry:
+    """
+    Immutable snapshot of the subscriptions, replaced as a whole on (un)subscribe. by_class
+    caches the subscriptions of an event class and its base classes, filled on first emit;
+    an emitter still holding a replaced snapshot only fills a cache nobody reads anymore.
+    """
+    __slots__ = ("by_name", "by_class")
+
+    def __init__(self, by_name: Dict[str, Tuple[Subscription, ...]]):
+        self.by_name = by_name
+        self.by_class: Dict[type, Tuple[Subscription, ...]] = {}
+
+    def subscriptions(self, event_class: type) -> Tuple[Subscription, ...]:
+        subscriptions = self.by_class.get(event_class)
+        if subscriptions is None:
+            found: Dict[Callable[[Any], None], Subscription] = {}
+            for cls in event_class.__mro__:
+                for subscription in self.by_name.get(cls.__name__, ()):
+                    # Subscribed to a class and one of its bases: called once, most specific first
+                    found.setdefault(subscription.callback, subscription)
+            subscriptions = tuple(found.values())
+            self.by_class[event_class] = subscriptions
+        return subscriptions
+
 class EventDispatcher(ABC):
-    def __init__(self):
-        self._subscribers: Dict[str, List[Callable[[BaseEvent], None]]] = {}
+    """
+    Subscribers of an event class also get the events of its subclasses (e.g. TaskEvent for
+    TaskHomeFinishedEvent). Emitting reads an immutable registry without locking, the lock
+    only serializes (un)subscribe.
+
+    Async subscribers (callbacks returning an awaitable) run on one persistent event loop
+    thread. emit() waits for them, emit_async() implementations only schedule them.
+
+    Every callback run is timed per event type and subscriber, see snapshot_stats().
+    """
+    def __init__(self, slow_callback_s: float = DispatchStats.SLOW_CALLBACK_S):
+        self._registry = _Registry({})
         self._lock = Lock()
+        self._async_loop = AsyncLoopThread()
+        self._stats = DispatchStats(slow_callback_s)
 
     @staticmethod
     def resolve_event_name(event: Union[Type[E] | str]) -> str:
@@ -17,49 +65,70 @@ class EventDispatcher(ABC):
             return event
         return event.__name__
 
-    def subscribe(self, event: Union[Type[E] | str], callback: Callable[[E], None]):
+    def subscribe(self, event: Union[Type[E] | str], callback: Callable[[E], None], coalesce_key: Optional[CoalesceKey] = None):
+        """
+        coalesce_key: for subscribers only interested in the latest value, e.g. lambda e: e.motor_id.
+        While the callback is busy, a newer event with the same key replaces the queued one
+        (emit_async only, emit() always delivers every event).
+        """
         event_name = EventDispatcher.resolve_event_name(event)
         with self._lock:
-            self._subscribers.setdefault(event_name, []).append(callback)
+            by_name = dict(self._registry.by_name)
+            by_name[event_name] = by_name.get(event_name, ()) + (Subscription(callback, coalesce_key),)
+            self._registry = _Registry(by_name)
 
     def unsubscribe(self, event: Union[Type[E] | str], callback: Callable[[E], None]):
         event_name = EventDispatcher.resolve_event_name(event)
         with self._lock:
-            if event_name in self._subscribers and callback in self._subscribers[event_name]:
-                self._subscribers[event_name].remove(callback)
-            # else:
-            #     print(f"[dispatcher.unsubscribe] no such subscriber: {callback} for event: {event_name}")
+            subscriptions = self._registry.by_name.get(event_name, ())
+            index = next((i for i, s in enumerate(subscriptions) if s.callback == callback), None)
+            if index is None:
+                # print(f"[dispatcher.unsubscribe] no such subscriber: {callback} for event: {event_name}")
+                return
+            by_name = dict(self._registry.by_name)
+            by_name[event_name] = subscriptions[:index] + subscriptions[index + 1:]
+            self._registry = _Registry(by_name)
+
+    def _collect_subscriptions(self, event: E) -> Tuple[Subscription, ...]:
+        return self._registry.subscriptions(type(event))
 
     def _collect_callbacks(self, event: E):
-        with self._lock:
-            event_name = EventDispatcher.resolve_event_name(type(event))
-            callbacks = list(self._subscribers.get(event_name, []))
-            # if not callbacks:
-            #     callbacks = list(self._subscribers.get(event.key, []))
-        return callbacks
+        return [subscription.callback for subscription in self._registry.subscriptions(type(event))]
+
+    def snapshot_stats(self) -> Dict[str, Any]:
+        """Counts and latencies (ms) per event type, per subscriber and the slow subscribers."""
+        return self._stats.snapshot()
 
     def emit(self, event: E):
         callbacks = self._collect_callbacks(event)
+        self._stats.record_emit(EventDispatcher.resolve_event_name(type(event)))
 
         for cb in callbacks:
-            EventDispatcher._run_cb_safely(cb, event)
+            self._run_cb_safely(cb, event, wait=True)
 
     @abstractmethod
     def emit_async(self, event: E):
         pass
 
-    @staticmethod
-    def _run_cb_safely(cb: Callable[[Any], Any], event: Any):
+    def _run_cb_safely(self, cb: Callable[[Any], Any], event: Any, wait: bool = False, enqueued_at: Optional[float] = None):
+        """enqueued_at: time.perf_counter() of emit_async, to measure the time spent queued."""
+        event_name = EventDispatcher.resolve_event_name(type(event))
+        started_at = time.perf_counter()
+        if enqueued_at is not None:
+            self._stats.record_start(event_name, started_at - enqueued_at)
         try:
-            # In eventlet mode, prefer sync callbacks.
-            if inspect.iscoroutinefunction(cb):
-                # Strongly recommended to avoid async defs in eventlet mode,
-                # but if present, run to completion in a temporary loop:
-                import asyncio
-                asyncio.run(cb(event))
-            else:
-                cb(event)
+            result = cb(event)
+            if inspect.isawaitable(result):
+                # Scheduled on the shared loop, errors are reported when the coroutine ends
+                future = self._async_loop.submit(result, label=cb)
+                future.add_done_callback(lambda f: self._stats.record_callback(
+                    event_name, cb, time.perf_counter() - started_at, f.cancelled() or f.exception() is not None))
+                # Waiting from the loop thread itself would never end
+                if wait and not self._async_loop.in_loop_thread():
+                    wait_futures([future])
+                return
         except Exception as e:
             print(f"[dispatcher.emit_async] subscriber error in {cb}: {e}")
-
-
+            self._stats.record_callback(event_name, cb, time.perf_counter() - started_at, True)
+            return
+        self._stats.record_callback(event_name, cb, time.perf_counter() - started_at, False)
@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+CORE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter: monkey_patch() cannot be undone in the test process
+MONKEY_PATCHED = textwrap.dedent("""
+    import eventlet
+    eventlet.monkey_patch()
+
+    import asyncio
+    import time
+
+    from core.event.dispatch_pool import DispatchPool
+    from core.event.event_dispatcher import EventDispatcher
+
+
+    class GreenDispatcher(EventDispatcher):
+        def __init__(self):
+            super().__init__()
+            self.pool = DispatchPool(start_task=eventlet.spawn, run_callback=self._run_cb_safely)
+
+        def emit_async(self, event):
+            callbacks = self._collect_callbacks(event)
+            if callbacks:
+                self.pool.submit(type(event).__name__, type(event).__name__, event, callbacks)
+
+
+    class Ping:
+        def __init__(self, value):
+            self.value = value
+
+
+    received = []
+    ticks = []
+
+    async def on_ping(event):
+        await asyncio.sleep(0.05)
+        received.append(event.value)
+
+    def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            eventlet.sleep(0.005)
+
+    dispatcher = GreenDispatcher()
+    dispatcher.subscribe(Ping, on_ping)
+
+    # emit() waits for the coroutine while other green threads keep running
+    eventlet.spawn(ticker)
+    dispatcher.emit(Ping(1))
+    assert received == [1], received
+    assert len(ticks) == 5, ticks
+
+    # emit_async() from a pool worker green thread
+    for value in (2, 3):
+        dispatcher.emit_async(Ping(value))
+    deadline = time.monotonic() + 2
+    while len(received) < 3 and time.monotonic() < deadline:
+        eventlet.sleep(0.01)
+    assert sorted(received) == [1, 2, 3], received
+
+    dispatcher._async_loop.stop()
+    print("ok")
+""")
+
+
+def test_async_subscribers_run_under_eventlet_monkey_patch():
+    pytest.importorskip("eventlet")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [CORE_DIR, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run([sys.executable, "-W", "ignore", "-c", MONKEY_PATCHED],
+                            env=env, capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().endswith("ok")
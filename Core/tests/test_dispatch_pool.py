@@ -0,0 +1,99 @@
+import threading
+
+from core.event.dispatch_pool import DispatchPool, EBackpressure
+
+
+def start_thread(fn, *args):
+    threading.Thread(target=fn, args=args, daemon=True).start()
+
+
+def make_pool(backpressure: EBackpressure = EBackpressure.BLOCK, workers: int = 1, capacity: int = DispatchPool.CAPACITY,
+              order_key: int = 1):
+    delivered: list[str] = []
+    release = threading.Event()
+    done = threading.Condition()
+
+    def run_callback(cb, event, enqueued_at=None):
+        cb(event)
+        with done:
+            delivered.append(event)
+            done.notify_all()
+
+    def wait_for(count: int) -> list[str]:
+        with done:
+            assert done.wait_for(lambda: len(delivered) >= count, timeout=2)
+        return delivered
+
+    pool = DispatchPool(start_thread, run_callback, workers=workers, capacity=capacity, backpressure=backpressure)
+    # Hold the worker of the lane on a first event so the next ones stay queued
+    pool.submit("Busy", order_key, "busy", [lambda e: release.wait(2)])
+    return pool, release, wait_for
+
+
+def test_coalesced_event_is_not_delivered_before_events_queued_after_it():
+    pool, release, wait_for = make_pool()
+    pool.submit("Position", 1, "position-1", [lambda e: None], coalesce_key=("position", 1))
+    pool.submit("Status", 1, "status", [lambda e: None])
+    pool.submit("Position", 1, "position-2", [lambda e: None], coalesce_key=("position", 1))
+    release.set()
+
+    assert wait_for(3) == ["busy", "status", "position-2"]
+    assert pool.stats()["coalesced"] == {"Position": 1}
+
+
+def test_coalesce_policy_keeps_emission_order():
+    pool, release, wait_for = make_pool()
+    pool.set_backpressure("Position", EBackpressure.COALESCE)
+    pool.submit("Position", 1, "position-1", [lambda e: None])
+    pool.submit("Status", 1, "status", [lambda e: None])
+    pool.submit("Position", 1, "position-2", [lambda e: None])
+    release.set()
+
+    assert wait_for(3) == ["busy", "status", "position-2"]
+
+
+def test_coalesce_policy_waits_instead_of_dropping_other_keys():
+    pool, release, wait_for = make_pool(capacity=2)
+    pool.set_backpressure("Position", EBackpressure.COALESCE)
+    pool.submit("Position", 1, "position-a", [lambda e: None], coalesce_key="a")
+    pool.submit("Position", 1, "position-b", [lambda e: None], coalesce_key="b")
+    # The type is full and nothing has key c: the emitter waits for room
+    emitter = threading.Thread(target=lambda: pool.submit("Position", 1, "position-c", [lambda e: None], coalesce_key="c"))
+    emitter.start()
+    emitter.join(timeout=0.1)
+    assert emitter.is_alive()
+
+    release.set()
+    emitter.join(timeout=2)
+    assert wait_for(4) == ["busy", "position-a", "position-b", "position-c"]
+    assert pool.stats()["dropped"] == {}
+
+
+def test_worker_emitting_into_its_own_full_lane_does_not_wait():
+    pool, release, wait_for = make_pool(capacity=1)
+    release.set()
+
+    def reemit(event):
+        for value in ("echo-1", "echo-2"):
+            pool.submit("Echo", 1, value, [lambda e: None])
+
+    pool.submit("Start", 1, "start", [reemit])
+    assert wait_for(4) == ["busy", "start", "echo-1", "echo-2"]
+
+
+def test_worker_emitting_into_another_full_lane_waits_for_room():
+    # Order keys 0 and 1 are in lanes 0 and 1
+    pool, release, wait_for = make_pool(workers=2, capacity=1, order_key=1)
+    pool.submit("Echo", 1, "queued", [lambda e: None])
+    submitted = threading.Event()
+
+    def reemit(event):
+        pool.submit("Echo", 1, "echo", [lambda e: None])
+        submitted.set()
+
+    pool.submit("Start", 0, "start", [reemit])
+    assert not submitted.wait(0.1)
+
+    release.set()
+    assert submitted.wait(2)
+    assert wait_for(4)[-1] == "echo"
@@ -0,0 +1,38 @@
+from dataclasses import dataclass, field
+from typing import Any
+
+from core.serializable import Serializable
+
+
+@dataclass
+class PigpioPoolStats(Serializable):
+    max_connections: int
+    connections: int                # open pigpiod sockets, shared bulk connection included
+    owners: list[str] = field(default_factory=list)  # holders of a dedicated connection
+    fallbacks: int = 0              # dedicated requests served by the shared connection (pool full)
+    reconnects: int = 0
+    bulk_calls: int = 0             # reads made through the shared bulk connection
+    bulk_busy_s: float = 0.0        # time spent in those reads
+    uptime_s: float = 0.0
+
+    @property
+    def utilization(self) -> float:
+        return self.connections / self.max_connections if self.max_connections else 0.0
+
+    @property
+    def bulk_utilization(self) -> float:
+        return self.bulk_busy_s / self.uptime_s if self.uptime_s > 0 else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "max_connections": self.max_connections,
+            "connections": self.connections,
+            "owners": self.owners,
+            "fallbacks": self.fallbacks,
+            "reconnects": self.reconnects,
+            "bulk_calls": self.bulk_calls,
+            "bulk_busy_s": self.bulk_busy_s,
+            "uptime_s": self.uptime_s,
+            "utilization": self.utilization,
+            "bulk_utilization": self.bulk_utilization,
+        }
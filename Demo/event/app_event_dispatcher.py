@@ -1,18 +1,60 @@
+from typing import Any, Dict, Hashable, Type, Union
+
 from flask_socketio import SocketIO
 
+from core.event.dispatch_pool import DispatchPool, EBackpressure
+from core.event.dispatch_stats import DispatchStats
 from core.event.event_dispatcher import EventDispatcher, E
-import traceback
 
 
 class AppEventDispatcher(EventDispatcher):
-    def __init__(self, socketio: SocketIO):
-        super().__init__()
+    def __init__(self,
+                 socketio: SocketIO,
+                 workers: int = DispatchPool.WORKERS,
+                 capacity: int = DispatchPool.CAPACITY,
+                 backpressure: EBackpressure = EBackpressure.BLOCK,
+                 slow_callback_s: float = DispatchStats.SLOW_CALLBACK_S):
+        super().__init__(slow_callback_s)
         self.__socketio = socketio
+        # Callbacks run on a fixed set of background tasks, not one task per callback
+        self.__pool = DispatchPool(start_task=socketio.start_background_task,
+                                   run_callback=self._run_cb_safely,
+                                   workers=workers,
+                                   capacity=capacity,
+                                   backpressure=backpressure)
+
+    def set_backpressure(self, event: Union[Type[E] | str], policy: EBackpressure):
+        self.__pool.set_backpressure(EventDispatcher.resolve_event_name(event), policy)
+
+    def snapshot_stats(self) -> Dict[str, Any]:
+        snapshot = super().snapshot_stats()
+        snapshot["queues"] = self.__pool.stats()
+        return snapshot
 
     def emit_async(self, event: E):
-        callbacks = self._collect_callbacks(event)
-        # print("Emitting event: ", "".join(traceback.format_stack()))
-        for cb in callbacks:
-            self.__socketio.start_background_task(self._run_cb_safely, cb, event)
+        event_name = EventDispatcher.resolve_event_name(type(event))
+        self._stats.record_emit(event_name)
+        subscriptions = self._collect_subscriptions(event)
+        if not subscriptions:
+            return
+        order_key = self._order_key(event, event_name)
 
+        plain_callbacks = []
+        coalesced = []
+        for subscription in subscriptions:
+            cb = subscription.callback
+            if subscription.coalesce_key is None:
+                plain_callbacks.append(cb)
+            else:
+                coalesced.append((cb, (event_name, cb, subscription.coalesce_key(event))))
+        if plain_callbacks:
+            self.__pool.submit(event_name, order_key, event, plain_callbacks)
+        for cb, key in coalesced:
+            # Queued alone, a newer event of the same key replaces it while the subscriber is busy
+            self.__pool.submit(event_name, order_key, event, [cb], coalesce_key=key)
 
+    @staticmethod
+    def _order_key(event: E, event_name: str) -> Hashable:
+        # Events of a motor are handled in emission order whatever their type, others per type
+        motor_id = getattr(event, "motor_id", None)
+        return ("motor", motor_id) if motor_id is not None else event_name
@@ -14,6 +14,7 @@ from services.config.config_service import ConfigService
 from error.app_warning import AppWarning
 from db.dao.config_dao import ConfigDao
 from web.handlers.config_handler import ConfigHandler
+from web.handlers.diagnostics_handler import DiagnosticsHandler
 from services.controller.controller_service import ControllerService
 from event.app_event_dispatcher import AppEventDispatcher
 from web.handlers.motor_handler import MotorHandler
@@ -71,7 +72,8 @@ container.register_factory(
 # Register Services
 # Register PigpioService
 container.register_factory(PigpioProtocol, lambda: PigpioService(dispatcher=dispatcher,
-                                                                 socketio=socketio))
+                                                                 socketio=socketio,
+                                                                 count_steps=flask_app.config["COUNT_STEPS"]))
 
 # Register ControllerService
 container.register_factory(
@@ -79,7 +81,8 @@ container.register_factory(
     lambda: ControllerService(dispatcher=dispatcher,
                               socketio=socketio,
                               pigpio=container.resolve_singleton(PigpioProtocol),
-                              motor_dao=motor_dao)
+                              motor_dao=motor_dao,
+                              thread_manager=thread_manager)
 )
 
 # Register PinService
@@ -97,7 +100,8 @@ container.register_factory(
                          socketio=socketio,
                          pigpio=container.resolve_singleton(PigpioProtocol),
                          controller_service=container.resolve_singleton(ControllerServiceProtocol),
-                         motor_dao=container.resolve_singleton(MotorDao))
+                         motor_dao=container.resolve_singleton(MotorDao),
+                         gcode_plan_dir=Path(flask_app.config["GCODE_PLAN_DIR"]))
 )
 
 # Register ConfigService
@@ -133,6 +137,14 @@ container.register_factory(
                           config_services=container.resolve_singleton(ConfigProtocol))
 )
 
+# Register DiagnosticsHandler
+container.register_factory(
+    DiagnosticsHandler,
+    lambda: DiagnosticsHandler(dispatcher=dispatcher,
+                               socketio=socketio,
+                               pigpio=container.resolve_singleton(PigpioProtocol))
+)
+
 # Register Helpers
 # container.register_factory(
 #     PositionTracker,
@@ -157,12 +169,14 @@ if __name__ == '__main__':
     pin_handler = container.resolve_singleton(PinHandler)
     motor_handler = container.resolve_singleton(MotorHandler)
     config_handler = container.resolve_singleton(ConfigHandler)
+    diagnostics_handler = container.resolve_singleton(DiagnosticsHandler)
 
     pin_service = container.resolve_singleton(PinProtocol)
 
     pin_handler.register_handlers()
     motor_handler.register_handlers()
     config_handler.register_handlers()
+    diagnostics_handler.register_handlers()
 
     # ---- SSL setup (HTTPS/WSS) ----
     has_tls = cert_path.exists() and key_path.exists()
@@ -1,16 +1,34 @@
-from typing import Protocol
+from typing import Protocol, Optional
 
 from dto.motor_dto import MotorDto
 from servomotor.controller.single_controller import SinglePWMController
 
 from servomotor.dto.controller_status import EMotorStatus
+from servomotor.dto.pipeline_stats import PipelineStats
+from servomotor.dto.ramp_dto import ControllerRampDto
 from servomotor.dto.run_cmd_dto import ControllerRunDto
 
 
 class ControllerServiceProtocol(Protocol):
-    def start(self, controller_id: int, steps: int, freq_hz: int, forward: bool = True): ...
-
-    def start_wave(self, run_cmd: list[ControllerRunDto], pulse_us: int = 5): ...
+    def start(self, controller_id: int, steps: int, freq_hz: int, forward: bool = True, ramp: Optional[ControllerRampDto] = None): ...
+
+    def start_wave(self,
+                   run_cmd: list[ControllerRunDto],
+                   pulse_us: int = 5,
+                   feed_hz: Optional[float] = None,
+                   ramp: Optional[ControllerRampDto] = None): ...
+
+    def start_group(self,
+                    run_cmd: list[ControllerRunDto],
+                    pulse_us: int = 5,
+                    feed_hz: Optional[float] = None,
+                    ramp: Optional[ControllerRampDto] = None): ...
+
+    def start_wave_sequence(self,
+                            moves: list[list[ControllerRunDto]],
+                            pulse_us: int = 5,
+                            feed_hz: Optional[float] = None,
+                            ramp: Optional[ControllerRampDto] = None) -> PipelineStats: ...
 
     def stop(self, controller_id: int):...
 
@@ -3,6 +3,7 @@ from typing import Dict, Optional
 
 from flask_socketio import SocketIO
 
+from common.pin_type import EPinType
 from core.event.event_dispatcher import EventDispatcher
 from core.thread_manager import ThreadManagerProtocol
 from db.dao.motor_dao import MotorDao
@@ -15,12 +16,19 @@ from servomotor.controller.controller_protocol import ControllerProtocol
 from servomotor.controller.single_controller import SinglePWMController
 from servomotor.controller.wave_controller import WavePWMController
 from servomotor.dto.controller_status import EMotorStatus
+from servomotor.dto.pipeline_stats import PipelineStats
+from servomotor.dto.ramp_dto import ControllerRampDto
 from servomotor.dto.run_cmd_dto import ControllerRunDto
-from servomotor.event.controller_event import ControllerStatusEvent, ControllerPositionEvent
+from servomotor.event.controller_event import ControllerStatusEvent, ControllerPositionEvent, ControllerStepsEvent
+from servomotor.pwm.hardware_pwm import HardwarePwmChannels
+from servomotor.scheduler.tick_scheduler import TickScheduler
 from servomotor.tracker.position_tracker import PositionTracker
+from servomotor.wave.wave_library import WaveLibrary
+from servomotor.wave.wave_transmitter import WaveTransmitter
 
 
 class ControllerService(BaseService, ControllerServiceProtocol):
+    WAVE_CONNECTION = "wave"  # pigpio pool owner of the wave controller, motors own theirs by id
 
     def __init__(self, dispatcher: EventDispatcher, socketio: SocketIO, pigpio: PigpioProtocol, motor_dao: MotorDao, thread_manager: ThreadManagerProtocol):
         super().__init__(dispatcher, socketio)
@@ -32,29 +40,72 @@ class ControllerService(BaseService, ControllerServiceProtocol):
         self.__step_trackers: Dict[int, PositionTracker] = {}
 
         self.__single_controllers: Dict[int, ControllerProtocol] = {}
-        self.__wave_controller: ControllerProtocol = WavePWMController(dispatcher, pigpio.get_pi(), thread_manager)
+        # Waves and the pigpiod wave transmitter are shared by every controller
+        self.__wave_library = WaveLibrary(pigpio.get_dedicated_pi(self.WAVE_CONNECTION))
+        self.__wave_transmitter = WaveTransmitter()
+        self.__hardware_pwm = HardwarePwmChannels()
+        self.__wave_controller = WavePWMController(dispatcher,
+                                                   pigpio.get_dedicated_pi(self.WAVE_CONNECTION),
+                                                   thread_manager,
+                                                   wave_library=self.__wave_library,
+                                                   transmitter=self.__wave_transmitter)
 
         self.__lock = threading.RLock()
 
+        # One scheduler checks the counted position of every moving motor, estimated ones need none
+        self.__scheduler = TickScheduler(thread_manager)
         all_motors = motor_dao.get_all()
         for motor in all_motors:
             self.__step_trackers[motor.id] = PositionTracker(controller_id=motor.id,
                                                              dispatcher=dispatcher,
-                                                             thread_manager=thread_manager)
+                                                             thread_manager=thread_manager,
+                                                             scheduler=self.__scheduler,
+                                                             # Exact pulse counts when the pigpio service counts steps
+                                                             step_counter=pigpio.get_step_counter(motor.id))
 
-    def start(self, controller_id: int, steps: int, freq_hz: int, forward: bool = True):
+        self._subscribe_to_events()
+
+    def start(self, controller_id: int, steps: int, freq_hz: int, forward: bool = True, ramp: Optional[ControllerRampDto] = None):
         if self.is_running(controller_id):
-            raise ValueError(f"Motor is already running, cannot start.")
+            raise ValueError("Motor is already running, cannot start.")
 
         controller = self.__get_single_controller(controller_id)
-        controller.run(freq_hz=freq_hz, direction=forward, steps=steps)
+        controller.run(freq_hz=freq_hz, direction=forward, steps=steps, ramp=ramp)
 
-    def start_wave(self, run_cmd: list[ControllerRunDto], pulse_us: int = 5):
+    def start_wave(self,
+                   run_cmd: list[ControllerRunDto],
+                   pulse_us: int = 5,
+                   feed_hz: Optional[float] = None,
+                   ramp: Optional[ControllerRampDto] = None):
         for cmd in run_cmd:
             if self.is_running(cmd.controller_id):
-                raise ValueError(f"Motors are already running, cannot start.")
+                raise ValueError("Motors are already running, cannot start.")
+
+        self.__get_wave_controller().run(run_cmd=run_cmd, pulse_us=pulse_us, feed_hz=feed_hz, ramp=ramp)
+
+    def start_group(self,
+                    run_cmd: list[ControllerRunDto],
+                    pulse_us: int = 5,
+                    feed_hz: Optional[float] = None,
+                    ramp: Optional[ControllerRampDto] = None):
+        """Start the motors together: one bank write for their direction/enable pins, one wave_chain for their steps."""
+        for cmd in run_cmd:
+            if self.is_running(cmd.controller_id):
+                raise ValueError("Motors are already running, cannot start.")
+
+        self.__get_wave_controller().run_group(run_cmd=run_cmd, pulse_us=pulse_us, feed_hz=feed_hz, ramp=ramp)
+
+    def start_wave_sequence(self,
+                            moves: list[list[ControllerRunDto]],
+                            pulse_us: int = 5,
+                            feed_hz: Optional[float] = None,
+                            ramp: Optional[ControllerRampDto] = None) -> PipelineStats:
+        for move in moves:
+            for cmd in move:
+                if self.is_running(cmd.controller_id):
+                    raise ValueError("Motors are already running, cannot start.")
 
-        self.__wave_controller.run(run_cmd=run_cmd, pulse_us=pulse_us)
+        return self.__get_wave_controller().run_pipelined(moves, pulse_us=pulse_us, feed_hz=feed_hz, ramp=ramp)
 
     def stop(self, controller_id: int):
         controller = self.__get_single_controller(controller_id)
@@ -109,22 +160,38 @@ class ControllerService(BaseService, ControllerServiceProtocol):
                 print(f"Creating controller for motor: {motor_id}")
                 controller = SinglePWMController(
                     dispatcher=self._dispatcher,
-                    pi=self.__pigpio_service.get_pi(),
+                    pi=self.__pigpio_service.get_dedicated_pi(motor_id),
                     thread_manager=self.__thread_manager,
                     controller_id=motor_id,
                     pin_enable= config.enable.pigpio_pin_number,
                     pin_forward= config.dir.pigpio_pin_number,
-                    pin_step= config.steps.pigpio_pin_number
+                    pin_step= config.steps.pigpio_pin_number,
+                    scripts=self.__pigpio_service.get_scripts(),
+                    wave_library=self.__wave_library,
+                    transmitter=self.__wave_transmitter,
+                    # PWM pins of the pin map use the hardware PWM channels when free
+                    hardware_pwm=self.__hardware_pwm if config.steps.pin_type == EPinType.PWM else None
                 )
                 self.__single_controllers[motor_id] = controller
                 print(f"Controller for motor: {motor_id} created.")
             if not controller.pi or not controller.pi.connected:
                 print(f"Reconnecting pigpio in controller {motor_id}")
-                controller.pi = self.__pigpio_service.get_pi()
+                controller.pi = self.__pigpio_service.get_dedicated_pi(motor_id)
+                # The shared wave library uses the wave controller's connection
+                self.__get_wave_controller()
             return controller
 
+    def __get_wave_controller(self) -> WavePWMController:
+        with self.__lock:
+            if not self.__wave_controller.pi or not self.__wave_controller.pi.connected:
+                print("Reconnecting pigpio in wave controller")
+                # Also points the shared wave library to the new connection
+                self.__wave_controller.pi = self.__pigpio_service.get_dedicated_pi(self.WAVE_CONNECTION)
+            return self.__wave_controller
+
     def _subscribe_to_events(self):
         self._dispatcher.subscribe(ControllerStatusEvent, self.__handle_controller_status_change)
+        self._dispatcher.subscribe(ControllerStepsEvent, self.__handle_controller_steps)
 
     def __handle_controller_status_change(self, event: ControllerStatusEvent):
         tracker = self.__step_trackers.get(event.motor_id, None)
@@ -132,11 +199,26 @@ class ControllerService(BaseService, ControllerServiceProtocol):
             print(f"No tracker found for motor: {event.motor_id}")
             return
         if event.status == EMotorStatus.RUNNING:
+            if tracker.is_active:
+                # Same motion at a new rate (acceleration ramp segment)
+                tracker.change_frequency(event.freq_hz)
+                return
             model = self.__motor_dao.get_by_id(event.motor_id)
+            if event.counted:
+                # Wave moves report their exact steps, nothing to estimate
+                tracker.begin_counted_motion(current_position=model.position, forward=event.direction, freq_hz=event.freq_hz)
+                return
             tracker.begin_motion(
                 current_position=model.position,
                 forward=event.direction,
                 freq_hz=event.freq_hz
             )
         elif event.status == EMotorStatus.STOPPED:
-            tracker.finish_motion()
\ No newline at end of file
+            tracker.finish_motion()
+
+    def __handle_controller_steps(self, event: ControllerStepsEvent):
+        tracker = self.__step_trackers.get(event.motor_id, None)
+        if not tracker:
+            print(f"No tracker found for motor: {event.motor_id}")
+            return
+        tracker.advance(event.steps, event.direction)
\ No newline at end of file
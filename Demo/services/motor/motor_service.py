@@ -1,5 +1,6 @@
 import threading
 import traceback
+from pathlib import Path
 from typing import Optional
 
 from flask_socketio import SocketIO
@@ -13,6 +14,7 @@ from event.pin_event import PinStatusChangeEvent
 
 from services.controller.controller_protocol import ControllerServiceProtocol
 from services.motor.motor_protocol import MotorServiceProtocol
+from services.motor.tasks.gcode.gcode_plan import GcodePlanCompiler
 from services.motor.tasks.gcode.gcode_task import GcodeTask
 from services.motor.tasks.origin.origin_task import MoveOriginTask
 from services.motor.tasks.task_protocol import MotorTaskProtocol
@@ -21,8 +23,8 @@ from services.motor.tasks.steps.steps_task import MoveStepsTask
 from services.pigpio.pigpio_protocol import PigpioProtocol
 from services.pin.pin_protocol import pin_model_to_dto
 from servomotor.dto.controller_status import EMotorStatus
-from servomotor.event.controller_event import ControllerStatusEvent, ControllerPositionEvent
-from web.events.motor_event import MotorUpdatedEvent, CalibrationChangedEvent
+from servomotor.event.controller_event import ControllerStatusEvent, ControllerPositionEvent, ControllerSegmentEvent
+from web.events.motor_event import MotorUpdatedEvent, CalibrationChangedEvent, MotionSegmentEvent
 
 from dto.motor_dto import MotorDto
 
@@ -31,7 +33,7 @@ from services.base_service import BaseService
 
 class MotorService(BaseService, MotorServiceProtocol):
 
-    def __init__(self, dispatcher: EventDispatcher, socketio: SocketIO, pigpio: PigpioProtocol, controller_service: ControllerServiceProtocol, motor_dao: MotorDao):
+    def __init__(self, dispatcher: EventDispatcher, socketio: SocketIO, pigpio: PigpioProtocol, controller_service: ControllerServiceProtocol, motor_dao: MotorDao, gcode_plan_dir: Path):
         super().__init__(dispatcher, socketio)
 
         self.__pigpio_service = pigpio
@@ -39,6 +41,7 @@ class MotorService(BaseService, MotorServiceProtocol):
         self.__motor_dao = motor_dao
 
         self.__calibration_enabled = False
+        self.__gcode_plan_compiler = GcodePlanCompiler(gcode_plan_dir)
 
         self.__tasks: list[MotorTaskProtocol] = []
         self.__tasks_lock = threading.RLock()
@@ -152,6 +155,7 @@ class MotorService(BaseService, MotorServiceProtocol):
                          socketio = self._socketio,
                          motor_dao = self.__motor_dao,
                          gcode_cmd = gcode,
+                         plan_compiler = self.__gcode_plan_compiler,
                          motor_x_id = 1,
                          motor_y_id = 2,
                          motor_z_id = 3)
@@ -189,10 +193,19 @@ class MotorService(BaseService, MotorServiceProtocol):
             self.__tasks[:] = [t for t in self.__tasks if not t.is_finished]
 
     def _handle_controller_position_change(self, event: ControllerPositionEvent):
+        # Sent when a motion ends (or home is set), not while moving
         self.__motor_dao.update_motor_position(event.motor_id, event.position)
 
         self.__emit_updated_motor_id_event(motor_id=event.motor_id, position=event.position)
 
+    def __handle_controller_segment(self, event: ControllerSegmentEvent):
+        # Forwarded as is, no database access while moving
+        self._dispatcher.emit_async(MotionSegmentEvent(motor_id=event.motor_id,
+                                                       start_position=event.start_position,
+                                                       direction=event.direction,
+                                                       freq_hz=event.freq_hz,
+                                                       start_ts=event.start_ts))
+
     def __handle_controller_status_change(self, event: ControllerStatusEvent):
         if event.status == EMotorStatus.STOPPED:
             self.__clean_tasks()
@@ -223,7 +236,10 @@ class MotorService(BaseService, MotorServiceProtocol):
                 self._dispatcher.emit_async(AppWarning("Error in motor task."))
 
     def _subscribe_to_events(self):
+        # Every status transition matters (task cleanup, UI), only positions and segments keep the latest of a motor
         self._dispatcher.subscribe(ControllerStatusEvent, self.__handle_controller_status_change)
+        self._dispatcher.subscribe(ControllerPositionEvent, self._handle_controller_position_change, coalesce_key=lambda e: e.motor_id)
+        self._dispatcher.subscribe(ControllerSegmentEvent, self.__handle_controller_segment, coalesce_key=lambda e: e.motor_id)
 
         self._dispatcher.subscribe(TaskHomeFinishedEvent, self.__handle_home_task_finished)
         self._dispatcher.subscribe(TaskStepFinishedEvent, self.__handle_step_task_finished_event)
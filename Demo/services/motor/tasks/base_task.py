@@ -87,6 +87,11 @@ class BaseSingleMotorTask(SingleMotorTaskProtocol, BaseMotorTask, ABC):
         self._validate_operation(current_position=current_position)
         super().execute(**kwargs)
 
+    def validate(self, current_position: Optional[int] = None, pass_limits: bool = False) -> None:
+        """Limit checks of execute() without starting the motor, raises AppWarning."""
+        self._pass_limits = pass_limits
+        self._validate_operation(current_position=current_position)
+
     def _validate_operation(self, current_position: Optional[int] = None, check_final_position: bool = True):
         try:
             if not self._pass_limits:
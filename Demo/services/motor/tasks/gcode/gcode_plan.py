@@ -0,0 +1,215 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from dataclasses import dataclass
+from enum import IntEnum
+from pathlib import Path
+from typing import Iterator
+
+from common import utils
+from db.model.motor.motor_label import EMotorLabel
+from db.model.motor.motor_model import MotorModel
+from services.motor.tasks.gcode.gcode_command import EGcodeCommand
+from services.motor.tasks.gcode.gcode_converter import parse_gcode_cmd
+
+
+class EPlanAxisAction(IntEnum):
+    NONE = 0
+    STEPS = 1
+    ORIGIN = 2  # distance 0: go back to origin, resolved against the motor position at replay
+
+
+@dataclass
+class PlanAxisMove:
+    action: EPlanAxisAction
+    steps: int = 0
+    direction: bool = True
+    freq_hz: float = 0.0
+
+
+@dataclass
+class PlanSegment:
+    line: int
+    command: EGcodeCommand
+    axes: dict[EMotorLabel, PlanAxisMove]
+
+
+PLAN_AXES = (EMotorLabel.X, EMotorLabel.Y, EMotorLabel.Z)
+PLAN_COMMANDS = (EGcodeCommand.G0, EGcodeCommand.G1, EGcodeCommand.G2)
+
+
+class GcodePlanFormat:
+    """
+    Binary layout of a compiled plan (little endian):
+        header:  magic 'GCPL', version u16, segment count u32
+        segment: source line u32, command u8, then for X, Y, Z: action u8, steps u32, direction u8, freq_hz f64
+    """
+    MAGIC = b"GCPL"
+    VERSION = 1
+
+    HEADER = struct.Struct("<4sHI")
+    AXIS = "BIBd"
+    SEGMENT = struct.Struct("<IB" + AXIS * len(PLAN_AXES))
+
+    @classmethod
+    def pack_segment(cls, segment: PlanSegment) -> bytes:
+        values: list = [segment.line, PLAN_COMMANDS.index(segment.command)]
+        for label in PLAN_AXES:
+            move = segment.axes.get(label, PlanAxisMove(EPlanAxisAction.NONE))
+            values += [int(move.action), move.steps, int(move.direction), float(move.freq_hz)]
+        return cls.SEGMENT.pack(*values)
+
+    @classmethod
+    def unpack_segment(cls, buffer, offset: int) -> PlanSegment:
+        values = cls.SEGMENT.unpack_from(buffer, offset)
+        axes: dict[EMotorLabel, PlanAxisMove] = {}
+        for i, label in enumerate(PLAN_AXES):
+            action, steps, direction, freq_hz = values[2 + i * 4: 6 + i * 4]
+            if action != EPlanAxisAction.NONE:
+                axes[label] = PlanAxisMove(EPlanAxisAction(action), steps, bool(direction), freq_hz)
+        return PlanSegment(line=values[0], command=PLAN_COMMANDS[values[1]], axes=axes)
+
+
+class GcodePlanReader:
+    """Memory-mapped, read only view of a compiled plan. Segments are decoded on access."""
+
+    def __init__(self, path: Path):
+        self.__path = path
+        with open(path, "rb") as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = GcodePlanFormat.HEADER.unpack_from(self.__mmap, 0)
+        expected_size = GcodePlanFormat.HEADER.size + count * GcodePlanFormat.SEGMENT.size
+        if magic != GcodePlanFormat.MAGIC or version != GcodePlanFormat.VERSION or len(self.__mmap) != expected_size:
+            self.close()
+            raise ValueError(f"Invalid gcode plan file: {path}")
+        self.__count = count
+
+    @property
+    def path(self) -> Path:
+        return self.__path
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __getitem__(self, index: int) -> PlanSegment:
+        if not 0 <= index < self.__count:
+            raise IndexError(index)
+        return GcodePlanFormat.unpack_segment(self.__mmap, GcodePlanFormat.HEADER.size + index * GcodePlanFormat.SEGMENT.size)
+
+    def __iter__(self) -> Iterator[PlanSegment]:
+        for index in range(self.__count):
+            yield self[index]
+
+    def close(self) -> None:
+        if not self.__mmap.closed:
+            self.__mmap.close()
+
+    def __enter__(self) -> "GcodePlanReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class GcodePlanCompiler:
+    """
+    Compiles a G-code program into a binary plan of per-axis steps, directions and frequencies.
+
+    Plans are cached on disk, keyed by the hash of the program and of the motor settings used
+    to convert distances to steps, so running the same program again skips parsing entirely.
+
+    Wave chains are not part of the plan: they reference wave ids that only exist in the running
+    pigpiod. The wave controller plans them at replay, when a sequence of plan segments is sent,
+    and reuses the waves its library still holds.
+    """
+
+    def __init__(self, cache_dir: Path, max_cached_plans: int = 64):
+        self.__cache_dir = cache_dir
+        self.__max_cached_plans = max_cached_plans
+
+    def open(self, gcode_cmd: str, motors: dict[EMotorLabel, MotorModel]) -> GcodePlanReader:
+        """Return a reader for the compiled program, compiling it if it is not cached yet."""
+        path = self.__cache_dir / f"{self.plan_key(gcode_cmd, motors)}.plan"
+        if path.exists():
+            try:
+                return GcodePlanReader(path)
+            except (ValueError, struct.error, OSError) as e:
+                print(f"Discarding gcode plan {path}: {e}")
+
+        self.__write(path, self.compile(gcode_cmd, motors))
+        self.__prune()
+        return GcodePlanReader(path)
+
+    @staticmethod
+    def plan_key(gcode_cmd: str, motors: dict[EMotorLabel, MotorModel]) -> str:
+        config = {
+            label.value: [motor.angle, motor.distance_per_turn, motor.clockwise, motor.fast_freq, motor.target_freq]
+            for label, motor in motors.items()
+        }
+        digest = hashlib.sha256()
+        digest.update(str(GcodePlanFormat.VERSION).encode())
+        digest.update(json.dumps(config, sort_keys=True).encode())
+        digest.update(gcode_cmd.encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def compile(gcode_cmd: str, motors: dict[EMotorLabel, MotorModel]) -> list[PlanSegment]:
+        segments: list[PlanSegment] = []
+        for line_index, gcode_line in enumerate(parse_gcode_cmd(gcode_cmd)):
+            command = EGcodeCommand.from_value(gcode_line.command_str)
+            if command is None:
+                continue
+
+            axes: dict[EMotorLabel, PlanAxisMove] = {}
+            for label_str, distance in gcode_line.params.items():
+                label = EMotorLabel.from_value(label_str)
+                motor = motors.get(label)
+                if (label is None) or (distance is None) or (motor is None):
+                    continue
+
+                freq_hz = 0
+                match command:
+                    case EGcodeCommand.G0:
+                        freq_hz = motor.fast_freq
+                    case EGcodeCommand.G1:
+                        freq_hz = motor.target_freq
+
+                if distance == 0:
+                    axes[label] = PlanAxisMove(EPlanAxisAction.ORIGIN, freq_hz=freq_hz)
+                    continue
+
+                steps = utils.calculate_motor_total_steps(motor.angle, abs(distance), motor.distance_per_turn)
+                if steps <= 0:
+                    continue
+                direction = motor.clockwise if distance > 0 else not motor.clockwise
+                axes[label] = PlanAxisMove(EPlanAxisAction.STEPS, steps=steps, direction=direction, freq_hz=freq_hz)
+
+            segments.append(PlanSegment(line=line_index, command=command, axes=axes))
+        return segments
+
+    def __write(self, path: Path, segments: list[PlanSegment]) -> None:
+        self.__cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.__cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(GcodePlanFormat.HEADER.pack(GcodePlanFormat.MAGIC, GcodePlanFormat.VERSION, len(segments)))
+                for segment in segments:
+                    f.write(GcodePlanFormat.pack_segment(segment))
+            # Atomic so a concurrent reader never maps a half written plan
+            os.replace(tmp_name, path)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+
+    def __prune(self) -> None:
+        plans = sorted(self.__cache_dir.glob("*.plan"), key=lambda p: p.stat().st_mtime)
+        for old in plans[:max(0, len(plans) - self.__max_cached_plans)]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
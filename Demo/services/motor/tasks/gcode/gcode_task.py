@@ -1,10 +1,9 @@
+import threading
 import traceback
 from typing import Unpack, Optional
 
 from flask_socketio import SocketIO
-from gcodeparser import GcodeLine
 
-from common import utils
 from core.event.event_dispatcher import EventDispatcher
 from db.dao.motor_dao import MotorDao
 from db.model.motor.motor_label import EMotorLabel
@@ -13,16 +12,23 @@ from event.motor_event import TaskGcodeFinishedEvent
 from event.pin_event import PinStatusChangeEvent
 from services.controller.controller_protocol import ControllerServiceProtocol
 from services.motor.tasks.base_task import BaseMotorTask
-from services.motor.tasks.gcode.gcode_command import EGcodeCommand
-from services.motor.tasks.gcode.gcode_converter import parse_gcode_cmd
+from services.motor.tasks.gcode.gcode_plan import GcodePlanCompiler, PlanSegment, EPlanAxisAction
 from services.motor.tasks.origin.origin_task import MoveOriginTask
 from services.motor.tasks.steps.steps_task import MoveStepsTask
 from services.motor.tasks.task_protocol import ExecKwargs, SingleMotorTaskProtocol
-from collections import deque
 
 from servomotor.dto.controller_status import EMotorStatus
+from servomotor.dto.run_cmd_dto import ControllerRunDto
 
 class GcodeTask(BaseMotorTask):
+    """
+    Runs a compiled G-code plan. Consecutive lines that only move steps are sent together as one
+    wave sequence (moves chained back-to-back by the wave controller), lines going back to origin
+    run one task per axis.
+    """
+
+    SEQUENCE_MAX_MOVES = 32  # lines per wave sequence, all pre-flighted before the first one starts
+
     def __init__(self,
                  controller_service: ControllerServiceProtocol,
                  dispatcher: EventDispatcher,
@@ -31,19 +37,13 @@ class GcodeTask(BaseMotorTask):
                  motor_x_id: int,
                  motor_y_id: int,
                  motor_z_id: int,
-                 gcode_cmd: str):
+                 gcode_cmd: str,
+                 plan_compiler: GcodePlanCompiler):
         super().__init__(controller_service, dispatcher)
 
         self._socketio = socketio
         self.__motor_dao = motor_dao
 
-        self.__gcode_lines = deque(parse_gcode_cmd(gcode_cmd)) #deque(GcodeParser(gcode_cmd).lines)
-        # print(f"Gcode task: {GcodeParser(gcode_cmd).lines}")
-
-        for lines in self.__gcode_lines:
-            print(lines.gcode_str)
-        self.__current_line: Optional[GcodeLine] = None
-
         self.__tasks: dict[EMotorLabel, SingleMotorTaskProtocol] = {}
         self.__motor_ids = {
             EMotorLabel.X: motor_x_id,
@@ -51,23 +51,39 @@ class GcodeTask(BaseMotorTask):
             EMotorLabel.Z: motor_z_id,
         }
 
+        # Parsing and distance -> steps conversion happen once per program and motor config,
+        # the task replays the compiled segments from the memory-mapped plan file
+        motors = {label: motor for label, motor_id in self.__motor_ids.items()
+                  if (motor := self.__motor_dao.get_by_id(motor_id)) is not None}
+        self.__plan = plan_compiler.open(gcode_cmd, motors)
+        self.__next_index = 0
+        self.__current_line: Optional[PlanSegment] = None
+        self.__lock = threading.RLock()
+        self.__sequence_running = False
+        print(f"Gcode task: {len(self.__plan)} segments from {self.__plan.path}")
+
     @property
     def controller_ids(self) -> list[int]:
         return list(self.__motor_ids.values())
 
     @property
-    def current_line(self) -> Optional[GcodeLine]:
+    def current_line(self) -> Optional[PlanSegment]:
         return self.__current_line
 
-    def move_to_next_line(self) -> Optional[GcodeLine]:
-        self.__current_line = self.__gcode_lines.popleft() if self.__gcode_lines else None
+    def move_to_next_line(self) -> Optional[PlanSegment]:
+        if self.is_finished or self.__next_index >= len(self.__plan):
+            self.__current_line = None
+        else:
+            self.__current_line = self.__plan[self.__next_index]
+            self.__next_index += 1
         return self.__current_line
 
     def handle_controller_status_change(self, event: MotorEvent):
         for task in self.__tasks.values():
             task.handle_controller_status_change(event)
 
-        if (self.is_finished is False) and event.status == EMotorStatus.STOPPED:
+        # A sequence starts the next lines itself once it returns
+        if (self.is_finished is False) and event.status == EMotorStatus.STOPPED and not self.__sequence_running:
             self._start_all_tasks()
 
     def handle_pin_status_change(self, event: PinStatusChangeEvent):
@@ -79,63 +95,118 @@ class GcodeTask(BaseMotorTask):
         self._start_all_tasks()
 
     def stop(self):
-        self._is_finished = True
+        with self.__lock:
+            self._is_finished = True
 
-        for task in self.__tasks.values():
-            task.stop()
+            for task in self.__tasks.values():
+                task.stop()
+            if self.__sequence_running:
+                for motor_id in self.controller_ids:
+                    self._controller_service.stop(motor_id)
+            self.__plan.close()
 
     def _start_all_tasks(self):
-        if self._controller_service.is_any_running():
-            # print("All controllers must be stopped before starting new gcode task.")
-            return
-
-        command_line = self.move_to_next_line()
-        if command_line is None:
-            print("No more gcode lines to execute.")
+        with self.__lock:
+            if self.__sequence_running or self._controller_service.is_any_running():
+                # print("All controllers must be stopped before starting new gcode task.")
+                return
+
+            if self.__start_sequence():
+                return
+
+            command_line = self.move_to_next_line()
+            if command_line is None:
+                print("No more gcode lines to execute.")
+                self.stop()
+                self._dispatcher.emit_async(TaskGcodeFinishedEvent(task_id=self.uuid))
+                return
+
+            self.__start_line_tasks(command_line)
+
+    def __start_sequence(self) -> bool:
+        """Start the next lines moving only steps as one wave sequence, False when the next line is not one."""
+        motors: dict[EMotorLabel, MotorModel] = {}
+        positions: dict[EMotorLabel, int] = {}
+        moves: list[list[ControllerRunDto]] = []
+        lines: list[int] = []
+        index = self.__next_index
+        while not self.is_finished and index < len(self.__plan) and len(moves) < self.SEQUENCE_MAX_MOVES:
+            segment = self.__plan[index]
+            if any(move.action == EPlanAxisAction.ORIGIN for move in segment.axes.values()):
+                break
+
+            run_cmd: list[ControllerRunDto] = []
+            for label, move in segment.axes.items():
+                if label not in motors:
+                    motor = self.__motor_dao.get_by_id(self.__motor_ids[label])
+                    if motor is None:
+                        continue
+                    motors[label] = motor
+                    positions[label] = motor.position
+                motor = motors[label]
+
+                # Same limit checks as a steps task started at the position the previous lines lead to
+                MoveStepsTask(controller_service=self._controller_service, dispatcher=self._dispatcher, motor=motor,
+                              steps=move.steps, direction=move.direction).validate(
+                    current_position=positions[label], pass_limits=self._execute_kwargs.get("pass_limits", False))
+                positions[label] += move.steps if move.direction else -move.steps
+
+                config = self.__motor_dao.get_pin_config(motor.id)
+                run_cmd.append(ControllerRunDto(controller_id=motor.id,
+                                                steps=move.steps,
+                                                freq_hz=int(move.freq_hz or motor.target_freq),
+                                                direction=move.direction,
+                                                gpio_step=config.steps.pigpio_pin_number,
+                                                gpio_home=config.home.pigpio_pin_number,
+                                                gpio_direction=config.dir.pigpio_pin_number,
+                                                gpio_enable=config.enable.pigpio_pin_number))
+            index += 1
+            if run_cmd:
+                moves.append(run_cmd)
+                lines.append(segment.line)
+
+        if not moves:
+            return False
+        for _ in range(index - self.__next_index):
+            self.move_to_next_line()
+        print(f"Starting wave sequence of gcode lines {lines[0]}-{lines[-1]} ({len(moves)} moves)")
+        self.__sequence_running = True
+        self._socketio.start_background_task(self._run_sequence, moves)
+        return True
+
+    def _run_sequence(self, moves: list[list[ControllerRunDto]]):
+        try:
+            stats = self._controller_service.start_wave_sequence(moves)
+            print(f"Wave sequence done: {stats.moves} moves in {stats.chains} chains, max gap {stats.max_gap_us} µs")
+            self.__sequence_running = False
+            if not self.is_finished:
+                self._start_all_tasks()
+        except Exception as e:
+            self.__sequence_running = False
+            traceback.print_exc()
             self.stop()
-            self._dispatcher.emit_async(TaskGcodeFinishedEvent(task_id=self.uuid))
-            return
+            self._dispatcher.emit_async(TaskGcodeFinishedEvent(task_id=self.uuid, error=e))
 
-        empty_cmd = True
+    def __start_line_tasks(self, command_line: PlanSegment):
 
-        for label_str, distance in command_line.params.items():
-            # Parse label and command
-            label = EMotorLabel.from_value(label_str)
-            command = EGcodeCommand.from_value(command_line.command_str)
-            if (label is None) or (command is None) or (distance is None):
-                continue
+        empty_cmd = True
 
-            # Load motor from DB, continue to next param if not found
+        for label, move in command_line.axes.items():
+            # Load motor from DB, continue to next axis if not found
             motor = self.__motor_dao.get_by_id(self.__motor_ids[label])
             if motor is None:
                 continue
 
-            freq_hz = 0
-            match command:
-                case EGcodeCommand.G0:
-                    freq_hz = motor.fast_freq
-                case EGcodeCommand.G1:
-                    freq_hz = motor.target_freq
-            # print(f"Gcode freq: {freq_hz}")
-            # If distance is 0 create an origin task
-            if distance == 0:
+            freq_hz = move.freq_hz
+            if move.action == EPlanAxisAction.ORIGIN:
                 # check if the motor is already at origin
                 if motor.position == motor.origin:
                     continue
                 task = MoveOriginTask(controller_service=self._controller_service, dispatcher=self._dispatcher, motor=motor)
             else:
-                # Create an step task
-
-                # Convert distance to steps, if steps are 0 continue to next param
-                steps = utils.calculate_motor_total_steps(motor.angle, abs(distance), motor.distance_per_turn)
-                if steps <= 0:
-                    continue
-
-                # Determine motion direction
-                direction = motor.clockwise if distance > 0 else not motor.clockwise
-                task = MoveStepsTask(controller_service=self._controller_service, dispatcher=self._dispatcher, motor=motor, steps=steps, direction=direction)
+                task = MoveStepsTask(controller_service=self._controller_service, dispatcher=self._dispatcher, motor=motor, steps=move.steps, direction=move.direction)
 
-            print(f"Starting task with distance: {distance} for motor: {motor.id}")
+            print(f"Starting task on line {command_line.line} for motor: {motor.id}")
             self.__tasks[label] = task
             self._socketio.start_background_task(self._start_task, motor, label, freq_hz)
             empty_cmd = False
@@ -0,0 +1,116 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Hashable, Iterator, Optional
+
+import pigpio
+
+from dto.pigpio_pool_stats import PigpioPoolStats
+
+
+class PigpioPool:
+    """
+    Connections to pigpiod.
+
+    The pigpio client serializes the commands of a connection on its socket, so a controller
+    polling wave_tx_busy delays every other command sent on the same pi. Latency-critical
+    owners (controllers) get a dedicated connection each, bulk and UI reads share another one.
+    pigpiod state (waves, scripts, modes) is global, any connection can use it.
+
+    When max_connections are open, new owners share the bulk connection (counted as fallbacks).
+    """
+
+    MAX_CONNECTIONS = 8
+
+    def __init__(self, max_connections: int = MAX_CONNECTIONS, factory: Callable[[], pigpio.pi] = pigpio.pi):
+        if max_connections < 1:
+            raise ValueError(f"max_connections must be >= 1, got {max_connections}")
+        self.__lock = threading.Lock()
+        self.__factory = factory
+        self.__max_connections = max_connections
+        self.__bulk: Optional[pigpio.pi] = None
+        self.__dedicated: dict[Hashable, pigpio.pi] = {}
+        self.__started_at = time.monotonic()
+        self.__fallbacks = 0
+        self.__reconnects = 0
+        self.__bulk_calls = 0
+        self.__bulk_busy_s = 0.0
+
+    def get(self, owner: Hashable) -> pigpio.pi:
+        """Dedicated connection of owner, opened (or reopened when it dropped) on demand."""
+        with self.__lock:
+            pi = self.__dedicated.get(owner)
+            if pi is not None:
+                if pi.connected:
+                    return pi
+                self.__reconnects += 1
+                self.__close(pi)
+                del self.__dedicated[owner]
+            elif len(self.__dedicated) + 1 >= self.__max_connections:
+                self.__fallbacks += 1
+                return self.__get_bulk()
+
+            pi = self.__factory()
+            if not pi.connected:
+                self.__close(pi)
+                self.__fallbacks += 1
+                return self.__get_bulk()
+            self.__dedicated[owner] = pi
+            return pi
+
+    def release(self, owner: Hashable) -> None:
+        with self.__lock:
+            pi = self.__dedicated.pop(owner, None)
+        if pi is not None:
+            self.__close(pi)
+
+    @contextmanager
+    def bulk(self) -> Iterator[pigpio.pi]:
+        """Shared connection for reads, the time spent with it is measured."""
+        with self.__lock:
+            pi = self.__get_bulk()
+        started = time.monotonic()
+        try:
+            yield pi
+        finally:
+            elapsed = time.monotonic() - started
+            with self.__lock:
+                self.__bulk_calls += 1
+                self.__bulk_busy_s += elapsed
+
+    def close(self) -> None:
+        with self.__lock:
+            connections = list(self.__dedicated.values())
+            if self.__bulk is not None:
+                connections.append(self.__bulk)
+            self.__dedicated.clear()
+            self.__bulk = None
+        for pi in connections:
+            self.__close(pi)
+
+    def stats(self) -> PigpioPoolStats:
+        with self.__lock:
+            bulk_open = self.__bulk is not None and self.__bulk.connected
+            return PigpioPoolStats(max_connections=self.__max_connections,
+                                   connections=len(self.__dedicated) + (1 if bulk_open else 0),
+                                   owners=[str(owner) for owner in self.__dedicated],
+                                   fallbacks=self.__fallbacks,
+                                   reconnects=self.__reconnects,
+                                   bulk_calls=self.__bulk_calls,
+                                   bulk_busy_s=self.__bulk_busy_s,
+                                   uptime_s=time.monotonic() - self.__started_at)
+
+    def __get_bulk(self) -> pigpio.pi:
+        if self.__bulk is None or not self.__bulk.connected:
+            if self.__bulk is not None:
+                self.__reconnects += 1
+                self.__close(self.__bulk)
+            self.__bulk = self.__factory()
+        return self.__bulk
+
+    @staticmethod
+    def __close(pi: pigpio.pi) -> None:
+        try:
+            pi.stop()
+        except Exception as e:
+            print(f"Error closing pigpio connection: {e}")
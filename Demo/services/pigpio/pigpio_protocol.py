@@ -1,9 +1,21 @@
-from typing import Protocol, Optional
+from typing import Protocol, Optional, Hashable
 import pigpio
 
+from dto.pigpio_pool_stats import PigpioPoolStats
+from servomotor.script.script_library import ScriptLibrary
+from servomotor.tracker.step_counter import StepCounter
+
 class PigpioProtocol(Protocol):
     def get_pi(self) -> pigpio.pi:...
 
+    def get_dedicated_pi(self, owner: Hashable) -> pigpio.pi:...
+
+    def get_pool_stats(self) -> PigpioPoolStats:...
+
+    def get_scripts(self) -> ScriptLibrary:...
+
+    def get_step_counter(self, motor_id: int) -> Optional[StepCounter]:...
+
     def get_pin_status(self, pin_id: int) -> bool:...
 
     def get_gpio_pin_status(self, gpio: Optional[int]) -> bool:...
@@ -1,6 +1,6 @@
 import pigpio
 
-from typing import Optional
+from typing import Optional, Hashable
 
 from flask_socketio import SocketIO
 
@@ -8,15 +8,25 @@ from core.di_container import container
 from core.event.event_dispatcher import EventDispatcher
 from db.dao.motor_dao import MotorDao
 from db.dao.pin_dao import PinDao
+from dto.pigpio_pool_stats import PigpioPoolStats
 from event.pin_event import PinStatusChangeEvent
 from services.base_service import BaseService
+from services.pigpio.pigpio_pool import PigpioPool
 from services.pigpio.pigpio_protocol import PigpioProtocol
+from servomotor.script.script_library import ScriptLibrary
+from servomotor.tracker.step_counter import StepCounter
 
 
 class PigpioService(BaseService, PigpioProtocol):
-    def __init__(self, dispatcher: EventDispatcher, socketio: SocketIO):
+    def __init__(self, dispatcher: EventDispatcher, socketio: SocketIO, count_steps: bool = False):
         super().__init__(dispatcher, socketio)
 
+        self.__scripts: Optional[ScriptLibrary] = None
+        # With count_steps the pulses of every STEP pin are counted (no status callback nor glitch filter there)
+        self.__count_steps = count_steps
+        self.__step_counters: dict[int, StepCounter] = {}
+        # Controllers get their own connections, reads share one, this one configures and watches pins
+        self.__pool = PigpioPool()
         self.__configure_gpio()
 
     def __configure_gpio(self):
@@ -32,11 +42,34 @@ class PigpioService(BaseService, PigpioProtocol):
             # self.__pi.set_mode(config.home, pigpio.INPUT)
             self.__pi.set_pull_up_down(config.home.pigpio_pin_number, pigpio.PUD_UP)
 
-            self.__add_callback(config.steps.pigpio_pin_number)
+            if self.__count_steps:
+                self.__add_step_counter(config.motor_id, config.steps.pigpio_pin_number)
+            else:
+                self.__add_callback(config.steps.pigpio_pin_number)
             self.__add_callback(config.dir.pigpio_pin_number)
             self.__add_callback(config.enable.pigpio_pin_number)
             self.__add_callback(config.home.pigpio_pin_number)
 
+        # Step scripts are stored once per motor, jogs then only need run_script
+        if self.__scripts is None:
+            self.__scripts = ScriptLibrary(self.__pi)
+        else:
+            self.__scripts.pi = self.__pi
+        try:
+            self.__scripts.load([config.motor_id for config in configs])
+        except Exception as e:
+            print(f"Error storing pigpio scripts: {e}")
+
+    def __add_step_counter(self, motor_id: int, gpio: int):
+        counter = self.__step_counters.get(motor_id)
+        if counter is None or counter.gpio != gpio:
+            if counter is not None:
+                counter.cancel()
+            self.__step_counters[motor_id] = StepCounter(self.__pi, gpio)
+        else:
+            # Keeps counting from its total on the new connection
+            counter.pi = self.__pi
+
     def __add_callback(self, gpio):
         self.__pi.callback(gpio, pigpio.EITHER_EDGE, self._handle_pin_status)
         self.__pi.set_glitch_filter(gpio, 5000)
@@ -46,6 +79,21 @@ class PigpioService(BaseService, PigpioProtocol):
             self.__configure_gpio()
         return self.__pi
 
+    def get_dedicated_pi(self, owner: Hashable) -> pigpio.pi:
+        """Connection used only by owner, so its commands do not queue behind other users."""
+        # Pins are configured again first if the daemon restarted
+        self.get_pi()
+        return self.__pool.get(owner)
+
+    def get_pool_stats(self) -> PigpioPoolStats:
+        return self.__pool.stats()
+
+    def get_scripts(self) -> ScriptLibrary:
+        return self.__scripts
+
+    def get_step_counter(self, motor_id: int) -> Optional[StepCounter]:
+        return self.__step_counters.get(motor_id)
+
     def get_pin_status(self, pin_id: int) -> bool:
         gpio = PinDao.get_by_id(pin_id).pigpio_pin_number
         return self.get_gpio_pin_status(gpio)
@@ -53,13 +101,16 @@ class PigpioService(BaseService, PigpioProtocol):
     def get_gpio_pin_status(self, gpio: Optional[int]) -> bool:
         if not gpio in list(range(28)):
             return False
-        pi = self.get_pi()
-        return pi.read(gpio)
+        with self.__pool.bulk() as pi:
+            return pi.read(gpio)
 
     def get_gpio_status(self) -> dict[int, bool]:
+        # One read of the whole bank instead of one command per pin
+        with self.__pool.bulk() as pi:
+            levels = pi.read_bank_1()
         status: dict[int, bool] = {}
         for gpio in list(range(28)):
-            status[gpio] = (self.get_gpio_pin_status(gpio))
+            status[gpio] = bool(levels >> gpio & 1)
         return status
 
     def _handle_pin_status(self, gpio: int, level: int, tick) -> None:
@@ -1,3 +1,5 @@
+import os
+
 from flask import Flask
 from flask_cors import CORS
 from flask_socketio import SocketIO
@@ -15,6 +17,10 @@ CORS(flask_app)
 
 flask_app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///demo.db"
 flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Data written by the app lives in the instance folder, next to the database
+flask_app.config["GCODE_PLAN_DIR"] = os.path.join(flask_app.instance_path, "gcode_plans")
+# Count STEP pulses with pigpio tally callbacks (exact positions) instead of estimating them, COUNT_STEPS=0 to disable
+flask_app.config["COUNT_STEPS"] = os.environ.get("COUNT_STEPS", "1").lower() not in ("0", "false", "no")
 
 
 db_app.init_app(flask_app)
@@ -0,0 +1,5 @@
+from enum import Enum
+
+
+class EDiagnosticsEventType(str, Enum):
+    GET = "diagnostics:get"
@@ -27,6 +27,7 @@ class EMotorEventType(str, Enum):
     UPDATED = "motor:updated"                   # Broadcast motor updated
     STATUS_CHANGED = "motor:status_changed"     # Broadcast motor status changed
     POSITION_CHANGED = "motor:position_changed" # Broadcast motor position changed
+    MOTION_SEGMENT = "motor:motion_segment"     # Broadcast motion segment, clients interpolate the position
 
     START_GCODE = "motor:start_gcode"
 
@@ -35,6 +36,16 @@ class MotorUpdatedEvent(BaseEvent[MotorDto]):
     def __init__(self, data: MotorDto):
         super().__init__(key=EMotorEventType.UPDATED, data=data)
 
+class MotionSegmentEvent(BaseEvent[dict]):
+    def __init__(self, motor_id: int, start_position: int, direction: bool, freq_hz: float, start_ts: float):
+        super().__init__(key=EMotorEventType.MOTION_SEGMENT, data={
+            "id": motor_id,
+            "start_position": start_position,
+            "direction": direction,
+            "freq_hz": freq_hz,
+            "start_ts": start_ts,
+        })
+
 class CalibrationChangedEvent(BaseEvent[dict]):
     def __init__(self, calibration: bool):
         super().__init__(key=EMotorEventType.CALIBRATION_CHANGED, data={"calibrate": calibration})
\ No newline at end of file
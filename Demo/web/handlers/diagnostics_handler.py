@@ -0,0 +1,23 @@
+from flask_socketio import SocketIO
+
+from core.event.event_dispatcher import EventDispatcher
+from services.pigpio.pigpio_protocol import PigpioProtocol
+from web.events.diagnostics_event import EDiagnosticsEventType
+from web.handlers.base_handler import BaseHandler
+
+
+class DiagnosticsHandler(BaseHandler):
+    def __init__(self, dispatcher: EventDispatcher, socketio: SocketIO, pigpio: PigpioProtocol):
+        super().__init__(dispatcher, socketio)
+        self.__pigpio = pigpio
+
+    def register_handlers(self):
+        self._socketio.on_event(message=EDiagnosticsEventType.GET, handler=self.handle_get)
+
+    @BaseHandler.safe(error_message="Error fetching diagnostics.")
+    def handle_get(self, data=None):
+        # Event counts, queue and callback latencies, slow subscribers and pigpio connections
+        return self.ok(obj={
+            "dispatcher": self._dispatcher.snapshot_stats(),
+            "pigpio": self.__pigpio.get_pool_stats().to_dict(),
+        })
@@ -8,7 +8,7 @@ from dto.motor_dto import MotorDto
 from services.motor.motor_protocol import MotorServiceProtocol
 
 from servomotor.dto.controller_run_mode import EControllerRunMode
-from web.events.motor_event import EMotorEventType, MotorUpdatedEvent, CalibrationChangedEvent
+from web.events.motor_event import EMotorEventType, MotorUpdatedEvent, CalibrationChangedEvent, MotionSegmentEvent
 from web.handlers.base_handler import BaseHandler
 
 
@@ -39,6 +39,7 @@ class MotorHandler(BaseHandler):
 
         self._dispatcher.subscribe(MotorUpdatedEvent, self._emit_event)
         self._dispatcher.subscribe(CalibrationChangedEvent, self._emit_event)
+        self._dispatcher.subscribe(MotionSegmentEvent, self._emit_event)
 
     @BaseHandler.safe(error_message="Error fetching motors calibration.")
     def _handle_get_calibration(self, data):
@@ -50,16 +50,6 @@ class BaseController(ControllerProtocol, ABC):
     def is_motor_in_use(self, motor_id: int) -> bool:
         pass
 
-    def _start_position_updates(self):
-        # emit every 50 ms while RUNNING, but break immediately if aborted
-        while self.__status == EMotorStatus.RUNNING:
-            # compute current position in memory
-            self._emit_status_update()
-
-            # interruptible sleep (breaks instantly when stop() sets the event)
-            if self._abort_event.wait(0.01):
-                break
-
     @abstractmethod
     def _emit_status_update(self):
         pass
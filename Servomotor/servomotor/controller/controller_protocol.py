@@ -2,6 +2,7 @@ from typing import Protocol, runtime_checkable, TypedDict, Unpack
 import pigpio
 
 from servomotor.dto.controller_status import EMotorStatus
+from servomotor.dto.ramp_dto import ControllerRampDto
 from servomotor.dto.run_cmd_dto import ControllerRunDto
 
 
@@ -9,9 +10,11 @@ class RunKwargs(TypedDict, total=False):
     steps: int
     direction: bool
     freq_hz: int
+    feed_hz: float
     pulse_us: int
     run_cmd: list[ControllerRunDto]
     duty: int
+    ramp: ControllerRampDto
 
 @runtime_checkable
 class ControllerProtocol(Protocol):
@@ -1,3 +1,6 @@
+import threading
+import time
+from fractions import Fraction
 from typing import Optional, Unpack
 
 import pigpio
@@ -7,10 +10,49 @@ from core.thread_manager import ThreadManagerProtocol
 from servomotor.controller.base_controller import BaseController
 from servomotor.controller.controller_protocol import RunKwargs
 from servomotor.dto.controller_status import EMotorStatus
-from servomotor.event.controller_event import ControllerStatusEvent
+from servomotor.event.controller_event import ControllerStatusEvent, ControllerStepsEvent
+from servomotor.motion.motion_profile import MotionProfile, ProfileSegment
+from servomotor.pwm.hardware_pwm import HardwarePwmChannels
+from servomotor.pwm.pwm_frequency import SoftwarePwmFrequencies
+from servomotor.script.script_library import ScriptLibrary, EScript
+from servomotor.wave.chain_encoder import ChainBlock, ChainEncoder
+from servomotor.wave.chain_progress import ChainProgress
+from servomotor.wave.pulse_builder import frame_pulses
+from servomotor.wave.wave_library import WaveLibrary, WaveKey
+from servomotor.wave.wave_transmitter import WaveTransmitter
 
 
 class SinglePWMController(BaseController):
+    """
+    Runs one motor with pigpio's PWM, for a timed number of steps or until stopped.
+
+    With HardwarePwmChannels, a STEP pin driven by a hardware PWM channel uses hardware_PWM
+    (exact frequency and duty, high step rates) while it owns the channel, and software
+    PWM otherwise. Software PWM runs at the closest frequency of the daemon's table; moves
+    are timed and reported with the frequency actually applied (read back from pigpiod),
+    not the requested one.
+
+    With a ScriptLibrary, short moves without ramp (jogging) run as a STEP_BURST script
+    inside pigpiod instead: enable, direction and the exact number of steps are started
+    with a single run_script call. Bursts are counted moves as well: the steps the script
+    emitted are published once, when it ends or is stopped.
+
+    With a WaveLibrary and the shared WaveTransmitter, other finite moves are exact as well:
+    each profile segment is one single-pin wave of one step looped `steps` times in a
+    wave_chain, so the delivered count is hardware timed and does not depend on how fast
+    this thread wakes up. When another controller is transmitting waves, moves fall back
+    to the script (short moves) or to the timed PWM. Timed moves are never counted: their
+    status events say counted=False, so trackers estimate their position (or read it from
+    a StepCounter), and the steps they make are only as exact as the PWM timing.
+    """
+
+    MAX_SCRIPT_STEPS = 2000  # longer moves are looped waves, or the timed PWM
+    PWM_RANGE = 255          # pigpio default dutycycle range
+    SCRIPT_POLL_S = 0.001    # script_status polling when a burst is still running after its predicted end
+    TX_END_GUARD_S = 0.0002  # margin after the predicted end of a chain before confirming it
+    TX_POLL_S = 0.0005
+    POSITION_INTERVAL_S = 0.05
+
     def __init__(self,
                  dispatcher: EventDispatcher,
                  thread_manager: ThreadManagerProtocol,
@@ -18,7 +60,11 @@ class SinglePWMController(BaseController):
                  controller_id: int,
                  pin_step: int,
                  pin_forward: int,
-                 pin_enable: int):
+                 pin_enable: int,
+                 scripts: Optional[ScriptLibrary] = None,
+                 wave_library: Optional[WaveLibrary] = None,
+                 transmitter: Optional[WaveTransmitter] = None,
+                 hardware_pwm: Optional[HardwarePwmChannels] = None):
         super().__init__(dispatcher, pi, thread_manager)
 
         """
@@ -32,18 +78,39 @@ class SinglePWMController(BaseController):
         self.__pin_step = pin_step
         self.__pin_forward = pin_forward
         self.__pin_enable = pin_enable
-        self.__run_freq_hz = 0
+        self.__run_freq_hz: float = 0  # applied step rate
 
         self.__forward_movement: Optional[bool] = None
+        self.__motion_profile = MotionProfile()
+        self.__scripts = scripts
+        self.__wave_library = wave_library
+        self.__transmitter = transmitter
+        self.__chain_encoder = ChainEncoder()
+        self.__wave_keys: list[WaveKey] = []  # waves pinned while the transmitter is ours
+        self.__counted = False  # steps reported with ControllerStepsEvent
+        self.__hardware_pwm = hardware_pwm
+        self.__on_hardware_pwm = False  # the STEP pin owns its hardware PWM channel
+        self.__software_frequencies: Optional[SoftwarePwmFrequencies] = None  # probed once per connection
+        self.__progress_lock = threading.RLock()
+        self.__part_progress: Optional[ChainProgress] = None  # transmitting chain part
+        self.__part_started_at = 0.0
+        self.__part_reported = 0
+        self.__burst_steps: Optional[int] = None  # steps of the running script burst, until published
 
         self.pi.write(self.__pin_enable, 0)   # ensure initially the service is stopped
 
+    @BaseController.pi.setter
+    def pi(self, value: pigpio.pi):
+        BaseController.pi.fset(self, value)
+        self.__software_frequencies = None
+
     def _emit_status_update(self):
         self._event_dispatcher.emit_async(ControllerStatusEvent(
             motor_id=self.__controller_id,
-            status=self.__status,
+            status=self.status,
             freq_hz=self.__run_freq_hz,
-            direction=self.__forward_movement)
+            direction=self.__forward_movement,
+            counted=self.__counted)
         )
 
     def is_motor_in_use(self, motor_id: int) -> bool:
@@ -51,10 +118,19 @@ class SinglePWMController(BaseController):
 
     def stop(self) -> bool:
         try:
+            if self.__scripts is not None and self.__burst_steps is not None:
+                self.__scripts.stop(EScript.STEP_BURST, self.__controller_id)
+                # Steps emitted before the stop, before the motor is reported stopped
+                self.__publish_burst_steps()
+            if self.__transmitter is not None and self.__transmitter.owner is self:
+                self.pi.wave_tx_stop()
+                # Steps up to the stop, before the motor is reported stopped
+                self.__publish_part_steps()
+                self.__release_waves()
+
             # Disable services
-            self.pi.set_PWM_dutycycle(int(self.__pin_step), 0)
+            self.__stop_pwm()
             self.pi.write(self.__pin_enable, 1)
-            # self.__pi.hardware_PWM(self.__pin_step, 0, 0)
 
             # Interrupt the wait if any (case infinite)
             self._abort_event.set()
@@ -79,14 +155,31 @@ class SinglePWMController(BaseController):
         direction = kwargs.get("direction", True)
         steps = kwargs.get("steps", 1)
         duty = kwargs.get("duty", 50)
+        ramp = kwargs.get("ramp")
 
         if freq_hz == 0:
             raise ValueError("Frequency cannot be 0")
 
+        # Finite moves with a ramp run their profile segment by segment, otherwise one segment at freq_hz
+        segments: list[ProfileSegment] = [ProfileSegment(freq_hz=freq_hz, steps=steps)]
+        if steps > 0 and ramp is not None and ramp.accel > 0:
+            segments = self.__motion_profile.build(steps=steps,
+                                                   cruise_hz=freq_hz,
+                                                   accel=ramp.accel,
+                                                   start_hz=ramp.start_hz,
+                                                   end_hz=ramp.end_hz,
+                                                   jerk=ramp.jerk)
+
+        if self.__scripts is not None and 0 < steps <= self.MAX_SCRIPT_STEPS and len(segments) == 1:
+            self.__run_script(steps, freq_hz, direction, duty)
+            return
+        if steps > 0 and self.__run_waves(segments, direction, duty):
+            return
+
         def worker():
             try:
-                self.__run_freq_hz = freq_hz
                 self.__forward_movement = direction
+                self.__counted = False  # timed, not an exact count
                 self._abort_event.clear()
 
                 # Enable services
@@ -98,24 +191,21 @@ class SinglePWMController(BaseController):
                 #Start running
                 print(f"Starting motor: {self.__controller_id} at {freq_hz} Hz for {steps} steps, pin used: {self.__pin_step}")
 
-                # result = self.__pi.hardware_PWM(self.__pin_step, int(freq_hz), int(self.duty * 10_000))
-
-                self.pi.set_PWM_frequency(int(self.__pin_step), int(freq_hz))
-                result = self.pi.set_PWM_dutycycle(int(self.__pin_step), duty)
-
-                if result != 0:
-                    # Something went wrong
-                    print(f"Error starting PWM: {self.__controller_id} code: {result}")
-                    raise Exception(f"Error starting PWM: {self.__controller_id} code: {result}")
-
+                self.__run_freq_hz = self.__start_pwm(segments[0].freq_hz, duty)
                 self.status = EMotorStatus.RUNNING
 
                 # NOT Infinite
                 if steps > 0:
-                    # Sleep the thread for the calculated duration to move the desired steps
-                    duration = steps / freq_hz
-                    # print(f"Moving motor: {self.__controller_id}, {steps} steps for {duration} seconds")
-                    self._abort_event.wait(duration)
+                    # Sleep the thread for the calculated duration of each segment to move the desired steps
+                    for index, segment in enumerate(segments):
+                        if index > 0:
+                            self.__run_freq_hz = self.__set_pwm_frequency(segment.freq_hz, duty)
+                            # Trackers re-base their estimate on every frequency change
+                            self._emit_status_update()
+                        # print(f"Moving motor: {self.__controller_id}, {segment.steps} steps for {segment.duration_s} seconds")
+                        # Timed with the applied rate, the requested one may not exist in software PWM
+                        if self._abort_event.wait(segment.steps / self.__run_freq_hz):
+                            break
                     self.stop()
                 else:
                     print(f"Started infinite movement: {self.__controller_id}")
@@ -125,4 +215,221 @@ class SinglePWMController(BaseController):
                 self.stop()
                 raise e
         self._thread_manager.start_background_task(worker)
-        # threading.Thread(target=worker, daemon=True).start()
\ No newline at end of file
+        # threading.Thread(target=worker, daemon=True).start()
+
+    # -------------------- PWM --------------------
+    def __start_pwm(self, freq_hz: float, duty: int) -> float:
+        """Start the STEP pulses, on the hardware channel of the pin when it is free. Returns the applied rate."""
+        if self.__hardware_pwm is not None and self.__hardware_pwm.supports(self.__pin_step):
+            self.__on_hardware_pwm = self.__hardware_pwm.acquire(self.__pin_step, self)
+            if not self.__on_hardware_pwm:
+                print(f"Hardware PWM channel of GPIO {self.__pin_step} is in use, motor {self.__controller_id} uses software PWM")
+        if self.__on_hardware_pwm:
+            return self.__set_pwm_frequency(freq_hz, duty)
+
+        applied_hz = self.__set_pwm_frequency(freq_hz, duty)
+        if applied_hz != freq_hz:
+            print(f"Motor {self.__controller_id}: software PWM runs at {applied_hz} Hz instead of {freq_hz} Hz")
+        result = self.pi.set_PWM_dutycycle(int(self.__pin_step), duty)
+        if result != 0:
+            # Something went wrong
+            print(f"Error starting PWM: {self.__controller_id} code: {result}")
+            raise Exception(f"Error starting PWM: {self.__controller_id} code: {result}")
+        return applied_hz
+
+    def __set_pwm_frequency(self, freq_hz: float, duty: int) -> float:
+        """Set the step rate and return the rate pigpiod actually applied."""
+        if self.__on_hardware_pwm:
+            self.pi.hardware_PWM(int(self.__pin_step),
+                                 int(round(freq_hz)),
+                                 duty * HardwarePwmChannels.MAX_DUTY // self.PWM_RANGE)
+            return float(self.pi.get_PWM_frequency(int(self.__pin_step)))
+
+        if self.__software_frequencies is None:
+            self.__software_frequencies = SoftwarePwmFrequencies.probe(self.pi, int(self.__pin_step))
+        target_hz = self.__software_frequencies.best(freq_hz)
+        self.pi.set_PWM_frequency(int(self.__pin_step), int(round(target_hz)))
+        applied_hz = self.pi.get_PWM_frequency(int(self.__pin_step))
+        # pigpiod reports the table entry rounded to whole Hz (312.5 -> 313)
+        return target_hz if abs(applied_hz - target_hz) < 1 else float(applied_hz)
+
+    def __stop_pwm(self) -> None:
+        if not self.__on_hardware_pwm:
+            self.pi.set_PWM_dutycycle(int(self.__pin_step), 0)
+            return
+        self.pi.hardware_PWM(int(self.__pin_step), 0, 0)
+        # Back to a low output, for waves, scripts and software PWM
+        self.pi.write(int(self.__pin_step), 0)
+        self.__hardware_pwm.release(self.__pin_step, self)
+        self.__on_hardware_pwm = False
+
+    def __run_script(self, steps: int, freq_hz: int, direction: bool, duty: int) -> None:
+        """Start the whole move with one run_script call and wait for its predicted end in the background."""
+        period_us = max(2, int(round(1_000_000 / freq_hz)))
+        high_us = min(period_us - 1, max(1, period_us * duty // self.PWM_RANGE))
+
+        self.__run_freq_hz = int(freq_hz)
+        self.__forward_movement = direction
+        self.__counted = True
+        self._abort_event.clear()
+
+        with self.__progress_lock:
+            self.__burst_steps = steps
+        self.__scripts.run(EScript.STEP_BURST, self.__controller_id, [
+            self.__pin_step, self.__pin_forward, self.__pin_enable, 1 if direction else 0,
+            steps, high_us, period_us - high_us
+        ])
+        self.status = EMotorStatus.RUNNING
+
+        def worker():
+            try:
+                if self._abort_event.wait(steps * period_us / 1_000_000):
+                    return  # stop() already stopped the script
+                while self.__scripts.is_running(EScript.STEP_BURST, self.__controller_id):
+                    if self._abort_event.wait(self.SCRIPT_POLL_S):
+                        return
+                # The script disabled the driver itself, no need for stop()
+                self.__publish_burst_steps()
+                self.__run_freq_hz = 0
+                self.status = EMotorStatus.STOPPED
+                self.__forward_movement = None
+            except Exception as e:
+                print(f"Error running script on motor: {self.__controller_id} {e}")
+                self.stop()
+                raise e
+            finally:
+                self.__counted = False
+        self._thread_manager.start_background_task(worker)
+
+    def __publish_burst_steps(self) -> None:
+        """Emit the steps of the script burst once, exact from the script's own countdown (p9)."""
+        with self.__progress_lock:
+            steps = self.__burst_steps
+            if steps is None:
+                return
+            self.__burst_steps = None
+            params = self.__scripts.params(EScript.STEP_BURST, self.__controller_id)
+            remaining = params[9] if len(params) > 9 else 0
+            done = min(steps, max(0, steps - remaining))
+            if done > 0:
+                self._event_dispatcher.emit_async(ControllerStepsEvent(
+                    motor_id=self.__controller_id,
+                    steps=done,
+                    direction=bool(self.__forward_movement))
+                )
+
+    # -------------------- exact count waves --------------------
+    def __run_waves(self, segments: list[ProfileSegment], direction: bool, duty: int) -> bool:
+        """
+        Run the segments as looped single-pin waves. Returns False, without touching
+        anything, when waves are not available (no library, transmitter busy, chain too large).
+        """
+        if self.__wave_library is None or self.__transmitter is None:
+            return False
+        if not self.__transmitter.acquire(self, blocking=False):
+            print(f"Wave transmitter busy, motor {self.__controller_id} runs with timed PWM")
+            return False
+
+        try:
+            blocks = [ChainBlock(keys=[self.__step_wave_key(segment.freq_hz, duty)], repeat=segment.steps)
+                      for segment in segments if segment.steps > 0]
+            parts = self.__chain_encoder.split(blocks)
+            wave_ids = {key: self.__step_wave_id(key) for block in blocks for key in block.keys}
+        except (RuntimeError, ValueError) as e:
+            print(f"Cannot run motor {self.__controller_id} with waves ({e}), using timed PWM")
+            self.__release_waves()
+            return False
+
+        self.__run_freq_hz = int(segments[0].freq_hz)
+        self.__forward_movement = direction
+        self.__counted = True
+        self._abort_event.clear()
+
+        def worker():
+            try:
+                self.pi.write(self.__pin_enable, 0)
+                self.pi.write(self.__pin_forward, 1 if direction else 0)
+                for index, part in enumerate(parts):
+                    progress = ChainProgress(part)
+                    self.pi.wave_chain(ChainEncoder.encode(part, wave_ids))
+                    with self.__progress_lock:
+                        self.__part_progress = progress
+                        self.__part_started_at = time.monotonic()
+                        self.__part_reported = 0
+                    if index == 0:
+                        self.status = EMotorStatus.RUNNING
+                    if not self.__wait_part():
+                        break
+                self.stop()
+            except Exception as e:
+                print(f"Error running motor: {self.__controller_id} {e}")
+                self.stop()
+                raise e
+            finally:
+                self.__counted = False
+        self._thread_manager.start_background_task(worker)
+        return True
+
+    def __wait_part(self) -> bool:
+        """
+        Wait for the predicted end of the transmitting part, publishing its steps meanwhile.
+        Returns False when the move was aborted (stop() publishes the steps up to the stop).
+        """
+        end_ts = self.__part_started_at + self.__part_progress.duration_us / 1_000_000
+        while (remaining_s := end_ts - time.monotonic()) > 0:
+            if self._abort_event.wait(min(remaining_s, self.POSITION_INTERVAL_S)):
+                return False
+            self.__publish_part_steps()
+
+        if self._abort_event.wait(self.TX_END_GUARD_S):
+            return False
+        while self.pi.wave_tx_busy():
+            if self._abort_event.wait(self.TX_POLL_S):
+                return False
+        self.__publish_part_steps(done=True)
+        return True
+
+    def __publish_part_steps(self, done: bool = False) -> None:
+        """Emit the steps of the transmitting part since the last update, exact from the elapsed time."""
+        with self.__progress_lock:
+            progress = self.__part_progress
+            if progress is None:
+                return
+            if done:
+                steps_by_pin = progress.total
+            else:
+                steps_by_pin = progress.steps_at(int((time.monotonic() - self.__part_started_at) * 1_000_000))
+            steps = steps_by_pin.get(self.__pin_step, 0)
+            if steps > self.__part_reported:
+                self._event_dispatcher.emit_async(ControllerStepsEvent(
+                    motor_id=self.__controller_id,
+                    steps=steps - self.__part_reported,
+                    direction=bool(self.__forward_movement))
+                )
+                self.__part_reported = steps
+
+    def __step_wave_key(self, freq_hz: float, duty: int) -> WaveKey:
+        """One step: a frame of one period with a single pulse on the STEP pin."""
+        period_us = max(2, int(round(1_000_000 / freq_hz)))
+        high_us = min(period_us - 1, max(1, period_us * duty // self.PWM_RANGE))
+        return WaveKey(periods_us=frozenset({(self.__pin_step, Fraction(period_us))}),
+                       pulse_us=high_us,
+                       frame_len_us=period_us)
+
+    def __step_wave_id(self, key: WaveKey) -> int:
+        entry = self.__wave_library.get(key)
+        if entry is None:
+            pulses, scheduled_by_pin = frame_pulses(dict(key.periods_us), key.pulse_us, key.frame_len_us)
+            entry = self.__wave_library.add(key, pulses, scheduled_by_pin)
+        if key not in self.__wave_keys:
+            self.__wave_library.acquire(key)
+            self.__wave_keys.append(key)
+        return entry.wave_id
+
+    def __release_waves(self) -> None:
+        with self.__progress_lock:
+            self.__part_progress = None
+        for key in self.__wave_keys:
+            self.__wave_library.release(key)
+        self.__wave_keys.clear()
+        self.__transmitter.release(self)
@@ -1,15 +1,40 @@
-from typing import Unpack
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Unpack, Optional, Iterator
 
 from core.event.event_dispatcher import EventDispatcher
 from core.thread_manager import ThreadManagerProtocol
 from servomotor.controller.base_controller import BaseController
 import pigpio
-from math import gcd
-from functools import reduce
+from fractions import Fraction
+from math import sqrt
 
 from servomotor.controller.controller_protocol import RunKwargs
 from servomotor.dto.controller_status import EMotorStatus
+from servomotor.dto.pipeline_stats import PipelineStats
+from servomotor.dto.preflight_report import PreflightReport
+from servomotor.dto.ramp_dto import ControllerRampDto
 from servomotor.dto.run_cmd_dto import ControllerRunDto
+from servomotor.event.controller_event import ControllerStatusEvent, ControllerStepsEvent
+from servomotor.motion.dda import DDAEngine
+from servomotor.motion.motion_profile import MotionProfile
+from servomotor.wave.chain_encoder import ChainBlock, ChainEncoder
+from servomotor.wave.chain_progress import ChainProgress
+from servomotor.wave.frame_planner import FramePlannerProtocol, BoundedFramePlanner
+from servomotor.wave.pulse_builder import frame_pulses, scheduled_pulses, frame_windows, max_frame_pulses
+from servomotor.wave.wave_chain import WaveChain
+from servomotor.wave.wave_library import WaveLibrary, WaveKey
+from servomotor.wave.wave_transmitter import WaveTransmitter
+
+
+@dataclass
+class _ChainPart:
+    """Blocks transmitted with one wave_chain: a part of a long move, one move or several short ones."""
+    blocks: list[ChainBlock]
+    motors: list[ControllerRunDto]  # one per step pin
+    new_moves: int                  # moves starting in this part
+    levels: dict[int, int]          # direction/enable levels while it transmits, empty when not driven
 
 
 class WavePWMController(BaseController):
@@ -20,220 +45,683 @@ class WavePWMController(BaseController):
     Usage per move:
         ctrl = WavePWMController(pi)
         ctrl.run(motors=[MotorRun(...), ...], pulse_us=5)
+
+    The frame length comes from a frame planner: BoundedFramePlanner keeps the exact
+    LCM frame when it is small and otherwise approximates the periods within a
+    timing tolerance, so frames stay bounded whatever the motor frequencies.
+
+    With feed_hz the move is coordinated instead: a DDAEngine spreads every axis'
+    steps over the same duration so all axes start and finish together on a
+    straight line.
+
+    With a ramp the path rate follows a trapezoidal/S-curve MotionProfile: each
+    profile segment is planned as its own DDA move and the cruise segment is a
+    single looped block, so fast feeds start and stop without stalling.
+
+    Frame waves are kept in a WaveLibrary between moves, so a move reusing the
+    pins/frequencies of a previous one does not build or upload them again.
+
+    run_pipelined() executes a sequence of moves, planning and uploading move N+1
+    while move N is still transmitting. Consecutive moves that fit in one wave_chain
+    together are chained as one, so nothing at all separates them on the outputs.
+
+    Moves too long for one wave_chain (chain bytes, loop counters or wave ids) are
+    split by a ChainEncoder and streamed the same way, part after part; waves of a
+    finished part are released so the library can delete them and reuse their ids.
+
+    Before anything is uploaded, every move goes through a pre-flight check: pulse
+    counts are bounded from the frame math and compared with wave_get_max_pulses /
+    wave_get_max_cbs, dense frames are cut in smaller waves and the move is split
+    (or a loop unrolled) until each part fits, or the move is rejected.
+
+    Progress is exact without polling pigpiod: the steps of every motor at any moment follow
+    from the planned chain and the time elapsed since it started (ChainProgress). While a chain
+    transmits, the steps done since the last update are published as ControllerStepsEvent at most
+    every position_interval_s, and the exact totals when the chain ends.
+
+    pigpiod has one wave transmitter, shared with other controllers through a WaveTransmitter:
+    a move waits for its turn before chaining anything.
+
+    run_group() starts the motors of a move together: their direction and enable pins are written
+    with one set_bank_1/clear_bank_1 pair once the first part is uploaded, and all step outputs
+    start with its single wave_chain, on the same DMA tick. run_pipelined() drives those pins
+    the same way, writing the levels that change between two chains right before the second.
     """
 
+    TX_END_GUARD_S = 0.0002     # margin after the predicted end of a chain before confirming it
+    TX_POLL_S = 0.0005          # wave_tx_busy polling when a chain is still busy after its predicted end
+    POSITION_INTERVAL_S = 0.05  # steps are published at most this often per chain
+    BANK_1_GPIOS = 32           # set_bank_1/clear_bank_1 reach GPIO 0-31
+
     def is_motor_in_use(self, motor_id: int) -> bool:
-        pass
+        return motor_id in self.__run_motors
 
     def _emit_status_update(self):
-        pass
+        running = self.status == EMotorStatus.RUNNING
+        # Planned rate of each axis, not motor.freq_hz: DDA and ramped moves run every axis at its own rate
+        rates_by_pin = self.__current_rates() if running else {}
+        for motor_id, motor in list(self.__run_motors.items()):
+            self._event_dispatcher.emit_async(ControllerStatusEvent(
+                motor_id=motor_id,
+                status=self.status,
+                freq_hz=rates_by_pin.get(motor.gpio_step, 0.0),
+                direction=motor.direction if running else None,
+                counted=True)
+            )
 
     # -------------------- lifecycle --------------------
-    def __init__(self, dispatcher: EventDispatcher, pi: pigpio.pi, thread_manager: ThreadManagerProtocol):
+    def __init__(self,
+                 dispatcher: EventDispatcher,
+                 pi: pigpio.pi,
+                 thread_manager: ThreadManagerProtocol,
+                 wave_library: Optional[WaveLibrary] = None,
+                 frame_planner: Optional[FramePlannerProtocol] = None,
+                 chain_encoder: Optional[ChainEncoder] = None,
+                 max_pulses_per_wave: int = 3000,
+                 position_interval_s: float = POSITION_INTERVAL_S,
+                 transmitter: Optional[WaveTransmitter] = None):
         super().__init__(dispatcher, pi, thread_manager)
 
-        self.__created_wave_ids: list[int] = []
-        self.__chain: list[int] = []
-        self.__period_us_by_pin: dict[int, int] = {}
-        self.__full_frame_cache: dict[frozenset[int], tuple[int, dict[int, int]]] = {}
-        self.__frame_len_us: int = 0  # LCM frame
+        self.__library = wave_library if wave_library is not None else WaveLibrary(pi)
+        self.__transmitter = transmitter if transmitter is not None else WaveTransmitter()
+        self.__frame_planner = frame_planner if frame_planner is not None else BoundedFramePlanner()
+        # Half of the library per part, so the next part can be uploaded while one transmits
+        self.__chain_encoder = chain_encoder if chain_encoder is not None else ChainEncoder(
+            max_waves=max(1, self.__library.capacity // 2))
+        self.__dda = DDAEngine()
+        self.__motion_profile = MotionProfile()
+        self.__max_pulses_per_wave = max_pulses_per_wave
+        self.__active_chains: list[WaveChain] = []  # uploaded/transmitting chain parts, their waves are pinned
+        self.__step_pins: set[int] = set()
+        self.__period_us_by_pin: dict[int, Fraction] = {}
+        self.__frame_len_us: int = 0  # planned frame
+        self.__pipeline_stats = PipelineStats()
+        self.__preflight_reports: list[PreflightReport] = []
+        self.__position_interval_s = position_interval_s
+        self.__run_motors: dict[int, ControllerRunDto] = {}  # motors of the running moves (first move of each)
+        self.__progress_lock = threading.RLock()
+        self.__group_enable_mask = 0  # enable pins of group/pipelined moves, disabled together on stop
+        self.__wave_costs: dict[WaveKey, int] = {}  # pulses of the waves planned by the current call
+
+    @BaseController.pi.setter
+    def pi(self, value: pigpio.pi):
+        BaseController.pi.fset(self, value)
+        self.__library.pi = value
+
+    @property
+    def wave_library(self) -> WaveLibrary:
+        return self.__library
+
+    @property
+    def transmitter(self) -> WaveTransmitter:
+        return self.__transmitter
+
+    @property
+    def preflight_reports(self) -> list[PreflightReport]:
+        """Pre-flight estimates of the moves of the last run()/run_pipelined() call."""
+        return self.__preflight_reports
+
+    @property
+    def pipeline_stats(self) -> PipelineStats:
+        """Gaps between chain transmissions measured by the last run()/run_pipelined() call."""
+        return self.__pipeline_stats
 
     def stop(self) -> None:
-        """Immediate stop of any running chain and put pins safe (STEP low)."""
-        self.pi.wave_tx_stop()
+        """Immediate stop of any running chain and put pins safe (STEP low). A run() waiting for it returns."""
+        # Wake the waiting run() before the transmitter stops, so it never takes the stop for the chain end
+        self._abort_event.set()
+        if self.__transmitter.owner is self:
+            self.pi.wave_tx_stop()
 
-        self.status = EMotorStatus.STOPPED
+        with self.__progress_lock:
+            # Steps of an interrupted chain are accounted up to now, before the motors are reported stopped
+            for chain in list(self.__active_chains):
+                self.__publish_progress(chain)
 
-        self.pi.wave_clear()  # resets internal wave ids to 0.. again
+            self.status = EMotorStatus.STOPPED
+            self.__run_motors.clear()
 
-        self.__created_wave_ids.clear()
-        self.__chain.clear()
-        self.__full_frame_cache.clear()
+            # Waves stay in the library for the next moves, only unpin the ones used by the chains
+            for chain in list(self.__active_chains):
+                self.__release_chain(chain)
 
         # Set STEP pins low
-        for pin in self.__period_us_by_pin.keys():
+        for pin in self.__step_pins:
             self.pi.write(pin, 0)
+        self.__step_pins.clear()
+
+        # Disable the drivers of a group move at once (enable is active low)
+        if self.__group_enable_mask:
+            self.pi.set_bank_1(self.__group_enable_mask)
+            self.__group_enable_mask = 0
 
     # -------------------- public API --------------------
     def run(self, **kwargs: Unpack[RunKwargs]) -> None:
         """
         Execute ONE G-code move: build a composite chain and transmit.
-        Motors with steps==0 are ignored.
+        Motors with steps==0 are ignored. With feed_hz (path steps/s) the axes are
+        interpolated together and each motor's freq_hz is ignored.
         """
+        self.__run_move(kwargs)
 
+    def run_group(self, **kwargs: Unpack[RunKwargs]) -> None:
+        """
+        Execute ONE move like run(), also driving the direction and enable pins of its motors:
+        they are written with one set_bank_1/clear_bank_1 pair right before the single
+        wave_chain that starts every step output, and the drivers are disabled together
+        when the move ends. Pins must be in bank 1 (GPIO 0-31).
+        """
+        self.__run_move(kwargs, group=True)
+
+    def __run_move(self, kwargs: RunKwargs, group: bool = False) -> None:
         # Filter work
         motors = [m for m in kwargs.get("run_cmd", []) if m.steps > 0]
         if not motors:
             return
         pulse_us = kwargs.get("pulse_us", 5)
+        feed_hz = kwargs.get("feed_hz")
+        ramp = kwargs.get("ramp")
+        if group:
+            self.__pin_levels(motors)  # rejected before the current move is stopped
 
+        stats = PipelineStats()
+        self.__pipeline_stats = stats
         try:
-            # 1) Reset pigpio waves and our caches
+            # 1) Stop any previous chain (cached waves are kept)
             self.stop()
             self._abort_event.clear()
 
-            # 2) Compute per-pin periods and the LCM frame
-            self._compute_periods_and_frame(motors)
-            self._assert_pulse_width(pulse_us)
-
-            # 3) Plan the chain (fills self._chain and self._created_wave_ids)
-            self._plan_chain(motors, pulse_us)
+            # 2) Plan, upload and transmit the chain (in several parts for long moves)
+            self.__transmitter.acquire(self)
+            self.__transmit(self.__move_parts([motors], pulse_us, feed_hz, ramp, drive_pins=group), stats)
+        finally:
+            self.stop()
+            self.__transmitter.release(self)
+
+    def __pin_levels(self, motors: list[ControllerRunDto]) -> dict[int, int]:
+        """Levels of the direction and enable pins (active low) of motors, validated for bank writes."""
+        levels: dict[int, int] = {}
+
+        def put(gpio: int, level: int) -> None:
+            if not 0 <= gpio < self.BANK_1_GPIOS:
+                raise ValueError(f"GPIO {gpio} is not in bank 1, motors can not start together")
+            if levels.setdefault(gpio, level) != level:
+                raise ValueError(f"GPIO {gpio} is needed both high and low by the move")
+
+        for m in motors:
+            put(m.gpio_direction, 1 if m.direction else 0)
+            if m.gpio_enable is not None:
+                put(m.gpio_enable, 0)
+        return levels
+
+    def __write_levels(self, part: _ChainPart, written: dict[int, int]) -> None:
+        """Write the levels of part that differ from the written ones with one set_bank_1/clear_bank_1 pair."""
+        set_mask = clear_mask = 0
+        for gpio, level in part.levels.items():
+            if written.get(gpio) == level:
+                continue
+            written[gpio] = level
+            if level:
+                set_mask |= 1 << gpio
+            else:
+                clear_mask |= 1 << gpio
+        # Directions first, the enables go low with the other directions. The wave_chain
+        # round trip that follows outlasts the drivers' direction setup time.
+        if set_mask:
+            self.pi.set_bank_1(set_mask)
+        if clear_mask:
+            self.pi.clear_bank_1(clear_mask)
+        if part.levels:
+            self.__group_enable_mask |= sum(1 << m.gpio_enable for m in part.motors if m.gpio_enable is not None)
+
+    def run_pipelined(self,
+                      moves: list[list[ControllerRunDto]],
+                      pulse_us: int = 5,
+                      feed_hz: Optional[float] = None,
+                      ramp: Optional[ControllerRampDto] = None) -> PipelineStats:
+        """
+        Execute several G-code moves back-to-back. Move N+1 is planned and its waves
+        uploaded while move N transmits, then it is chained as soon as N finishes, or with
+        N when both fit in one chain. The direction and enable pins of every move are written
+        like in run_group(), they must be in bank 1.
+        Returns the measured inter-chain gaps (also available as pipeline_stats).
+        """
+        moves = [[m for m in move if m.steps > 0] for move in moves]
+        moves = [move for move in moves if move]
+        for move in moves:
+            self.__pin_levels(move)
 
-            # 4) Transmit and wait
-            self.pi.wave_chain(self.__chain)
-            self.status = EMotorStatus.RUNNING
+        stats = PipelineStats()
+        self.__pipeline_stats = stats
+        if not moves:
+            return stats
 
-            while self.pi.wave_tx_busy():
-                self._abort_event.wait(0.005)
-                #time.sleep(0.005)
+        try:
+            self.stop()
+            self._abort_event.clear()
+            self.__transmitter.acquire(self)
+            self.__transmit(self.__move_parts(moves, pulse_us, feed_hz, ramp, drive_pins=True), stats)
         finally:
             self.stop()
+            self.__transmitter.release(self)
+        return stats
+
+    def preflight(self, **kwargs: Unpack[RunKwargs]) -> PreflightReport:
+        """
+        Plan a move without uploading or transmitting anything and return the resources it needs.
+        Raises ValueError when the move can not run within pigpio's limits.
+        """
+        motors = [m for m in kwargs.get("run_cmd", []) if m.steps > 0]
+        if not motors:
+            return PreflightReport()
+        _, report = self.__preflight_move(motors, kwargs.get("pulse_us", 5), kwargs.get("feed_hz"), kwargs.get("ramp"))
+        return report
+
+    def __move_parts(self,
+                     moves: list[list[ControllerRunDto]],
+                     pulse_us: int,
+                     feed_hz: Optional[float],
+                     ramp: Optional[ControllerRampDto],
+                     drive_pins: bool = False) -> Iterator[_ChainPart]:
+        """
+        Chain parts of the moves. Every move passes the pre-flight check before the first part is
+        uploaded, waves are built lazily while streaming. The first part of a move joins the last
+        part of the previous one when they fit in one chain and drive the same pins the same way.
+        """
+        self.__wave_costs.clear()
+        levels_by_move = [self.__pin_levels(motors) if drive_pins else {} for motors in moves]
+        planned = [(motors, self.__preflight_move(motors, pulse_us, feed_hz, ramp)) for motors in moves]
+        self.__preflight_reports = [report for _, (_, report) in planned]
+        for motors in moves:
+            for m in motors:
+                self.__run_motors.setdefault(m.controller_id, m)
+
+        pending: Optional[_ChainPart] = None
+        for (motors, (parts, _)), levels in zip(planned, levels_by_move):
+            self.__step_pins.update(m.gpio_step for m in motors)
+            for i, blocks in enumerate(parts):
+                if pending is not None and i == 0:
+                    merged = self.__merge_parts(pending, blocks, motors, levels)
+                    if merged is not None:
+                        pending = merged
+                        continue
+                if pending is not None:
+                    yield pending
+                pending = _ChainPart(blocks=blocks, motors=list(motors), new_moves=1 if i == 0 else 0, levels=levels)
+        if pending is not None:
+            yield pending
+
+    def __merge_parts(self,
+                      part: _ChainPart,
+                      blocks: list[ChainBlock],
+                      motors: list[ControllerRunDto],
+                      levels: dict[int, int]) -> Optional[_ChainPart]:
+        """part followed by the first part of the next move in one chain, None when they do not fit."""
+        motor_by_pin = {m.gpio_step: m for m in part.motors}
+        for m in motors:
+            other = motor_by_pin.get(m.gpio_step)
+            if other is not None and (other.controller_id != m.controller_id or other.direction != m.direction):
+                return None
+        merged_levels = dict(part.levels)
+        for gpio, level in levels.items():
+            if merged_levels.setdefault(gpio, level) != level:
+                return None
+
+        # Streamed with the other chains of the sequence: within half of the resources
+        chains = self.__split(part.blocks + blocks, [], streamed=True)
+        if len(chains) != 1:
+            return None
+        return _ChainPart(blocks=chains[0],
+                          motors=part.motors + [m for m in motors if m.gpio_step not in motor_by_pin],
+                          new_moves=part.new_moves + 1,
+                          levels=merged_levels)
+
+    def __wave_cost(self, key: WaveKey) -> int:
+        """Pulses of a wave, from the library or bounded from the frame math without building it."""
+        if key not in self.__wave_costs:
+            entry = self.__library.peek(key)
+            self.__wave_costs[key] = entry.pulse_count if entry is not None else max_frame_pulses(
+                dict(key.periods_us), key.pulse_us, key.frame_len_us,
+                None if key.caps is None else dict(key.caps), key.window)
+        return self.__wave_costs[key]
+
+    def __split(self, blocks: list[ChainBlock], fallbacks: list[str], streamed: bool = False) -> list[list[ChainBlock]]:
+        """
+        Parts of blocks whose waves fit in pigpiod at the same time. Streamed parts are split
+        within half of the resources, as the next part is uploaded while the previous one
+        still transmits, so are the parts of blocks needing several.
+        """
+        if self.__library.pad_percent is not None:
+            # Every wave takes one fixed slot, the encoder already bounds the waves per part
+            return self.__chain_encoder.split(blocks, fallbacks=fallbacks)
+
+        max_pulses, max_cbs = self.__library.limits()
+        budget = min(max_pulses, max_cbs)  # one control block per pulse
+        if not streamed:
+            parts = self.__chain_encoder.split(blocks, self.__wave_cost, budget, fallbacks)
+            if len(parts) == 1:
+                return parts
+            fallbacks.clear()
+        return self.__chain_encoder.split(blocks, self.__wave_cost, budget // 2, fallbacks)
+
+    def __preflight_move(self,
+                         motors: list[ControllerRunDto],
+                         pulse_us: int,
+                         feed_hz: Optional[float],
+                         ramp: Optional[ControllerRampDto]) -> tuple[list[list[ChainBlock]], PreflightReport]:
+        """
+        Plan a move and split it in parts whose waves fit in pigpiod at the same time, from
+        pulse bounds computed without building any wave.
+        """
+        blocks = self._plan_move(motors, pulse_us, feed_hz, ramp)
+
+        max_pulses, max_cbs = self.__library.limits()
+        report = PreflightReport(max_pulses=max_pulses, max_cbs=max_cbs, max_wave_ids=self.__library.capacity)
+        parts = self.__split(blocks, report.fallbacks)
+        if len(parts) > 1:
+            report.fallbacks.append(f"streamed in {len(parts)} chains")
+
+        all_keys: set[WaveKey] = set()
+        for part in parts:
+            part_keys = {key for block in part for key in block.keys}
+            all_keys |= part_keys
+            report.max_part_waves = max(report.max_part_waves, len(part_keys))
+            report.max_part_pulses = max(report.max_part_pulses, sum(self.__wave_cost(key) for key in part_keys))
+        new_keys = [key for key in all_keys if self.__library.peek(key) is None]
+        report.parts = len(parts)
+        report.waves = len(all_keys)
+        report.new_waves = len(new_keys)
+        report.new_pulses = sum(self.__wave_cost(key) for key in new_keys)
+        return parts, report
+
+    def __transmit(self, parts: Iterator[_ChainPart], stats: PipelineStats) -> None:
+        """
+        Upload and chain parts back-to-back: part N+1 is uploaded while part N transmits and
+        chained as soon as N finishes, then the waves of N are released for reuse. The pin
+        levels of a part that differ from the written ones are set right before it is chained.
+        """
+        current: Optional[WaveChain] = None
+        written: dict[int, int] = {}
+        for part in parts:
+            upcoming = self.__upload_part(part.blocks, part.motors, transmitting=current)
+            if self._abort_event.is_set():
+                return
+
+            end_ts = 0.0
+            if current is not None:
+                end_ts = self.__wait_tx_done(current)
+                if self._abort_event.is_set():
+                    return
+            self.__write_levels(part, written)
+            upcoming.requested_at = time.monotonic()
+            self.pi.wave_chain(upcoming.commands)
+            upcoming.started_at = time.monotonic()
+
+            if current is None:
+                self.status = EMotorStatus.RUNNING
+            else:
+                stats.gaps_us.append(int((upcoming.started_at - end_ts) * 1_000_000))
+                self.__release_chain(current)
+
+            stats.chains += 1
+            stats.moves += part.new_moves
+            current = upcoming
+
+        if current is not None:
+            self.__wait_tx_done(current)
+
+    def __upload_part(self, blocks: list[ChainBlock], motors: list[ControllerRunDto], transmitting: Optional[WaveChain]) -> WaveChain:
+        """
+        Get or create the waves of a part (pinned in the library) and encode its chain.
+        If pigpio runs out of wave resources while another part transmits, wait for that part
+        to finish, drop every cached wave and upload again.
+        """
+        try:
+            return self.__build_chain(blocks, motors)
+        except RuntimeError as e:
+            if transmitting is None:
+                raise
+            print(f"Wave resources exhausted while streaming ({e}), waiting for the current chain")
+
+        self.__wait_tx_done(transmitting)
+        self.__release_chain(transmitting)
+        if not self.__active_chains:
+            self.__library.clear()
+        return self.__build_chain(blocks, motors)
+
+    def __build_chain(self, blocks: list[ChainBlock], motors: list[ControllerRunDto]) -> WaveChain:
+        chain = WaveChain(step_pins=[m.gpio_step for m in motors], motors=motors)
+        self.__active_chains.append(chain)
+        try:
+            wave_ids = {key: self._build_frame_wave(key, chain) for block in blocks for key in block.keys}
+        except RuntimeError:
+            self.__release_chain(chain)
+            raise
+        chain.commands = ChainEncoder.encode(blocks, wave_ids)
+        chain.progress = ChainProgress(blocks)
+        chain.duration_us = chain.progress.duration_us
+        return chain
+
+    def __wait_tx_done(self, chain: WaveChain) -> float:
+        """
+        Block until chain finishes or the move is aborted: sleep until its predicted end (the
+        duration of a chain is exact) and confirm with a single wave_tx_busy call. Short polls
+        only follow when pigpiod started the chain late. Steps are published while waiting and
+        once more, complete, when the chain is done.
+
+        Returns the earliest time the chain can have ended: not before its duration elapsed from
+        the wave_chain request, nor before a wave_tx_busy call that still found it transmitting.
+        """
+        end_ts = chain.started_at + chain.duration_us / 1_000_000
+        earliest_end_ts = chain.requested_at + chain.duration_us / 1_000_000
+        while (remaining_s := end_ts - time.monotonic()) > 0:
+            if self._abort_event.wait(min(remaining_s, self.__position_interval_s)):
+                return earliest_end_ts
+            self.__publish_progress(chain)
+
+        if self._abort_event.wait(self.TX_END_GUARD_S):
+            return earliest_end_ts
+        while True:
+            polled_at = time.monotonic()
+            if not self.pi.wave_tx_busy():
+                break
+            earliest_end_ts = max(earliest_end_ts, polled_at)
+            if self._abort_event.wait(self.TX_POLL_S):
+                return earliest_end_ts
+        # Not busy because of a stop(): it already published the steps done
+        if not self._abort_event.is_set():
+            self.__publish_progress(chain, done=True)
+        return earliest_end_ts
+
+    def __publish_progress(self, chain: WaveChain, done: bool = False) -> None:
+        """Emit the steps each motor of a started chain did since the last update of that chain."""
+        with self.__progress_lock:
+            # A released chain was stopped or completed, its steps are all published
+            if chain.progress is None or chain.started_at <= 0 or chain not in self.__active_chains:
+                return
+            if done:
+                steps_by_pin = chain.progress.total
+            else:
+                steps_by_pin = chain.progress.steps_at(int((time.monotonic() - chain.started_at) * 1_000_000))
+
+            for motor in chain.motors:
+                steps = steps_by_pin.get(motor.gpio_step, 0)
+                delta = steps - chain.reported_by_pin.get(motor.gpio_step, 0)
+                if delta <= 0:
+                    continue
+                chain.reported_by_pin[motor.gpio_step] = steps
+                self._event_dispatcher.emit_async(ControllerStepsEvent(
+                    motor_id=motor.controller_id,
+                    steps=delta,
+                    direction=motor.direction)
+                )
+
+    def __current_rates(self) -> dict[int, float]:
+        """Step rate per pin of the block the transmitting chain plays now."""
+        with self.__progress_lock:
+            started = [chain for chain in self.__active_chains if chain.progress is not None and chain.started_at > 0]
+            if not started:
+                return {}
+            chain = max(started, key=lambda c: c.started_at)
+            return chain.progress.rates_at(int((time.monotonic() - chain.started_at) * 1_000_000))
+
+    def __release_chain(self, chain: WaveChain) -> None:
+        with self.__progress_lock:
+            for key in chain.keys:
+                self.__library.release(key)
+            chain.keys.clear()
+            if chain in self.__active_chains:
+                self.__active_chains.remove(chain)
+
+    def _plan_move(self,
+                   motors: list[ControllerRunDto],
+                   pulse_us: int,
+                   feed_hz: Optional[float] = None,
+                   ramp: Optional[ControllerRampDto] = None) -> list[ChainBlock]:
+        """Compute periods and frame for one move (or each ramp segment) and plan its chain blocks."""
+        blocks: list[ChainBlock] = []
+
+        if ramp is None or ramp.accel <= 0:
+            self._compute_periods_and_frame(motors, feed_hz)
+            self._assert_pulse_width(pulse_us)
+            self._plan_chain(motors, pulse_us, blocks)
+            return blocks
+
+        if not feed_hz:
+            if len(motors) > 1:
+                raise ValueError("Acceleration ramps on several motors require a coordinated move (feed_hz)")
+            feed_hz = motors[0].freq_hz
 
-    # -------------------- math helpers --------------------
-    @staticmethod
-    def _lcm(a: int, b: int) -> int:
-        if a == 0 or b == 0:
-            return 0
-        return abs(a // gcd(a, b) * b)
-
-    @staticmethod
-    def _lcm_many(values: list[int]) -> int:
-        assert values, "LCM requires at least one value"
-        return reduce(WavePWMController._lcm, values)
-
-    def _compute_periods_and_frame(self, motors: list[ControllerRunDto]) -> None:
-        """Compute period (µs) per STEP pin and the macro-frame LCM in µs."""
-        self.__period_us_by_pin = {
-            m.gpio_step: int(round(1_000_000 / m.freq_hz)) for m in motors
-        }
-        self.__frame_len_us = self._lcm_many(list(self.__period_us_by_pin.values()))
+        for segment_motors, segment_feed_hz in self._ramp_segments(motors, feed_hz, ramp):
+            self._compute_periods_and_frame(segment_motors, segment_feed_hz)
+            self._assert_pulse_width(pulse_us)
+            self._plan_chain(segment_motors, pulse_us, blocks)
+        return blocks
+
+    def _ramp_segments(self,
+                       motors: list[ControllerRunDto],
+                       feed_hz: float,
+                       ramp: ControllerRampDto) -> list[tuple[list[ControllerRunDto], float]]:
+        """
+        Split a move along its motion profile: returns (motors with the segment's steps, path feed)
+        per segment. Axis steps are distributed with cumulative rounding so totals stay exact.
+        """
+        path_steps = max(1, int(round(sqrt(sum(m.steps * m.steps for m in motors)))))
+        segments = self.__motion_profile.build(steps=path_steps,
+                                               cruise_hz=feed_hz,
+                                               accel=ramp.accel,
+                                               start_hz=ramp.start_hz,
+                                               end_hz=ramp.end_hz,
+                                               jerk=ramp.jerk)
+        result: list[tuple[list[ControllerRunDto], float]] = []
+        done_path = 0
+        done_by_pin = {m.gpio_step: 0 for m in motors}
+        for segment in segments:
+            done_path += segment.steps
+            segment_motors: list[ControllerRunDto] = []
+            for m in motors:
+                target = m.steps * done_path // path_steps
+                steps = target - done_by_pin[m.gpio_step]
+                if steps > 0:
+                    segment_motors.append(replace(m, steps=steps))
+                    done_by_pin[m.gpio_step] = target
+            if segment_motors:
+                result.append((segment_motors, segment.freq_hz))
+        return result
+
+    # -------------------- frame helpers --------------------
+    def _compute_periods_and_frame(self, motors: list[ControllerRunDto], feed_hz: Optional[float] = None) -> None:
+        """
+        Compute period (µs) per STEP pin and the frame length in µs with the frame planner,
+        or with the DDA engine (one frame = one interpolation block) for coordinated moves.
+        """
+        if feed_hz:
+            plan = self.__dda.plan({m.gpio_step: m.steps for m in motors}, feed_hz).frame
+        else:
+            plan = self.__frame_planner.plan({m.gpio_step: m.freq_hz for m in motors})
+        self.__period_us_by_pin = dict(plan.period_us_by_pin)
+        self.__frame_len_us = plan.frame_len_us
 
     def _assert_pulse_width(self, pulse_us: int) -> None:
-        min_period = min(self.__period_us_by_pin.values())
+        # Pulses are placed at floor(k * period), so consecutive ones are at least floor(period) apart
+        min_period = int(min(self.__period_us_by_pin.values()))
         if pulse_us <= 0 or pulse_us >= min_period:
             raise ValueError(f"pulse_us={pulse_us} must be >0 and < min period ({min_period} µs)")
 
     # -------------------- wave building --------------------
-    def _build_frame_wave(
+    def _frame_wave_keys(
             self,
-            subset_periods_us: dict[int, int],
+            subset_periods_us: dict[int, Fraction],
             pulse_us: int,
             frame_len_us: int,
             cap_pulses_by_pin: dict[int, int] | None = None,
-    ) -> tuple[int, dict[int, int]]:
+    ) -> tuple[list[WaveKey], dict[int, int]]:
         """
-        Build ONE frame wave lasting exactly frame_len_us microseconds.
-
-        subset_periods_us: {pin -> period_us} for active motors in this frame.
-        cap_pulses_by_pin: optional {pin -> max pulses} to schedule in this frame
-                           (used for the final partial frame of a segment).
-        Returns: (wave_id, scheduled_pulses_by_pin)
+        Keys of the waves of one frame. Frames that may need more than max_pulses_per_wave
+        pulses (or more than pigpio allows in one wave) are split in consecutive time
+        windows, one wave each.
+        Returns: (keys in play order, scheduled_pulses_by_pin for the whole frame)
         """
-        events: list[tuple[int, int]] = []  # (time_us, +/- pin_mask)
-        scheduled_by_pin: dict[int, int] = {}
+        wants = scheduled_pulses(subset_periods_us, frame_len_us, cap_pulses_by_pin)
+        max_pulses = min(self.__max_pulses_per_wave, *self.__library.wave_limits())
+        windows = frame_windows(subset_periods_us, pulse_us, frame_len_us, cap_pulses_by_pin, max_pulses)
 
-        for pin, T in subset_periods_us.items():
-            pulses_in_full = frame_len_us // T
-            want = pulses_in_full if cap_pulses_by_pin is None else min(
-                pulses_in_full, cap_pulses_by_pin.get(pin, 0)
-            )
-            scheduled_by_pin[pin] = want
-            for k in range(want):
-                t_on = k * T
-                mask = 1 << pin
-                events.append((t_on, mask))  # ON
-                events.append((t_on + pulse_us, -mask))  # OFF
-
-        # No events? Create a dummy wait frame, useful for edge cases
-        if not events:
-            self.pi.wave_add_generic([pigpio.pulse(0, 0, frame_len_us)])
-            wave_id = self.pi.wave_create()
-            self._assert_wave_id(wave_id)
-            self.__created_wave_ids.append(wave_id)
-            return wave_id, {pin: 0 for pin in subset_periods_us.keys()}
-
-        # Consolidate by time
-        by_time: dict[int, tuple[int, int]] = {}  # t -> (on_mask, off_mask)
-        for t, m in events:
-            on_mask, off_mask = by_time.get(t, (0, 0))
-            if m > 0:
-                on_mask |= m
-            else:
-                off_mask |= (-m)
-            by_time[t] = (on_mask, off_mask)
-
-        # Build pulses
-        pulses: list[pigpio.pulse] = []
-        last_t = 0
-        for t in sorted(by_time.keys()):
-            gap = t - last_t
-            if gap > 0:
-                pulses.append(pigpio.pulse(0, 0, gap))
-            on_mask, off_mask = by_time[t]
-            if on_mask:
-                pulses.append(pigpio.pulse(on_mask, 0, 0))
-            if off_mask:
-                pulses.append(pigpio.pulse(0, off_mask, 0))
-            last_t = t
-        tail = frame_len_us - last_t
-        if tail > 0:
-            pulses.append(pigpio.pulse(0, 0, tail))
-
-        self.pi.wave_add_generic(pulses)
-        wave_id = self.pi.wave_create()
-        self._assert_wave_id(wave_id)
-        self.__created_wave_ids.append(wave_id)
-        return wave_id, scheduled_by_pin
-
-    def _get_full_frame_wave_for_subset(
-            self, pins_subset: list[int], pulse_us: int
-    ) -> tuple[int, dict[int, int]]:
-        """
-        Returns (wave_id, frame_pulses_by_pin) for this subset of pins.
-        Caches per subset so we reuse the same wave id within this run().
+        periods_us = frozenset(subset_periods_us.items())
+        caps = None if cap_pulses_by_pin is None else frozenset(
+            (pin, cap_pulses_by_pin.get(pin, 0)) for pin in subset_periods_us.keys()
+        )
+        keys = [
+            WaveKey(periods_us=periods_us,
+                    pulse_us=pulse_us,
+                    frame_len_us=frame_len_us,
+                    caps=caps,
+                    window=window)
+            for window in windows
+        ]
+        # Every pulse k < wants[pin] starts inside the frame, so the windows schedule them all
+        return keys, wants
+
+    def _build_frame_wave(self, key: WaveKey, chain: WaveChain) -> int:
         """
-        key = frozenset(pins_subset)
-        cached = self.__full_frame_cache.get(key)
-        if cached:
-            return cached
+        Build ONE frame wave (or one window of it) described by key and return its wave id.
+
+        key.periods_us: {pin -> period_us} for active motors in this frame,
+                        pulse k of a pin starts at floor(k * period_us).
+        key.caps: optional {pin -> max pulses} to schedule in this frame
+                  (used for the final partial frame of a segment).
+        key.window: optional (start_us, end_us), build only the edges of the frame in this range.
 
+        The wave is taken from the library when an identical frame was built
+        before (in this or a previous move) and pinned until the chain is released.
+        """
+        entry = self.__library.get(key)
+        if entry is None:
+            pulses, scheduled_by_pin = frame_pulses(dict(key.periods_us),
+                                                    key.pulse_us,
+                                                    key.frame_len_us,
+                                                    None if key.caps is None else dict(key.caps),
+                                                    key.window)
+            entry = self.__library.add(key, pulses, scheduled_by_pin)
+
+        if key not in chain.keys:
+            self.__library.acquire(key)
+            chain.keys.append(key)
+        return entry.wave_id
+
+    def _full_frame_keys_for_subset(self, pins_subset: list[int], pulse_us: int) -> tuple[list[WaveKey], dict[int, int]]:
+        """Returns (keys, frame_pulses_by_pin) of the full frame for this subset of pins."""
         subset_periods = {p: self.__period_us_by_pin[p] for p in pins_subset}
-        wave_id, frame_counts = self._build_frame_wave(
+        return self._frame_wave_keys(
             subset_periods_us=subset_periods,
             pulse_us=pulse_us,
             frame_len_us=self.__frame_len_us,
             cap_pulses_by_pin=None,
         )
-        self.__full_frame_cache[key] = (wave_id, frame_counts)
-        return wave_id, frame_counts
-
-    # -------------------- chain planning & helpers --------------------
-    @staticmethod
-    def _split_loop_count(n: int) -> list[int]:
-        """Split large loop counts into 16-bit-safe chunks (1..65535) for wave_chain."""
-        parts: list[int] = []
-        while n > 0:
-            chunk = min(n, 65535)
-            parts.append(chunk)
-            n -= chunk
-        return parts
-
-    @staticmethod
-    def _loop_cmd(wave_id: int, repeat: int) -> list[int]:
-        """Encode: 'play wave_id; then repeat it N times'."""
-        lo = repeat & 0xFF
-        hi = (repeat >> 8) & 0xFF
-        return [255, 0, wave_id, 255, 1, lo, hi] #[wave_id, 255, 0, lo, hi]
-
-    @staticmethod
-    def _assert_wave_id(wave_id: int) -> None:
-        if not (0 <= wave_id <= 250):
-            # wave_chain can only encode ids 0..250
-            raise RuntimeError(f"wave_create returned id {wave_id}, cannot be chained")
-
-    def _plan_chain(self, motors: list[ControllerRunDto], pulse_us: int) -> None:
+
+    # -------------------- chain planning --------------------
+    def _plan_chain(self, motors: list[ControllerRunDto], pulse_us: int, blocks: list[ChainBlock]) -> None:
         """
-        Build self._chain by sequencing full-frame loops and at-most-one partial frame
+        Append to blocks the full-frame loops and at-most-one partial frame
         for each active subset until all pins reach zero remaining steps.
         """
         remaining_by_pin: dict[int, int] = {m.gpio_step: m.steps for m in motors}
@@ -244,9 +732,7 @@ class WavePWMController(BaseController):
                 break
 
             # 1) Full-frame for current subset
-            wave_id_full, frame_counts = self._get_full_frame_wave_for_subset(
-                active_pins, pulse_us=pulse_us
-            )
+            full_keys, frame_counts = self._full_frame_keys_for_subset(active_pins, pulse_us=pulse_us)
 
             # How many full frames can we loop before any motor finishes?
             frames_max = min(
@@ -255,8 +741,8 @@ class WavePWMController(BaseController):
             )
 
             if frames_max > 0:
-                for chunk in self._split_loop_count(frames_max):
-                    self.__chain += self._loop_cmd(wave_id_full, chunk)
+                # Any count fits in one block, the encoder nests loops above 65535
+                blocks.append(ChainBlock(keys=full_keys, repeat=frames_max))
                 for p in active_pins:
                     remaining_by_pin[p] -= frame_counts[p] * frames_max
                 continue
@@ -264,13 +750,12 @@ class WavePWMController(BaseController):
             # 2) Final partial frame for this subset (schedule only the leftovers)
             caps = {p: min(remaining_by_pin[p], frame_counts[p]) for p in active_pins}
             subset_periods = {p: self.__period_us_by_pin[p] for p in active_pins}
-            partial_wave_id, scheduled = self._build_frame_wave(
+            partial_keys, scheduled = self._frame_wave_keys(
                 subset_periods_us=subset_periods,
                 pulse_us=pulse_us,
                 frame_len_us=self.__frame_len_us,
                 cap_pulses_by_pin=caps,
             )
-            self.__chain.append(partial_wave_id)
+            blocks.append(ChainBlock(keys=partial_keys))
             for p in active_pins:
                 remaining_by_pin[p] -= scheduled[p]
-
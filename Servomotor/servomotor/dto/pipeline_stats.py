@@ -0,0 +1,19 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class PipelineStats:
+    moves: int = 0
+    chains: int = 0  # wave_chain transmissions, long moves are streamed in several parts
+    # Idle time between consecutive chains, at most: from the earliest time the previous
+    # chain can have ended until the next wave_chain call returned. Moves chained
+    # together in one wave_chain have no gap.
+    gaps_us: list[int] = field(default_factory=list)
+
+    @property
+    def max_gap_us(self) -> int:
+        return max(self.gaps_us, default=0)
+
+    @property
+    def avg_gap_us(self) -> float:
+        return sum(self.gaps_us) / len(self.gaps_us) if self.gaps_us else 0.0
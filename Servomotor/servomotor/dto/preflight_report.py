@@ -0,0 +1,20 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class PreflightReport:
+    """
+    Resources a move needs, estimated before anything is uploaded or transmitted.
+    Pulse counts are upper bounds; these waves use one control block per pulse.
+    """
+    parts: int = 0               # wave_chain transmissions
+    waves: int = 0               # distinct frame waves
+    new_waves: int = 0           # waves not in the library yet, built while streaming
+    new_pulses: int = 0
+    max_part_waves: int = 0
+    max_part_pulses: int = 0
+    # pigpiod limits the move was checked against
+    max_pulses: int = 0
+    max_cbs: int = 0
+    max_wave_ids: int = 0
+    fallbacks: list[str] = field(default_factory=list)
@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class ControllerRampDto:
+    accel: float                    # steps/s²
+    start_hz: float = 0.0
+    end_hz: Optional[float] = None  # None => same as start_hz
+    jerk: Optional[float] = None    # steps/s³, None => trapezoidal ramps
@@ -9,12 +9,27 @@ from servomotor.dto.controller_status import EMotorStatus
 class ControllerStatusEvent:
     motor_id: int
     status: EMotorStatus
-    freq_hz: int
+    freq_hz: float  # applied step rate
     direction: Optional[bool] # True => Clockwise, False => Counter-clockwise, None => stopped
+    counted: bool = False # True => the controller reports exact steps with ControllerStepsEvent
 
 @dataclass
 class ControllerPositionEvent:
     motor_id: int
     position: int
     delta: int
-    direction: Optional[bool]  # True => Clockwise, False => Counter-clockwise, None => stopped
\ No newline at end of file
+    direction: Optional[bool]  # True => Clockwise, False => Counter-clockwise, None => stopped
+
+@dataclass
+class ControllerSegmentEvent:
+    motor_id: int
+    start_position: int
+    direction: bool   # True => Clockwise, False => Counter-clockwise
+    freq_hz: float    # steps/s from start_ts on, 0 => unknown (the next segment or position event tells)
+    start_ts: float   # wall-clock time (time.time()) of start_position
+
+@dataclass
+class ControllerStepsEvent:
+    motor_id: int
+    steps: int        # steps done since the previous event of the motor
+    direction: bool   # True => Clockwise, False => Counter-clockwise
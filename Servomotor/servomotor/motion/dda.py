@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+from fractions import Fraction
+from functools import reduce
+from math import gcd, sqrt
+
+from servomotor.wave.frame_planner import FramePlan
+
+
+@dataclass
+class DDAPlan:
+    """
+    Coordinated move made of `repeats` identical blocks.
+
+    Inside a block every pin emits block_steps_by_pin[pin] pulses, pulse k at
+    floor(k * block_us / block_steps) (error diffusion, no per-pulse rounding), so all
+    axes start at t=0 and finish together at the end of each block and of the move.
+    """
+    frame: FramePlan
+    repeats: int
+    steps_by_pin: dict[int, int]
+
+    @property
+    def block_us(self) -> int:
+        return self.frame.frame_len_us
+
+    @property
+    def duration_us(self) -> int:
+        return self.block_us * self.repeats
+
+    @property
+    def block_steps_by_pin(self) -> dict[int, int]:
+        return {pin: self.frame.pulses_per_frame(pin) for pin in self.frame.period_us_by_pin}
+
+
+class DDAEngine:
+    """
+    Digital differential analyzer for straight multi-axis moves.
+
+    feed_hz is the path rate in steps per second along the move vector, i.e. the
+    move lasts sqrt(sum(steps^2)) / feed_hz seconds. Each axis gets its exact step
+    count spread evenly over that duration. The move is split into gcd(steps)
+    identical blocks so the pulse pattern stays compact and can be chain-looped.
+    """
+
+    def plan(self, steps_by_pin: dict[int, int], feed_hz: float) -> DDAPlan:
+        steps_by_pin = {pin: steps for pin, steps in steps_by_pin.items() if steps > 0}
+        if not steps_by_pin:
+            raise ValueError("DDA move requires at least one axis with steps > 0")
+        if feed_hz <= 0:
+            raise ValueError(f"feed_hz must be > 0, got {feed_hz}")
+
+        path_steps = sqrt(sum(steps * steps for steps in steps_by_pin.values()))
+        duration_us = path_steps * 1_000_000 / feed_hz
+
+        repeats = reduce(gcd, steps_by_pin.values())
+        block_steps = {pin: steps // repeats for pin, steps in steps_by_pin.items()}
+        # Whole-microsecond block; total duration error is at most repeats / 2 µs
+        block_us = max(max(block_steps.values()), int(round(duration_us / repeats)))
+
+        periods = {pin: Fraction(block_us, steps) for pin, steps in block_steps.items()}
+        achieved_us = block_us * repeats
+        frame = FramePlan(frame_len_us=block_us,
+                          period_us_by_pin=periods,
+                          max_error=abs(achieved_us - duration_us) / duration_us)
+        return DDAPlan(frame=frame, repeats=repeats, steps_by_pin=dict(steps_by_pin))
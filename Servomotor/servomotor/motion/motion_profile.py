@@ -0,0 +1,167 @@
+from dataclasses import dataclass
+from math import sqrt
+from typing import Optional
+
+
+@dataclass
+class ProfileSegment:
+    freq_hz: float
+    steps: int
+
+    @property
+    def duration_s(self) -> float:
+        return self.steps / self.freq_hz
+
+
+class MotionProfile:
+    """
+    Turns (steps, start/cruise/end frequency, accel and optional jerk limit) into a short
+    list of constant-frequency segments.
+
+    Each ramp is cut in at most `ramp_segments` velocity bands; a band runs at the average
+    rate of the ideal profile inside it, so ramp duration is preserved. The cruise part is a
+    single segment, which the wave controller emits as one looped wave.
+
+    Units: frequencies in steps/s, accel in steps/s², jerk in steps/s³. Without jerk the ramps
+    are trapezoidal (constant acceleration), with jerk they are S-curves.
+    """
+
+    INTEGRATION_SAMPLES = 400
+
+    def __init__(self, ramp_segments: int = 16):
+        if ramp_segments <= 0:
+            raise ValueError("ramp_segments must be > 0")
+        self.__ramp_segments = ramp_segments
+
+    def build(self,
+              steps: int,
+              cruise_hz: float,
+              accel: float,
+              start_hz: float = 0.0,
+              end_hz: Optional[float] = None,
+              jerk: Optional[float] = None) -> list[ProfileSegment]:
+        """Return the segments of a move, their steps always add up to `steps`."""
+        if steps <= 0:
+            return []
+        if cruise_hz <= 0:
+            raise ValueError(f"cruise_hz must be > 0, got {cruise_hz}")
+        end_hz = start_hz if end_hz is None else end_hz
+        start_hz = min(max(0.0, start_hz), cruise_hz)
+        end_hz = min(max(0.0, end_hz), cruise_hz)
+
+        # No ramp requested
+        if accel <= 0:
+            return [ProfileSegment(freq_hz=cruise_hz, steps=steps)]
+
+        # Lower the cruise rate until both ramps fit in the move (triangular/short profile)
+        peak_hz = cruise_hz
+        if self._ramp_steps(start_hz, peak_hz, accel, jerk) + self._ramp_steps(end_hz, peak_hz, accel, jerk) > steps:
+            low, high = max(start_hz, end_hz), cruise_hz
+            for _ in range(40):
+                mid = (low + high) / 2
+                if self._ramp_steps(start_hz, mid, accel, jerk) + self._ramp_steps(end_hz, mid, accel, jerk) > steps:
+                    high = mid
+                else:
+                    low = mid
+            peak_hz = low
+
+        accel_segments = self._ramp_segments(start_hz, peak_hz, accel, jerk)
+        decel_segments = list(reversed(self._ramp_segments(end_hz, peak_hz, accel, jerk)))
+
+        ramp_steps = sum(s.steps for s in accel_segments) + sum(s.steps for s in decel_segments)
+        cruise_steps = steps - ramp_steps
+        if cruise_steps < 0:
+            # Rounding of the ramps can overshoot by a few steps, trim the decel side first
+            decel_segments = self._trim(decel_segments, -cruise_steps)
+            cruise_steps = 0
+
+        segments = accel_segments
+        if cruise_steps > 0:
+            segments = segments + [ProfileSegment(freq_hz=peak_hz, steps=cruise_steps)]
+        return self._merge(segments + decel_segments)
+
+    # -------------------- ramp helpers --------------------
+    def _ramp_samples(self, v0: float, v1: float, accel: float, jerk: Optional[float]) -> list[tuple[float, float]]:
+        """Sample (velocity, distance) along a ramp from v0 up to v1."""
+        dv = v1 - v0
+        if dv <= 0:
+            return [(v1, 0.0)]
+
+        if not jerk or jerk <= 0:
+            # v² = v0² + 2·a·d
+            return [(v, (v * v - v0 * v0) / (2 * accel))
+                    for v in (v0 + dv * i / self.INTEGRATION_SAMPLES for i in range(self.INTEGRATION_SAMPLES + 1))]
+
+        # S-curve: accel ramps up at `jerk`, holds `a_max`, ramps down. Short ramps never reach accel.
+        a_max = min(accel, sqrt(jerk * dv))
+        t_jerk = a_max / jerk
+        t_const = max(0.0, dv / a_max - t_jerk)
+        total = 2 * t_jerk + t_const
+
+        def velocity(t: float) -> float:
+            if t < t_jerk:
+                return v0 + jerk * t * t / 2
+            if t < t_jerk + t_const:
+                return v0 + a_max * t_jerk / 2 + a_max * (t - t_jerk)
+            r = total - t
+            return v1 - jerk * r * r / 2
+
+        samples = [(v0, 0.0)]
+        distance = 0.0
+        dt = total / self.INTEGRATION_SAMPLES
+        prev_v = v0
+        for i in range(1, self.INTEGRATION_SAMPLES + 1):
+            v = velocity(i * dt)
+            distance += (prev_v + v) / 2 * dt
+            samples.append((v, distance))
+            prev_v = v
+        return samples
+
+    def _ramp_steps(self, v0: float, v1: float, accel: float, jerk: Optional[float]) -> float:
+        return self._ramp_samples(v0, v1, accel, jerk)[-1][1]
+
+    def _ramp_segments(self, v0: float, v1: float, accel: float, jerk: Optional[float]) -> list[ProfileSegment]:
+        samples = self._ramp_samples(v0, v1, accel, jerk)
+        if len(samples) < 2:
+            return []
+
+        def distance_at(v: float) -> float:
+            for (va, da), (vb, db) in zip(samples, samples[1:]):
+                if vb >= v:
+                    return da if vb == va else da + (db - da) * (v - va) / (vb - va)
+            return samples[-1][1]
+
+        segments: list[ProfileSegment] = []
+        emitted = 0
+        for i in range(1, self.__ramp_segments + 1):
+            band_start = v0 + (v1 - v0) * (i - 1) / self.__ramp_segments
+            band_end = v0 + (v1 - v0) * i / self.__ramp_segments
+            band_steps = int(round(distance_at(band_end))) - emitted
+            if band_steps > 0:
+                # Mean rate of the band (exact for constant accel, close for S-curves)
+                segments.append(ProfileSegment(freq_hz=max((band_start + band_end) / 2, 1.0), steps=band_steps))
+                emitted += band_steps
+        return segments
+
+    @staticmethod
+    def _trim(segments: list[ProfileSegment], steps: int) -> list[ProfileSegment]:
+        result = [ProfileSegment(s.freq_hz, s.steps) for s in segments]
+        for seg in sorted(result, key=lambda s: -s.freq_hz):
+            take = min(seg.steps, steps)
+            seg.steps -= take
+            steps -= take
+            if steps == 0:
+                break
+        return [s for s in result if s.steps > 0]
+
+    @staticmethod
+    def _merge(segments: list[ProfileSegment]) -> list[ProfileSegment]:
+        merged: list[ProfileSegment] = []
+        for seg in segments:
+            if seg.steps <= 0:
+                continue
+            if merged and abs(merged[-1].freq_hz - seg.freq_hz) < 1e-9:
+                merged[-1].steps += seg.steps
+            else:
+                merged.append(ProfileSegment(seg.freq_hz, seg.steps))
+        return merged
@@ -0,0 +1,50 @@
+import threading
+from typing import Optional
+
+
+class HardwarePwmChannels:
+    """
+    The two hardware PWM channels of the Raspberry Pi and the header GPIOs they drive.
+
+    hardware_PWM gives exact frequencies (up to MHz) and duty cycles, unlike the software PWM
+    whose frequencies come from a small table depending on pigpiod's sample rate. Each channel
+    outputs one frequency: GPIO12 and GPIO18 share PWM0, GPIO13 and GPIO19 share PWM1, so a
+    channel is owned by one GPIO at a time and the other one has to use software PWM.
+
+    pigpiod must pace waves and software PWM with the PCM clock (its default, -t 1) for the
+    PWM peripheral to be free.
+    """
+
+    CHANNEL_BY_GPIO = {12: 0, 18: 0, 13: 1, 19: 1}
+    MAX_DUTY = 1_000_000  # hardware_PWM duty range
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__owners: dict[int, tuple[int, object]] = {}  # channel -> (gpio, owner)
+
+    @classmethod
+    def supports(cls, gpio: int) -> bool:
+        return gpio in cls.CHANNEL_BY_GPIO
+
+    def owner(self, gpio: int) -> Optional[object]:
+        """Owner of the channel of gpio, whichever GPIO it drives."""
+        taken = self.__owners.get(self.CHANNEL_BY_GPIO.get(gpio, -1))
+        return taken[1] if taken is not None else None
+
+    def acquire(self, gpio: int, owner: object) -> bool:
+        """Take the channel of gpio, False when the GPIO has none or another owner drives it."""
+        channel = self.CHANNEL_BY_GPIO.get(gpio)
+        if channel is None:
+            return False
+        with self.__lock:
+            taken = self.__owners.get(channel)
+            if taken is not None and taken != (gpio, owner):
+                return False
+            self.__owners[channel] = (gpio, owner)
+            return True
+
+    def release(self, gpio: int, owner: object) -> None:
+        channel = self.CHANNEL_BY_GPIO.get(gpio)
+        with self.__lock:
+            if channel is not None and self.__owners.get(channel) == (gpio, owner):
+                del self.__owners[channel]
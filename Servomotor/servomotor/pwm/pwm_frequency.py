@@ -0,0 +1,42 @@
+import pigpio
+
+
+class SoftwarePwmFrequencies:
+    """
+    Frequencies pigpiod's software PWM can produce.
+
+    They depend on the daemon's sample rate (-s, 5 µs by default): 40000 / sample_us Hz divided
+    by one of 18 fixed divisors, e.g. 8000, 4000, 2000, 1600, 1000 ... 10 Hz at 5 µs.
+    set_PWM_frequency silently rounds to the nearest one in Hz, so a controller timing a move
+    with the requested frequency delivers a different number of steps.
+    """
+
+    DIVISORS = (1, 2, 4, 5, 8, 10, 16, 20, 25, 32, 40, 50, 80, 100, 160, 200, 400, 800)
+    BASE_HZ = 40_000  # highest frequency at a 1 µs sample rate
+    PROBE_HZ = 1_000_000  # above any table, set_PWM_frequency answers with the highest entry
+
+    def __init__(self, sample_us: int):
+        if sample_us <= 0:
+            raise ValueError(f"sample_us must be > 0, got {sample_us}")
+        self.__sample_us = sample_us
+        self.__table = [self.BASE_HZ / sample_us / divisor for divisor in self.DIVISORS]
+
+    @classmethod
+    def probe(cls, pi: pigpio.pi, gpio: int) -> "SoftwarePwmFrequencies":
+        """Read the daemon's table from the highest frequency it accepts on gpio (PWM must be off)."""
+        highest_hz = pi.set_PWM_frequency(gpio, cls.PROBE_HZ)
+        return cls(max(1, int(round(cls.BASE_HZ / highest_hz))))
+
+    @property
+    def sample_us(self) -> int:
+        return self.__sample_us
+
+    @property
+    def table(self) -> list[float]:
+        return list(self.__table)
+
+    def best(self, freq_hz: float) -> float:
+        """Table frequency with the smallest relative error to freq_hz (what matters for step timing)."""
+        if freq_hz <= 0:
+            raise ValueError(f"freq_hz must be > 0, got {freq_hz}")
+        return min(self.__table, key=lambda f: max(f, freq_hz) / min(f, freq_hz))
@@ -0,0 +1,147 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Hashable
+
+from core.thread_manager import ThreadManagerProtocol
+
+# Called with the timestamp of the tick (shared by the batch), returns False to be unscheduled
+TickCallback = Callable[[float], bool]
+
+
+@dataclass(eq=False)
+class _Job:
+    key: Hashable
+    callback: TickCallback
+    interval_ticks: int
+    due_tick: int
+
+
+class TickScheduler:
+    """
+    One background task running every periodic job (drift checks of counted position
+    trackers) instead of one loop per motor.
+
+    Jobs sit in a timer wheel: slot = due tick % slots, so scheduling, cancelling and
+    rescheduling a job is O(1) whatever the number of moving axes. The task sleeps until
+    the next occupied slot (not every tick) and runs the batch of jobs due there with the
+    same timestamp. It ends when no job is left and restarts on the next schedule().
+    """
+
+    TICK_S = 0.01      # wheel resolution
+    WHEEL_SLOTS = 64   # jobs due further than a round wait for their round in the slot
+
+    def __init__(self, thread_manager: ThreadManagerProtocol, tick_s: float = TICK_S, slots: int = WHEEL_SLOTS):
+        if tick_s <= 0 or slots <= 0:
+            raise ValueError(f"tick_s and slots must be > 0, got {tick_s} and {slots}")
+        self.__thread_manager = thread_manager
+        self.__tick_s = tick_s
+        self.__lock = threading.Lock()
+        self.__wake = threading.Event()
+        self.__slots: list[dict[Hashable, _Job]] = [{} for _ in range(slots)]
+        self.__jobs: dict[Hashable, _Job] = {}
+        self.__origin = time.monotonic()
+        self.__last_tick = 0  # last tick processed
+        self.__running = False
+
+    @property
+    def tick_s(self) -> float:
+        return self.__tick_s
+
+    @property
+    def job_count(self) -> int:
+        return len(self.__jobs)
+
+    def schedule(self, key: Hashable, callback: TickCallback, interval_s: float) -> None:
+        """Run callback every interval_s (rounded to ticks) from now on, replacing any job of key."""
+        with self.__lock:
+            self.__remove(key)
+            interval_ticks = self.__to_ticks(interval_s)
+            job = _Job(key=key, callback=callback, interval_ticks=interval_ticks,
+                       due_tick=self.__now_tick() + interval_ticks)
+            self.__jobs[key] = job
+            self.__insert(job)
+            if not self.__running:
+                self.__running = True
+                self.__last_tick = self.__now_tick()
+                self.__thread_manager.start_background_task(self.__run)
+        self.__wake.set()
+
+    def set_interval(self, key: Hashable, interval_s: float) -> None:
+        """New period of a scheduled job, effective from its next run."""
+        with self.__lock:
+            job = self.__jobs.get(key)
+            if job is not None:
+                job.interval_ticks = self.__to_ticks(interval_s)
+
+    def cancel(self, key: Hashable) -> None:
+        with self.__lock:
+            self.__remove(key)
+
+    def is_scheduled(self, key: Hashable) -> bool:
+        return key in self.__jobs
+
+    def __run(self) -> None:
+        while True:
+            self.__wake.clear()
+            with self.__lock:
+                if not self.__jobs:
+                    self.__running = False
+                    return
+                next_tick = self.__next_due_tick()
+            sleep_s = self.__origin + next_tick * self.__tick_s - time.monotonic()
+            if sleep_s > 0 and self.__wake.wait(sleep_s):
+                continue  # a job was added, it may be due earlier
+
+            now_ts = time.monotonic()
+            with self.__lock:
+                due = self.__pop_due(self.__now_tick())
+            for job in due:
+                try:
+                    keep = job.callback(now_ts)
+                except Exception as e:
+                    print(f"Error running scheduled job {job.key}: {e}")
+                    keep = False
+                with self.__lock:
+                    # Not put back when cancelled or replaced while it ran
+                    if self.__jobs.get(job.key) is not job:
+                        continue
+                    if keep is False:
+                        del self.__jobs[job.key]
+                        continue
+                    job.due_tick = self.__last_tick + job.interval_ticks
+                    self.__insert(job)
+
+    def __next_due_tick(self) -> int:
+        """First tick after the last processed one with a due job, at most one round ahead."""
+        slots = len(self.__slots)
+        for offset in range(1, slots + 1):
+            tick = self.__last_tick + offset
+            if any(job.due_tick <= tick for job in self.__slots[tick % slots].values()):
+                return tick
+        return self.__last_tick + slots
+
+    def __pop_due(self, now_tick: int) -> list[_Job]:
+        """Remove from the wheel the jobs due up to now_tick (late ticks included)."""
+        slots = len(self.__slots)
+        due: list[_Job] = []
+        for offset in range(1, min(now_tick - self.__last_tick, slots) + 1):
+            slot = self.__slots[(self.__last_tick + offset) % slots]
+            for key in [key for key, job in slot.items() if job.due_tick <= now_tick]:
+                due.append(slot.pop(key))
+        self.__last_tick = max(self.__last_tick, now_tick)
+        return due
+
+    def __insert(self, job: _Job) -> None:
+        self.__slots[job.due_tick % len(self.__slots)][job.key] = job
+
+    def __remove(self, key: Hashable) -> None:
+        job = self.__jobs.pop(key, None)
+        if job is not None:
+            self.__slots[job.due_tick % len(self.__slots)].pop(key, None)
+
+    def __now_tick(self) -> int:
+        return int((time.monotonic() - self.__origin) / self.__tick_s)
+
+    def __to_ticks(self, interval_s: float) -> int:
+        return max(1, int(round(interval_s / self.__tick_s)))
@@ -0,0 +1,117 @@
+import time
+from enum import Enum
+from threading import RLock
+from typing import Hashable
+
+import pigpio
+
+
+class EScript(str, Enum):
+    """
+    Scripts run inside pigpiod, one socket call (run_script) starts a whole sequence.
+
+    STEP_BURST parameters:
+        p0 STEP gpio, p1 DIR gpio, p2 ENABLE gpio (low = enabled), p3 DIR level,
+        p4 steps, p5 high time µs, p6 low time µs
+    Enables the driver, sets the direction, emits p4 pulses and disables the driver again.
+    p9 counts down the pulses still to emit (read with params()), also after stop_script.
+    Timing comes from pigpiod's delays, not from DMA,
+    so bursts are meant for short moves such as jogging.
+    """
+    STEP_BURST = "step_burst"
+
+
+SCRIPT_SOURCES: dict[EScript, str] = {
+    EScript.STEP_BURST: (
+        "W p2 0 W p1 p3 MICS 20 "       # enable, direction and its setup time
+        "LD p9 p4 "
+        "TAG 0 LDA p9 JZ 1 "
+        "W p0 1 DCR p9 MICS p5 W p0 0 MICS p6 "  # counted on the rising edge
+        "JMP 0 "
+        "TAG 1 W p2 1"
+    ),
+}
+
+
+class ScriptLibrary:
+    """
+    Keeps pigpio scripts stored in pigpiod.
+
+    pigpiod runs one instance of a script at a time, so every owner (e.g. a motor) gets its
+    own copy of each script. Scripts are stored with store_script by load() at startup, or on
+    first use, and started with a single run_script call afterwards.
+    """
+
+    MAX_SCRIPTS = 32     # pigpiod limit
+    INIT_POLL_S = 0.001  # a stored script can only run once pigpiod has compiled it
+    INIT_TIMEOUT_S = 1.0
+
+    def __init__(self, pi: pigpio.pi):
+        self.__lock = RLock()
+        self.__pi = pi
+        self.__script_ids: dict[tuple[EScript, Hashable], int] = {}
+
+    @property
+    def pi(self) -> pigpio.pi:
+        return self.__pi
+
+    @pi.setter
+    def pi(self, value: pigpio.pi):
+        """A new connection may point to a restarted daemon, scripts are stored again on use."""
+        with self.__lock:
+            self.__pi = value
+            self.__script_ids.clear()
+
+    def load(self, owners: list[Hashable]) -> None:
+        """Store every script for every owner."""
+        for owner in owners:
+            for script in EScript:
+                self.script_id(script, owner)
+
+    def script_id(self, script: EScript, owner: Hashable) -> int:
+        """Id of the owner's copy of script, stored in pigpiod if needed."""
+        with self.__lock:
+            script_id = self.__script_ids.get((script, owner))
+            if script_id is None:
+                if len(self.__script_ids) >= self.MAX_SCRIPTS:
+                    raise RuntimeError(f"Cannot store more than {self.MAX_SCRIPTS} pigpio scripts")
+                script_id = self.__pi.store_script(SCRIPT_SOURCES[script].encode())
+                self.__wait_ready(script_id)
+                self.__script_ids[(script, owner)] = script_id
+            return script_id
+
+    def run(self, script: EScript, owner: Hashable, params: list[int]) -> None:
+        self.__pi.run_script(self.script_id(script, owner), params)
+
+    def is_running(self, script: EScript, owner: Hashable) -> bool:
+        script_id = self.__script_ids.get((script, owner))
+        if script_id is None:
+            return False
+        status, _ = self.__pi.script_status(script_id)
+        return status in (pigpio.PI_SCRIPT_RUNNING, pigpio.PI_SCRIPT_WAITING)
+
+    def params(self, script: EScript, owner: Hashable) -> list[int]:
+        """Current p0..p9 of the owner's copy of script, as left by its last run."""
+        script_id = self.__script_ids.get((script, owner))
+        if script_id is None:
+            return []
+        _, params = self.__pi.script_status(script_id)
+        return list(params)
+
+    def stop(self, script: EScript, owner: Hashable) -> None:
+        script_id = self.__script_ids.get((script, owner))
+        if script_id is not None:
+            self.__pi.stop_script(script_id)
+
+    def __wait_ready(self, script_id: int) -> None:
+        deadline = time.monotonic() + self.INIT_TIMEOUT_S
+        while True:
+            status, _ = self.__pi.script_status(script_id)
+            if status != pigpio.PI_SCRIPT_INITING:
+                break
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Script {script_id} was not ready after {self.INIT_TIMEOUT_S} s")
+            time.sleep(self.INIT_POLL_S)
+        if status == pigpio.PI_SCRIPT_FAILED:
+            self.__pi.delete_script(script_id)
+            raise RuntimeError(f"Script {script_id} failed to compile")
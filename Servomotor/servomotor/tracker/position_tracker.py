@@ -1,31 +1,69 @@
-import threading
 from threading import RLock
 from typing import Optional
 import time
 
 from core.event.event_dispatcher import EventDispatcher
 from core.thread_manager import ThreadManagerProtocol
-from servomotor.event.controller_event import ControllerPositionEvent
+from servomotor.event.controller_event import ControllerPositionEvent, ControllerSegmentEvent
+from servomotor.scheduler.tick_scheduler import TickScheduler
+from servomotor.tracker.step_counter import StepCounter
 
 
 class PositionTracker:
-    def __init__(self, controller_id: int, dispatcher: EventDispatcher,  thread_manager: ThreadManagerProtocol):
+    """
+    Position of one motor.
+
+    Nothing is emitted periodically while moving: a ControllerSegmentEvent (start position,
+    direction, rate, start time) lets clients interpolate the position until the next segment,
+    sent when the rate changes or when the real position drifts more than CORRECTION_STEPS
+    from the current segment. A single ControllerPositionEvent with the exact position
+    corrects it when the motion ends.
+
+    Estimated motions compute elapsed time * frequency whenever the position is read. That
+    is exactly the segment clients interpolate, so nothing runs periodically for them. With a
+    StepCounter they use the pulses counted on the STEP gpio instead, so start/stop latency and
+    PWM frequency rounding do not drift the position; a job of a TickScheduler, shared by all
+    trackers, then compares them with the segment about every UPDATE_STEPS steps (within
+    MIN/MAX_UPDATE_S). Counted motions check the drift on every advance().
+    """
+
+    CORRECTION_STEPS = 20
+    UPDATE_STEPS = 50
+    MIN_UPDATE_S = 0.02
+    MAX_UPDATE_S = 0.2
+
+    def __init__(self,
+                 controller_id: int,
+                 dispatcher: EventDispatcher,
+                 thread_manager: ThreadManagerProtocol,
+                 scheduler: Optional[TickScheduler] = None,
+                 step_counter: Optional[StepCounter] = None):
         self.__pos_lock = RLock()
         self.__motion_lock = RLock()
 
-        self.__thread_manager = thread_manager
+        # Only motions measured by a StepCounter have a drift to check periodically
+        self.__scheduler: Optional[TickScheduler] = None
+        if step_counter is not None:
+            self.__scheduler = scheduler if scheduler is not None else TickScheduler(thread_manager)
+        self.__step_counter = step_counter
         self._event_dispatcher = dispatcher
 
         self.__controller_id = controller_id
         self.__current_steps = 0
 
         # motion context
-        self.__stop_event = threading.Event()
         self.__active: bool = False
         self.__dir_sign: int = 1                     # +1 fwd, -1 rev
         self.__start_ts: Optional[float] = None      # monotonic start
         self.__freq_hz: Optional[float] = None
         self.__applied_steps: int = 0                # steps have already applied since start
+        self.__count_start: int = 0                  # step counter value at start
+        self.__motion_start_steps: int = 0           # position when the motion began
+
+        # segment sent to clients
+        self.__segment_steps: int = 0
+        self.__segment_ts: float = 0.0               # monotonic
+        self.__segment_freq_hz: float = 0.0
 
     @property
     def controller_id(self) -> int:
@@ -33,9 +71,14 @@ class PositionTracker:
 
     @property
     def position(self) -> int:
+        self.__tick()
         with self.__pos_lock:
             return self.__current_steps
 
+    @property
+    def is_active(self) -> bool:
+        return self.__active
+
     def set_home(self) -> None:
         with self.__pos_lock:
             self.__current_steps = 0
@@ -60,8 +103,6 @@ class PositionTracker:
             print(f"PositionTracker for motor {self.__controller_id} is already running.")
             return
 
-        self.__stop_event.clear()
-
         with self.__motion_lock:
             self.__active = True
             self.__current_steps = current_position
@@ -69,33 +110,126 @@ class PositionTracker:
             self.__freq_hz = float(freq_hz)
             self.__start_ts = time.monotonic()
             self.__applied_steps = 0
+            self.__motion_start_steps = current_position
+            self.__emit_segment(self.__start_ts, freq_hz)
+            if self.__step_counter is None:
+                return
+            self.__count_start = self.__step_counter.count
+
+        self.__scheduler.schedule(self, self.__scheduled_tick, self.__update_interval_s(freq_hz))
+
+    def begin_counted_motion(self, current_position: int, forward: bool, freq_hz: float = 0.0) -> None:
+        """
+        Start a motion whose steps are reported by the controller with advance(),
+        instead of being estimated from a frequency. Nothing is scheduled.
+        freq_hz: expected step rate sent to clients, 0 when unknown
+        """
+        if self.__active:
+            print(f"PositionTracker for motor {self.__controller_id} is already running.")
+            return
+
+        with self.__motion_lock:
+            self.__active = True
+            self.__current_steps = current_position
+            self.__dir_sign = +1 if forward else -1
+            self.__freq_hz = None
+            self.__start_ts = None
+            self.__applied_steps = 0
+            self.__motion_start_steps = current_position
+            self.__emit_segment(time.monotonic(), max(0.0, float(freq_hz)))
+
+    def advance(self, steps: int, forward: bool) -> None:
+        """Apply steps reported by the controller during a counted motion."""
+        with self.__motion_lock:
+            if not self.__active or self.__freq_hz is not None or steps <= 0:
+                return
+
+            self.__dir_sign = +1 if forward else -1
+            with self.__pos_lock:
+                self.__current_steps += self.__dir_sign * steps
+
+            self.__applied_steps += steps
+
+            self.__check_drift(time.monotonic())
+
+    def change_frequency(self, freq_hz: float) -> None:
+        """Account the steps done at the previous rate and keep estimating at freq_hz (ramps)."""
+        if freq_hz <= 0:
+            raise ValueError(f"freq_hz must be > 0, got {freq_hz}")
 
-        self.__thread_manager.start_background_task(self.__start_thread)
+        with self.__motion_lock:
+            if not self.__active or self.__freq_hz is None:
+                return  # not running, or a counted motion
+            now_ts = time.monotonic()
+            self.__tick(now_ts)
+            if self.__step_counter is None:
+                self.__start_ts = now_ts
+                self.__applied_steps = 0
+            self.__freq_hz = float(freq_hz)
+            self.__emit_segment(now_ts, freq_hz)
+        if self.__scheduler is not None:
+            self.__scheduler.set_interval(self, self.__update_interval_s(freq_hz))
 
     def finish_motion(self) -> None:
         """Call after PWM stops or on abort to account actual steps from elapsed time * freq."""
+        if self.__scheduler is not None:
+            self.__scheduler.cancel(self)
         with self.__motion_lock:
-            self.__stop_event.set()
-            if not self.__active or self.__start_ts is None or self.__freq_hz is None:
+            if not self.__active:
                 return
 
-            # flush any remaining delta
+            # flush any remaining delta (counted motions are already up to date)
             self.__tick(time.monotonic())
 
+            # the correction: exact position of the end of the motion
+            self._event_dispatcher.emit_async(ControllerPositionEvent(
+                motor_id=self.__controller_id,
+                position=self.__current_steps,
+                delta=abs(self.__current_steps - self.__motion_start_steps),
+                direction=True if self.__dir_sign > 0 else False)
+            )
+
             # reset context
             self.__active = False
             self.__dir_sign = +1
             self.__start_ts = None
             self.__freq_hz = None
 
-    def __start_thread(self):
-        while not self.__stop_event.is_set() and self.__active:
-            self.__tick()
-            self.__stop_event.wait(0.05)
+    def __scheduled_tick(self, now_ts: float) -> bool:
+        with self.__motion_lock:
+            self.__tick(now_ts)
+            self.__check_drift(now_ts)
+            return self.__active
+
+    def __emit_segment(self, now_ts: float, freq_hz: float) -> None:
+        """Start a new segment at the current position. Assumes motion_lock is held."""
+        self.__segment_steps = self.__current_steps
+        self.__segment_ts = now_ts
+        self.__segment_freq_hz = float(freq_hz)
+        self._event_dispatcher.emit_async(ControllerSegmentEvent(
+            motor_id=self.__controller_id,
+            start_position=self.__segment_steps,
+            direction=self.__dir_sign > 0,
+            freq_hz=self.__segment_freq_hz,
+            start_ts=time.time() - (time.monotonic() - now_ts))
+        )
+
+    def __check_drift(self, now_ts: float) -> None:
+        """Send a new segment when clients' interpolation is off by more than CORRECTION_STEPS."""
+        if not self.__active:
+            return
+        elapsed = now_ts - self.__segment_ts
+        predicted = self.__segment_steps + self.__dir_sign * int(elapsed * self.__segment_freq_hz)
+        if abs(self.__current_steps - predicted) > self.CORRECTION_STEPS and elapsed > 0:
+            # Continue at the rate measured over the segment, the announced one was off
+            self.__emit_segment(now_ts, abs(self.__current_steps - self.__segment_steps) / elapsed)
+
+    def __update_interval_s(self, freq_hz: float) -> float:
+        return min(self.MAX_UPDATE_S, max(self.MIN_UPDATE_S, self.UPDATE_STEPS / freq_hz))
 
     def __tick(self, now_ts: Optional[float] = None) -> int:
         """
-        Public on-demand update. Call this as often as required (e.g., every 5 ms).
+        On-demand update, e.g. when the position is read.
         Updates _current_steps in memory. Returns applied delta.
         """
         with self.__motion_lock:
@@ -113,14 +247,6 @@ class PositionTracker:
                 self.__current_steps += self.__dir_sign * delta
 
             self.__applied_steps += delta
-
-            self._event_dispatcher.emit_async(ControllerPositionEvent(
-                motor_id=self.__controller_id,
-                position=self.__current_steps,
-                delta=delta,
-                direction=True if self.__dir_sign > 0 else False)
-            )
-
             return delta
 
     def __compute_delta_steps(self, now_ts: float) -> int:
@@ -130,8 +256,11 @@ class PositionTracker:
         """
         assert self.__start_ts is not None and self.__freq_hz is not None
 
-        elapsed = max(0.0, now_ts - self.__start_ts)
-        est_total = int(round(elapsed * self.__freq_hz))  # total estimated since start
+        if self.__step_counter is not None:
+            est_total = self.__step_counter.count - self.__count_start  # pulses really emitted
+        else:
+            elapsed = max(0.0, now_ts - self.__start_ts)
+            est_total = int(round(elapsed * self.__freq_hz))  # total estimated since start
         delta = est_total - self.__applied_steps  # new steps not yet applied
 
         return 0 if delta <= 0 else delta
\ No newline at end of file
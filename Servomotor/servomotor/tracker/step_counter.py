@@ -0,0 +1,56 @@
+from threading import RLock
+
+import pigpio
+
+
+class StepCounter:
+    """
+    Exact number of pulses emitted on a STEP gpio.
+
+    A pigpio tally callback counts the rising edges pigpiod reports, no Python code runs per
+    edge. pigpiod drops edges shorter than a glitch filter, so the gpio gets none. The count
+    keeps growing across motions and reconnections, readers keep their own start value.
+    """
+
+    def __init__(self, pi: pigpio.pi, gpio: int):
+        self.__lock = RLock()
+        self.__gpio = gpio
+        self.__callback = None  # pigpio tally callback of the current connection
+        self.__base = 0  # edges counted by callbacks of previous connections
+        self.__pi = pi
+        self.__register()
+
+    @property
+    def gpio(self) -> int:
+        return self.__gpio
+
+    @property
+    def pi(self) -> pigpio.pi:
+        return self.__pi
+
+    @pi.setter
+    def pi(self, value: pigpio.pi):
+        with self.__lock:
+            self.cancel()
+            self.__pi = value
+            self.__register()
+
+    @property
+    def count(self) -> int:
+        with self.__lock:
+            return self.__base + (self.__callback.tally() if self.__callback is not None else 0)
+
+    def cancel(self) -> None:
+        with self.__lock:
+            if self.__callback is None:
+                return
+            self.__base += self.__callback.tally()
+            try:
+                self.__callback.cancel()
+            except Exception as e:
+                print(f"Error cancelling step counter on GPIO {self.__gpio}: {e}")
+            self.__callback = None
+
+    def __register(self) -> None:
+        self.__pi.set_glitch_filter(self.__gpio, 0)
+        self.__callback = self.__pi.callback(self.__gpio, pigpio.RISING_EDGE)
@@ -0,0 +1,206 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from servomotor.wave.wave_library import WaveKey, WaveLibrary
+
+
+@dataclass
+class ChainBlock:
+    """Frame waves played in order, `repeat` times (a chain loop when repeat > 1)."""
+    keys: list[WaveKey] = field(default_factory=list)
+    repeat: int = 1
+
+    @property
+    def duration_us(self) -> int:
+        return self.repeat * sum(key.duration_us for key in self.keys)
+
+
+@dataclass
+class ChainStats:
+    size: int = 0  # bytes
+    loops: int = 0
+    depth: int = 0
+
+
+class ChainEncoder:
+    """
+    Encodes ChainBlocks as pigpio wave_chain commands and splits long moves in parts.
+
+    Loop counts above 65535 are encoded as nested loops (65535 x q, plus a remainder loop),
+    so a block costs a handful of bytes whatever its repeat count.
+
+    pigpiod accepts chains of about 600 bytes with at most 20 loop counters nested at most
+    10 deep, and a chain may only reference waves that exist while it transmits. split()
+    groups consecutive blocks in parts within those limits, each referencing at most
+    max_waves different waves, so parts can be uploaded and chained one after the other.
+    A part running out of loop counters first plays its shortest loops unrolled, when the
+    chain bytes allow it, instead of starting a new wave_chain (e.g. the many short loops
+    of acceleration ramps).
+    """
+
+    MAX_LOOP_COUNT = 65535
+    MAX_CHAIN_BYTES = 600
+    MAX_CHAIN_LOOPS = 20
+    MAX_LOOP_NESTING = 10
+    MAX_UNROLL = 1000  # loop repeats a too large block may be unrolled into, one part or more each
+
+    def __init__(self,
+                 max_bytes: int = MAX_CHAIN_BYTES,
+                 max_loops: int = MAX_CHAIN_LOOPS,
+                 max_waves: int = (WaveLibrary.MAX_WAVE_ID + 1) // 2):
+        if max_bytes <= 0 or max_loops <= 0 or max_waves <= 0:
+            raise ValueError("max_bytes, max_loops and max_waves must be > 0")
+        self.__max_bytes = max_bytes
+        self.__max_loops = max_loops
+        self.__max_waves = max_waves
+
+    @property
+    def max_waves(self) -> int:
+        return self.__max_waves
+
+    # -------------------- encoding --------------------
+    @staticmethod
+    def loop(body: list[int], repeat: int) -> list[int]:
+        """Commands playing body `repeat` times, without a loop when repeat is 1."""
+        if repeat <= 0:
+            return []
+        if repeat == 1:
+            return list(body)
+        if repeat <= ChainEncoder.MAX_LOOP_COUNT:
+            return [255, 0, *body, 255, 1, repeat & 0xFF, (repeat >> 8) & 0xFF]
+
+        outer, rest = divmod(repeat, ChainEncoder.MAX_LOOP_COUNT)
+        return (ChainEncoder.loop(ChainEncoder.loop(body, ChainEncoder.MAX_LOOP_COUNT), outer)
+                + ChainEncoder.loop(body, rest))
+
+    @staticmethod
+    def encode(blocks: list[ChainBlock], wave_ids: dict[WaveKey, int]) -> list[int]:
+        commands: list[int] = []
+        for block in blocks:
+            commands += ChainEncoder.loop([wave_ids[key] for key in block.keys], block.repeat)
+        return commands
+
+    @staticmethod
+    def stats(commands: list[int]) -> ChainStats:
+        """Bytes, loop counters and maximum loop nesting of encoded chain commands."""
+        result = ChainStats(size=len(commands))
+        depth = 0
+        i = 0
+        while i < len(commands):
+            if commands[i] != 255:
+                i += 1  # wave id
+                continue
+            op = commands[i + 1]
+            if op == 0:
+                depth += 1
+                result.depth = max(result.depth, depth)
+                i += 2
+            elif op == 1:
+                depth -= 1
+                result.loops += 1
+                i += 4
+            else:
+                i += 4 if op == 2 else 2
+        return result
+
+    # -------------------- splitting --------------------
+    def split(self,
+              blocks: list[ChainBlock],
+              wave_cost: Optional[Callable[[WaveKey], int]] = None,
+              max_cost: Optional[int] = None,
+              fallbacks: Optional[list[str]] = None) -> list[list[ChainBlock]]:
+        """
+        Group consecutive blocks in parts that each fit in one wave_chain call.
+
+        wave_cost/max_cost optionally bound the resources (e.g. pulses) of the distinct waves
+        of a part. Blocks over the limits are spread over several parts when they play once,
+        and unrolled (up to MAX_UNROLL repeats) when they loop; fallbacks lists what was done.
+        """
+        parts: list[list[ChainBlock]] = []
+        current: list[ChainBlock] = []
+        current_stats = ChainStats()
+        current_keys: set[WaveKey] = set()
+
+        def cost(keys: set[WaveKey]) -> int:
+            return sum(wave_cost(key) for key in keys) if wave_cost is not None else 0
+
+        pending = deque(blocks)
+        while pending:
+            block = pending.popleft()
+            block_stats = self.stats(self.loop([0] * len(block.keys), block.repeat))
+            block_keys = set(block.keys)
+            if not self.__fits(block_stats, block_keys, cost(block_keys), max_cost):
+                if block.repeat == 1 and len(block.keys) > 1:
+                    # Waves played once can be spread over several parts, a loop can not
+                    pending.extendleft(ChainBlock(keys=[key]) for key in reversed(block.keys))
+                    continue
+                if 1 < block.repeat <= self.MAX_UNROLL and len(block.keys) > 1:
+                    pending.extendleft(ChainBlock(keys=list(block.keys)) for _ in range(block.repeat))
+                    if fallbacks is not None:
+                        fallbacks.append(f"unrolled a loop of {len(block.keys)} waves x {block.repeat}")
+                    continue
+                raise ValueError(f"Chain block of {len(block_keys)} waves x {block.repeat} needs {block_stats.size} bytes, "
+                                 f"{block_stats.loops} loops, {block_stats.depth} nesting levels and "
+                                 f"{cost(block_keys)} wave resources, over the chain limits")
+
+            merged = ChainStats(size=current_stats.size + block_stats.size,
+                                loops=current_stats.loops + block_stats.loops,
+                                depth=max(current_stats.depth, block_stats.depth))
+            merged_keys = current_keys | block_keys
+            if current and not self.__fits(merged, merged_keys, cost(merged_keys), max_cost):
+                unrolled = self.__unroll_loops(current + [block]) if merged.loops > self.__max_loops else None
+                if unrolled is not None and self.__fits(unrolled[1], merged_keys, cost(merged_keys), max_cost):
+                    if fallbacks is not None:
+                        fallbacks.append("unrolled short loops to fit the loop counters")
+                    current, current_stats = unrolled
+                    current_keys = merged_keys
+                    continue
+                parts.append(current)
+                current, merged, merged_keys = [], block_stats, block_keys
+
+            current.append(block)
+            current_stats = merged
+            current_keys = merged_keys
+
+        if current:
+            parts.append(current)
+        return parts
+
+    def __unroll_loops(self, blocks: list[ChainBlock]) -> Optional[tuple[list[ChainBlock], ChainStats]]:
+        """
+        blocks with their cheapest loops (fewest extra bytes once unrolled) played unrolled until
+        they need at most max_loops loop counters, and their stats. None when not possible.
+        """
+        result = list(blocks)
+        stats = self.__total_stats(result)
+
+        def extra_bytes(i: int) -> int:
+            block = result[i]
+            return block.repeat * len(block.keys) - self.stats(self.loop([0] * len(block.keys), block.repeat)).size
+
+        loops = [i for i, block in enumerate(result) if 1 < block.repeat <= self.MAX_UNROLL]
+        for i in sorted(loops, key=extra_bytes):
+            if stats.loops <= self.__max_loops:
+                break
+            stats = ChainStats(size=stats.size + extra_bytes(i), loops=stats.loops - 1, depth=stats.depth)
+            result[i] = ChainBlock(keys=result[i].keys * result[i].repeat)
+        if stats.loops > self.__max_loops:
+            return None
+        return result, self.__total_stats(result)
+
+    def __total_stats(self, blocks: list[ChainBlock]) -> ChainStats:
+        total = ChainStats()
+        for block in blocks:
+            block_stats = self.stats(self.loop([0] * len(block.keys), block.repeat))
+            total = ChainStats(size=total.size + block_stats.size,
+                               loops=total.loops + block_stats.loops,
+                               depth=max(total.depth, block_stats.depth))
+        return total
+
+    def __fits(self, stats: ChainStats, keys: set[WaveKey], cost: int, max_cost: Optional[int]) -> bool:
+        return (stats.size <= self.__max_bytes
+                and stats.loops <= self.__max_loops
+                and stats.depth <= self.MAX_LOOP_NESTING
+                and len(keys) <= self.__max_waves
+                and (max_cost is None or cost <= max_cost))
@@ -0,0 +1,103 @@
+from bisect import bisect_right
+
+from servomotor.wave.chain_encoder import ChainBlock
+from servomotor.wave.pulse_builder import window_pulses
+from servomotor.wave.wave_library import WaveKey
+
+
+class ChainProgress:
+    """
+    Exact steps per pin a chain has emitted after some transmit time, computed from its blocks.
+
+    A chain plays its waves back-to-back with exact durations, so the position inside the
+    chain follows from the elapsed time alone: whole blocks and loop repeats are counted
+    from precomputed totals, and only the wave being played is evaluated, with the same
+    frame math that built it. Nothing is queried from pigpiod.
+    """
+
+    def __init__(self, blocks: list[ChainBlock]):
+        self.__blocks = blocks
+        self.__key_steps: dict[WaveKey, dict[int, int]] = {}
+
+        self.__starts_us: list[int] = []                 # start of each block in the chain
+        self.__repeat_steps: list[dict[int, int]] = []   # steps of one repeat of each block
+        self.__steps_before: list[dict[int, int]] = []   # steps of the blocks before each block
+        total: dict[int, int] = {}
+        elapsed_us = 0
+        for block in blocks:
+            self.__starts_us.append(elapsed_us)
+            self.__steps_before.append(dict(total))
+            repeat_steps: dict[int, int] = {}
+            for key in block.keys:
+                self.__add(repeat_steps, self.__steps_of(key))
+            self.__repeat_steps.append(repeat_steps)
+            self.__add(total, repeat_steps, block.repeat)
+            elapsed_us += block.duration_us
+
+        self.__duration_us = elapsed_us
+        self.__total = total
+
+    @property
+    def duration_us(self) -> int:
+        return self.__duration_us
+
+    @property
+    def total(self) -> dict[int, int]:
+        """Steps per pin of the whole chain."""
+        return dict(self.__total)
+
+    def steps_at(self, elapsed_us: int) -> dict[int, int]:
+        """Steps per pin started in the first elapsed_us of the chain."""
+        if elapsed_us >= self.__duration_us:
+            return self.total
+        if elapsed_us <= 0 or not self.__blocks:
+            return {pin: 0 for pin in self.__total}
+
+        index = bisect_right(self.__starts_us, elapsed_us) - 1
+        block = self.__blocks[index]
+        result = {pin: 0 for pin in self.__total}
+        self.__add(result, self.__steps_before[index])
+
+        repeats, offset_us = divmod(elapsed_us - self.__starts_us[index], block.duration_us // block.repeat)
+        self.__add(result, self.__repeat_steps[index], repeats)
+
+        for key in block.keys:
+            if offset_us < key.duration_us:
+                # The wave being played: only the pulses started before offset_us
+                start_us = key.window[0] if key.window is not None else 0
+                self.__add(result, window_pulses(dict(key.periods_us),
+                                                 key.frame_len_us,
+                                                 None if key.caps is None else dict(key.caps),
+                                                 (start_us, start_us + offset_us)))
+                break
+            self.__add(result, self.__steps_of(key))
+            offset_us -= key.duration_us
+        return result
+
+    def rates_at(self, elapsed_us: int) -> dict[int, float]:
+        """Step rate (steps/s) per pin of the block played after elapsed_us, 0 for pins idle in it."""
+        result = {pin: 0.0 for pin in self.__total}
+        if not self.__blocks:
+            return result
+        index = max(0, min(bisect_right(self.__starts_us, elapsed_us), len(self.__blocks)) - 1)
+        block = self.__blocks[index]
+        repeat_us = block.duration_us // block.repeat
+        if repeat_us > 0:
+            for pin, steps in self.__repeat_steps[index].items():
+                result[pin] = steps * 1_000_000 / repeat_us
+        return result
+
+    def __steps_of(self, key: WaveKey) -> dict[int, int]:
+        steps = self.__key_steps.get(key)
+        if steps is None:
+            steps = window_pulses(dict(key.periods_us),
+                                  key.frame_len_us,
+                                  None if key.caps is None else dict(key.caps),
+                                  key.window)
+            self.__key_steps[key] = steps
+        return steps
+
+    @staticmethod
+    def __add(into: dict[int, int], steps: dict[int, int], times: int = 1) -> None:
+        for pin, count in steps.items():
+            into[pin] = into.get(pin, 0) + count * times
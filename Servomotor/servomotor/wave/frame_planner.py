@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+from fractions import Fraction
+from functools import reduce
+from math import gcd
+from typing import Protocol
+
+
+@dataclass
+class FramePlan:
+    """
+    Repeating frame shared by every STEP pin of a move.
+
+    period_us_by_pin: average pulse spacing per pin. Pulse k of a frame starts at
+                      floor(k * period) µs, so a pin emits exactly frame_len_us / period
+                      pulses per frame. Periods are integers for exact (LCM) plans.
+    max_error: worst relative difference between planned and requested periods.
+    """
+    frame_len_us: int
+    period_us_by_pin: dict[int, Fraction]
+    max_error: float = 0.0
+
+    def pulses_per_frame(self, pin: int) -> int:
+        return int(self.frame_len_us // self.period_us_by_pin[pin])
+
+
+class FramePlannerProtocol(Protocol):
+    def plan(self, freq_hz_by_pin: dict[int, float]) -> FramePlan: ...
+
+
+class LcmFramePlanner(FramePlannerProtocol):
+    """Frame length is the LCM of the per-pin periods rounded to whole microseconds."""
+
+    @staticmethod
+    def _lcm(a: int, b: int) -> int:
+        if a == 0 or b == 0:
+            return 0
+        return abs(a // gcd(a, b) * b)
+
+    @staticmethod
+    def _lcm_many(values: list[int]) -> int:
+        assert values, "LCM requires at least one value"
+        return reduce(LcmFramePlanner._lcm, values)
+
+    @staticmethod
+    def _rounded_periods(freq_hz_by_pin: dict[int, float]) -> dict[int, int]:
+        return {pin: int(round(1_000_000 / f)) for pin, f in freq_hz_by_pin.items()}
+
+    def plan(self, freq_hz_by_pin: dict[int, float]) -> FramePlan:
+        periods = self._rounded_periods(freq_hz_by_pin)
+        frame_len_us = self._lcm_many(list(periods.values()))
+        return FramePlan(frame_len_us=frame_len_us,
+                         period_us_by_pin={pin: Fraction(T) for pin, T in periods.items()},
+                         max_error=_max_error(periods, freq_hz_by_pin))
+
+
+class BoundedFramePlanner(LcmFramePlanner):
+    """
+    Keeps the LCM frame when it is small enough, otherwise picks the shortest frame
+    (up to max_frame_us) where every pin gets a whole number of pulses and the average
+    period stays within `tolerance` of the requested one. Pulses inside the frame are
+    spread with accumulated-error scheduling (floor(k * F / n)).
+
+    max_pulses_per_frame bounds the pigpio pulses a frame wave may need
+    (up to 4 per step: wait, on, wait, off).
+    """
+
+    PULSES_PER_STEP = 4
+
+    def __init__(self, max_frame_us: int = 1_000_000, max_pulses_per_frame: int = 3000, tolerance: float = 0.001):
+        if max_frame_us <= 0 or max_pulses_per_frame <= 0 or tolerance < 0:
+            raise ValueError("max_frame_us and max_pulses_per_frame must be > 0 and tolerance >= 0")
+        self.__max_frame_us = max_frame_us
+        self.__max_pulses_per_frame = max_pulses_per_frame
+        self.__tolerance = tolerance
+
+    def plan(self, freq_hz_by_pin: dict[int, float]) -> FramePlan:
+        lcm_plan = super().plan(freq_hz_by_pin)
+        if self.__fits(lcm_plan.frame_len_us, lcm_plan.period_us_by_pin):
+            return lcm_plan
+
+        targets = {pin: Fraction(1_000_000) / Fraction(f).limit_denominator(1000) for pin, f in freq_hz_by_pin.items()}
+        slowest = max(targets.values())
+
+        best: FramePlan | None = None
+        m = 1
+        while True:
+            frame_len_us = int(round(slowest * m))
+            if frame_len_us > self.__max_frame_us and best is not None:
+                break
+            m += 1
+
+            periods = {pin: Fraction(frame_len_us, max(1, round(frame_len_us / T))) for pin, T in targets.items()}
+            if not self.__fits(frame_len_us, periods) and best is not None:
+                break
+
+            error = _max_error(periods, freq_hz_by_pin)
+            if best is None or error < best.max_error:
+                best = FramePlan(frame_len_us=frame_len_us, period_us_by_pin=periods, max_error=error)
+            if error <= self.__tolerance:
+                break
+
+        if best.max_error > self.__tolerance:
+            print(f"Frame planner: best frame {best.frame_len_us} µs has period error {best.max_error:.4%}, "
+                  f"above tolerance {self.__tolerance:.4%}")
+        return best
+
+    def __fits(self, frame_len_us: int, periods: dict[int, Fraction]) -> bool:
+        steps = sum(frame_len_us // T for T in periods.values())
+        return (frame_len_us <= self.__max_frame_us
+                and steps * self.PULSES_PER_STEP <= self.__max_pulses_per_frame)
+
+
+def _max_error(periods: dict, freq_hz_by_pin: dict[int, float]) -> float:
+    return max(abs(float(periods[pin]) * f / 1_000_000 - 1.0) for pin, f in freq_hz_by_pin.items())
@@ -0,0 +1,244 @@
+from fractions import Fraction
+from math import ceil
+from typing import Optional
+
+import pigpio
+
+
+def scheduled_pulses(
+        subset_periods_us: dict[int, Fraction],
+        frame_len_us: int,
+        cap_pulses_by_pin: dict[int, int] | None = None,
+) -> dict[int, int]:
+    """Pulses per pin in one frame, honoring the optional caps."""
+    wants: dict[int, int] = {}
+    for pin, T in subset_periods_us.items():
+        pulses_in_full = int(frame_len_us // T)
+        wants[pin] = pulses_in_full if cap_pulses_by_pin is None else min(
+            pulses_in_full, cap_pulses_by_pin.get(pin, 0)
+        )
+    return wants
+
+
+def frame_pulses(
+        subset_periods_us: dict[int, Fraction],
+        pulse_us: int,
+        frame_len_us: int,
+        cap_pulses_by_pin: dict[int, int] | None = None,
+        window: tuple[int, int] | None = None,
+) -> tuple[list[pigpio.pulse], dict[int, int]]:
+    """
+    Compute the pigpio pulses of one frame (or of a window of it, with times relative
+    to the window start). Returns: (pulses, scheduled_pulses_by_pin)
+
+    Pulse k of a pin starts at floor(k * period_us), computed in integers.
+    """
+    start_us, end_us = window if window is not None else (0, frame_len_us)
+    wants = scheduled_pulses(subset_periods_us, frame_len_us, cap_pulses_by_pin)
+
+    events: list[tuple[int, int]] = []  # (time_us, +/- pin_mask)
+    scheduled_by_pin: dict[int, int] = {}
+
+    for pin, T in subset_periods_us.items():
+        T = Fraction(T)
+        num, den = T.numerator, T.denominator
+        mask = 1 << pin
+        scheduled = 0
+        for k in _pulse_range(T, wants[pin], pulse_us, start_us, end_us):
+            t_on = k * num // den  # floor(k * T) without building a Fraction per pulse
+            t_off = t_on + pulse_us
+            if start_us <= t_on < end_us:
+                events.append((t_on - start_us, mask))  # ON
+                scheduled += 1
+            if start_us <= t_off < end_us:
+                events.append((t_off - start_us, -mask))  # OFF
+        scheduled_by_pin[pin] = scheduled
+
+    # No events? Create a dummy wait frame, useful for edge cases
+    if not events:
+        return [pigpio.pulse(0, 0, end_us - start_us)], scheduled_by_pin
+
+    # Consolidate by time
+    by_time: dict[int, tuple[int, int]] = {}  # t -> (on_mask, off_mask)
+    for t, m in events:
+        on_mask, off_mask = by_time.get(t, (0, 0))
+        if m > 0:
+            on_mask |= m
+        else:
+            off_mask |= (-m)
+        by_time[t] = (on_mask, off_mask)
+
+    # Build pulses
+    pulses: list[pigpio.pulse] = []
+    last_t = 0
+    for t in sorted(by_time.keys()):
+        gap = t - last_t
+        if gap > 0:
+            pulses.append(pigpio.pulse(0, 0, gap))
+        on_mask, off_mask = by_time[t]
+        if on_mask:
+            pulses.append(pigpio.pulse(on_mask, 0, 0))
+        if off_mask:
+            pulses.append(pigpio.pulse(0, off_mask, 0))
+        last_t = t
+    tail = (end_us - start_us) - last_t
+    if tail > 0:
+        pulses.append(pigpio.pulse(0, 0, tail))
+
+    return pulses, scheduled_by_pin
+
+
+def max_frame_pulses(
+        subset_periods_us: dict[int, Fraction],
+        pulse_us: int,
+        frame_len_us: int,
+        cap_pulses_by_pin: dict[int, int] | None = None,
+        window: tuple[int, int] | None = None,
+) -> int:
+    """
+    Upper bound of len(frame_pulses(...)) computed without building the pulses:
+    every ON or OFF edge inside the window costs at most a wait and a mask pulse, plus the tail wait.
+    """
+    start_us, end_us = window if window is not None else (0, frame_len_us)
+    wants = scheduled_pulses(subset_periods_us, frame_len_us, cap_pulses_by_pin)
+    edges = 0
+    for pin, T in subset_periods_us.items():
+        edges += _edge_count(T, wants[pin], start_us, end_us)                        # ON at floor(k * T)
+        edges += _edge_count(T, wants[pin], start_us - pulse_us, end_us - pulse_us)  # OFF pulse_us later
+    return 2 * edges + 1
+
+
+def window_pulses(
+        subset_periods_us: dict[int, Fraction],
+        frame_len_us: int,
+        cap_pulses_by_pin: dict[int, int] | None = None,
+        window: tuple[int, int] | None = None,
+) -> dict[int, int]:
+    """
+    Pulses per pin starting inside the window (the whole frame by default), computed without
+    building them: the scheduled_pulses_by_pin of frame_pulses(...) for the same window.
+    """
+    start_us, end_us = window if window is not None else (0, frame_len_us)
+    wants = scheduled_pulses(subset_periods_us, frame_len_us, cap_pulses_by_pin)
+    return {pin: _edge_count(T, wants[pin], start_us, end_us) for pin, T in subset_periods_us.items()}
+
+
+def frame_windows(
+        subset_periods_us: dict[int, Fraction],
+        pulse_us: int,
+        frame_len_us: int,
+        cap_pulses_by_pin: dict[int, int] | None = None,
+        max_pulses: int = 3000,
+) -> list[tuple[int, int] | None]:
+    """
+    Time windows to build one frame with waves of at most max_pulses pulses each, halving
+    the windows that are too dense. [None] when the whole frame fits in one wave.
+    """
+    windows: list[tuple[int, int]] = []
+
+    def visit(start_us: int, end_us: int) -> None:
+        if (end_us - start_us <= 1
+                or max_frame_pulses(subset_periods_us, pulse_us, frame_len_us, cap_pulses_by_pin, (start_us, end_us)) <= max_pulses):
+            windows.append((start_us, end_us))
+            return
+        middle = (start_us + end_us) // 2
+        visit(start_us, middle)
+        visit(middle, end_us)
+
+    visit(0, frame_len_us)
+    return [None] if len(windows) == 1 else windows
+
+
+def _edge_count(T: Fraction, want: int, start_us: int, end_us: int) -> int:
+    """Pulses k < want with floor(k * T) in [start_us, end_us), for integer bounds."""
+    first = max(0, ceil(start_us / T))
+    last = min(want, ceil(end_us / T))
+    return max(0, last - first)
+
+
+def _pulse_range(T: Fraction, want: int, pulse_us: int, start_us: int, end_us: int) -> range:
+    """Pulses k that may have an edge inside [start_us, end_us)."""
+    k_first = max(0, int((start_us - pulse_us) // T))
+    k_last = min(want, int(end_us // T) + 1)
+    return range(k_first, k_last)
+
+
+# -------------------- benchmark --------------------
+def _frame_pulses_baseline(
+        subset_periods_us: dict[int, int],
+        pulse_us: int,
+        frame_len_us: int,
+) -> tuple[list[pigpio.pulse], dict[int, int]]:
+    """The original event-list builder of WaveController._build_frame_wave, kept as the benchmark reference."""
+    events: list[tuple[int, int]] = []  # (time_us, +/- pin_mask)
+    scheduled_by_pin: dict[int, int] = {}
+
+    for pin, T in subset_periods_us.items():
+        want = frame_len_us // T
+        scheduled_by_pin[pin] = want
+        for k in range(want):
+            t_on = k * T
+            mask = 1 << pin
+            events.append((t_on, mask))  # ON
+            events.append((t_on + pulse_us, -mask))  # OFF
+
+    by_time: dict[int, tuple[int, int]] = {}  # t -> (on_mask, off_mask)
+    for t, m in events:
+        on_mask, off_mask = by_time.get(t, (0, 0))
+        if m > 0:
+            on_mask |= m
+        else:
+            off_mask |= (-m)
+        by_time[t] = (on_mask, off_mask)
+
+    pulses: list[pigpio.pulse] = []
+    last_t = 0
+    for t in sorted(by_time.keys()):
+        gap = t - last_t
+        if gap > 0:
+            pulses.append(pigpio.pulse(0, 0, gap))
+        on_mask, off_mask = by_time[t]
+        if on_mask:
+            pulses.append(pigpio.pulse(on_mask, 0, 0))
+        if off_mask:
+            pulses.append(pigpio.pulse(0, off_mask, 0))
+        last_t = t
+    tail = frame_len_us - last_t
+    if tail > 0:
+        pulses.append(pigpio.pulse(0, 0, tail))
+    return pulses, scheduled_by_pin
+
+
+def benchmark(freq_hz_by_pin: Optional[dict[int, float]] = None, frame_len_us: int = 1_000_000,
+              pulse_us: int = 5, rounds: int = 5) -> None:
+    """
+    Time frame_pulses on one frame against the original builder and check that they produce the same pulses.
+    The default frequencies divide the frame evenly, so the original integer-period builder is comparable.
+    """
+    import time
+
+    freq_hz_by_pin = freq_hz_by_pin or {12: 1000.0, 13: 800.0, 19: 250.0}
+    periods = {pin: Fraction(1_000_000) / Fraction(f).limit_denominator(1000) for pin, f in freq_hz_by_pin.items()}
+    periods = {pin: Fraction(frame_len_us, max(1, round(frame_len_us / T))) for pin, T in periods.items()}
+    int_periods = {pin: max(1, round(T)) for pin, T in periods.items()}
+
+    def run(builder, builder_periods) -> tuple[float, list[tuple[int, int, int]]]:
+        best = float("inf")
+        pulses = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            pulses, _ = builder(builder_periods, pulse_us, frame_len_us)
+            best = min(best, time.perf_counter() - started)
+        return best, [(p.gpio_on, p.gpio_off, p.delay) for p in pulses]
+
+    baseline_s, baseline_pulses = run(_frame_pulses_baseline, int_periods)
+    print(f"original: {len(baseline_pulses)} pulses in {baseline_s * 1000:.2f} ms")
+
+    builder_s, builder_pulses = run(frame_pulses, periods)
+    print(f"builder:  {len(builder_pulses)} pulses in {builder_s * 1000:.2f} ms ({baseline_s / builder_s:.1f}x)")
+    if all(T.denominator == 1 for T in periods.values()):
+        print("identical to original" if builder_pulses == baseline_pulses else "MISMATCH with original")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,20 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+from servomotor.dto.run_cmd_dto import ControllerRunDto
+from servomotor.wave.chain_progress import ChainProgress
+from servomotor.wave.wave_library import WaveKey
+
+
+@dataclass
+class WaveChain:
+    """One wave_chain transmission (a move or a part of a long one) and the library waves it references."""
+    commands: list[int] = field(default_factory=list)
+    keys: list[WaveKey] = field(default_factory=list)
+    step_pins: list[int] = field(default_factory=list)
+    duration_us: int = 0       # exact transmit time of the commands
+    requested_at: float = 0.0  # time.monotonic() right before wave_chain was called
+    started_at: float = 0.0    # time.monotonic() when wave_chain returned
+    motors: list[ControllerRunDto] = field(default_factory=list)  # motors of the move the chain belongs to
+    progress: Optional[ChainProgress] = None
+    reported_by_pin: dict[int, int] = field(default_factory=dict)  # steps already published per pin
@@ -0,0 +1,216 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from fractions import Fraction
+from threading import RLock
+from typing import Optional
+
+import pigpio
+
+
+@dataclass(frozen=True)
+class WaveKey:
+    """
+    Identity of a frame wave uploaded to pigpiod.
+
+    periods_us: frozenset of (pin, period_us) for the pins pulsed in the frame
+                (periods may be fractional with the bounded frame planner).
+    caps: frozenset of (pin, max_pulses) for partial frames, None for full frames.
+    window: (start_us, end_us) when the frame is split in several waves, None otherwise.
+    """
+    periods_us: frozenset[tuple[int, Fraction]]
+    pulse_us: int
+    frame_len_us: int
+    caps: Optional[frozenset[tuple[int, int]]] = None
+    window: Optional[tuple[int, int]] = None
+
+    @property
+    def duration_us(self) -> int:
+        return self.frame_len_us if self.window is None else self.window[1] - self.window[0]
+
+
+@dataclass
+class WaveEntry:
+    wave_id: int
+    pulses_by_pin: dict[int, int]
+    pulse_count: int
+    cb_count: int
+    ref_count: int = 0  # > 0 while a chain uses the wave, pinned waves are never evicted
+
+
+class WaveLibrary:
+    """
+    Keeps frame waves alive in pigpiod across moves.
+
+    Waves are looked up by WaveKey, so a move that needs a frame already built
+    by a previous move reuses the wave id and skips wave_add_generic/wave_create.
+    Least recently used waves are deleted with wave_delete when a new wave would
+    not fit in pigpio's wave ids, pulses or control blocks.
+
+    pigpiod only reuses the resources of a deleted wave once every higher wave id is
+    deleted too, or for a new wave of exactly the same size. With pad_percent the waves
+    are created with wave_create_and_pad, so each one takes a fixed slot of that share
+    of the resources and a slot freed with wave_delete is reusable right away, even
+    while a chain using other waves is transmitting.
+    """
+
+    MAX_WAVE_ID = 250  # wave_chain can only encode ids 0..250
+
+    def __init__(self, pi: pigpio.pi, max_waves: int = MAX_WAVE_ID + 1, pad_percent: Optional[int] = None):
+        if pad_percent is not None and not (0 < pad_percent <= 100):
+            raise ValueError(f"pad_percent must be in 1..100, got {pad_percent}")
+        self.__lock = RLock()
+        self.__pi = pi
+        self.__max_waves = max_waves
+        self.__pad_percent = pad_percent
+
+        self.__entries: OrderedDict[WaveKey, WaveEntry] = OrderedDict()
+        self.__max_pulses: Optional[int] = None
+        self.__max_cbs: Optional[int] = None
+
+    @property
+    def pi(self) -> pigpio.pi:
+        return self.__pi
+
+    @pi.setter
+    def pi(self, value: pigpio.pi):
+        """A new connection may point to a restarted daemon, forget every known wave."""
+        with self.__lock:
+            self.__pi = value
+            self.__entries.clear()
+            self.__max_pulses = None
+            self.__max_cbs = None
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    @property
+    def capacity(self) -> int:
+        """Most waves that can exist at once (resources permitting without padding)."""
+        if self.__pad_percent is None:
+            return self.__max_waves
+        return min(self.__max_waves, 100 // self.__pad_percent)
+
+    @property
+    def pad_percent(self) -> Optional[int]:
+        return self.__pad_percent
+
+    def limits(self) -> tuple[int, int]:
+        """(pulses, control blocks) pigpiod has for all waves, queried once per connection."""
+        with self.__lock:
+            self.__load_limits()
+            return self.__max_pulses, self.__max_cbs
+
+    def wave_limits(self) -> tuple[int, int]:
+        """(pulses, control blocks) a single wave may use, the slot size when padding."""
+        max_pulses, max_cbs = self.limits()
+        if self.__pad_percent is not None:
+            return max_pulses * self.__pad_percent // 100, max_cbs * self.__pad_percent // 100
+        return max_pulses, max_cbs
+
+    def peek(self, key: WaveKey) -> Optional[WaveEntry]:
+        """Return the cached wave for key without touching the LRU order."""
+        with self.__lock:
+            return self.__entries.get(key)
+
+    def get(self, key: WaveKey) -> Optional[WaveEntry]:
+        """Return the cached wave for key (marking it most recently used) or None."""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+            return entry
+
+    def add(self, key: WaveKey, pulses: list[pigpio.pulse], pulses_by_pin: dict[int, int]) -> WaveEntry:
+        """Upload pulses as a new wave for key, evicting LRU waves until it fits."""
+        with self.__lock:
+            existing = self.get(key)
+            if existing is not None:
+                return existing
+
+            pulse_count = len(pulses)
+            cb_count = self._estimate_cbs(pulses)
+            self.__make_room(pulse_count, cb_count)
+
+            while True:
+                try:
+                    self.__pi.wave_add_generic(pulses)
+                    if self.__pad_percent is None:
+                        wave_id = self.__pi.wave_create()
+                    else:
+                        wave_id = self.__pi.wave_create_and_pad(self.__pad_percent)
+                    break
+                except pigpio.error as e:
+                    # Memory can be fragmented even if the totals fit, drop one more wave and retry
+                    if not self.__evict_one():
+                        raise RuntimeError(f"Cannot create wave with {pulse_count} pulses: {e}") from e
+
+            self._assert_wave_id(wave_id)
+            entry = WaveEntry(wave_id=wave_id,
+                              pulses_by_pin=dict(pulses_by_pin),
+                              pulse_count=pulse_count,
+                              cb_count=cb_count)
+            self.__entries[key] = entry
+            return entry
+
+    def acquire(self, key: WaveKey) -> None:
+        """Pin the wave for key so it is not evicted while a chain references it."""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                entry.ref_count += 1
+
+    def release(self, key: WaveKey) -> None:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry.ref_count > 0:
+                entry.ref_count -= 1
+
+    def clear(self) -> None:
+        """Delete every wave in pigpiod and forget all entries."""
+        with self.__lock:
+            self.__entries.clear()
+            self.__pi.wave_clear()
+
+    # -------------------- budget helpers --------------------
+    @staticmethod
+    def _estimate_cbs(pulses: list[pigpio.pulse]) -> int:
+        """pigpio uses one control block per on mask, off mask and delay of each pulse."""
+        return sum(bool(p.gpio_on) + bool(p.gpio_off) + bool(p.delay) for p in pulses)
+
+    @staticmethod
+    def _assert_wave_id(wave_id: int) -> None:
+        if not (0 <= wave_id <= WaveLibrary.MAX_WAVE_ID):
+            raise RuntimeError(f"wave_create returned id {wave_id}, cannot be chained")
+
+    def __load_limits(self) -> None:
+        if self.__max_pulses is None:
+            self.__max_pulses = self.__pi.wave_get_max_pulses()
+        if self.__max_cbs is None:
+            self.__max_cbs = self.__pi.wave_get_max_cbs()
+
+    def __make_room(self, pulse_count: int, cb_count: int) -> None:
+        max_pulses, max_cbs = self.wave_limits()
+        if pulse_count > max_pulses or cb_count > max_cbs:
+            raise RuntimeError(f"Wave with {pulse_count} pulses / {cb_count} control blocks exceeds pigpio limits "
+                               f"({max_pulses} pulses / {max_cbs} control blocks)")
+
+        def fits() -> bool:
+            if self.__pad_percent is not None:
+                return len(self.__entries) < self.capacity
+            used_pulses = sum(e.pulse_count for e in self.__entries.values())
+            used_cbs = sum(e.cb_count for e in self.__entries.values())
+            return (len(self.__entries) < self.__max_waves
+                    and used_pulses + pulse_count <= self.__max_pulses
+                    and used_cbs + cb_count <= self.__max_cbs)
+
+        while not fits():
+            if not self.__evict_one():
+                raise RuntimeError("Not enough pigpio wave resources, all cached waves are in use")
+
+    def __evict_one(self) -> bool:
+        for key, entry in self.__entries.items():
+            if entry.ref_count == 0:
+                self.__pi.wave_delete(entry.wave_id)
+                del self.__entries[key]
+                return True
+        return False
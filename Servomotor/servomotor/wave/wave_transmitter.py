@@ -0,0 +1,32 @@
+import threading
+from typing import Optional
+
+
+class WaveTransmitter:
+    """
+    pigpiod has a single wave transmitter: wave_chain replaces whatever is transmitting and
+    wave_tx_stop stops it for everyone. Controllers sharing a connection take turns through
+    this arbiter and only stop transmissions they own.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__owner: Optional[object] = None
+
+    @property
+    def owner(self) -> Optional[object]:
+        return self.__owner
+
+    def acquire(self, owner: object, blocking: bool = True, timeout: float = -1) -> bool:
+        if self.__owner is owner:
+            return True
+        if not self.__lock.acquire(blocking, timeout):
+            return False
+        self.__owner = owner
+        return True
+
+    def release(self, owner: object) -> None:
+        if self.__owner is not owner:
+            return
+        self.__owner = None
+        self.__lock.release()
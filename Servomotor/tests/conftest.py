@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from core.event.event_dispatcher import EventDispatcher
+
+
+class FakePi:
+    """
+    pigpio.pi stand-in keeping waves in memory. A chain transmits for the exact duration of its
+    waves and loops, or until wave_tx_stop.
+    """
+
+    def __init__(self):
+        self.connected = True
+        self.calls: list[tuple] = []
+        self.chains: list[list[int]] = []
+        self.__building: list = []
+        self.__waves: dict[int, int] = {}  # wave id -> duration µs
+        self.__tx_end = 0.0
+
+    def __getattr__(self, name):
+        def call(*args):
+            self.calls.append((name, args))
+            return 0
+        return call
+
+    # -------------------- waves --------------------
+    def wave_get_max_pulses(self) -> int:
+        return 12000
+
+    def wave_get_max_cbs(self) -> int:
+        return 25016
+
+    def wave_add_generic(self, pulses) -> int:
+        self.__building += pulses
+        return len(self.__building)
+
+    def wave_create(self) -> int:
+        wave_id = next(i for i in range(251) if i not in self.__waves)
+        self.__waves[wave_id] = sum(p.delay for p in self.__building)
+        self.__building = []
+        return wave_id
+
+    def wave_create_and_pad(self, percent: int) -> int:
+        return self.wave_create()
+
+    def wave_delete(self, wave_id: int) -> int:
+        del self.__waves[wave_id]
+        return 0
+
+    def wave_clear(self) -> int:
+        self.__waves.clear()
+        return 0
+
+    # -------------------- transmission --------------------
+    def wave_chain(self, commands: list[int]) -> int:
+        self.chains.append(list(commands))
+        self.__tx_end = time.monotonic() + self.chain_duration_us(commands) / 1_000_000
+        return 0
+
+    def wave_tx_busy(self) -> int:
+        return 1 if time.monotonic() < self.__tx_end else 0
+
+    def wave_tx_stop(self) -> int:
+        self.calls.append(("wave_tx_stop", ()))
+        self.__tx_end = 0.0
+        return 0
+
+    def chain_duration_us(self, commands: list[int]) -> int:
+        stack: list[int] = [0]
+        i = 0
+        while i < len(commands):
+            if commands[i] != 255:
+                stack[-1] += self.__waves[commands[i]]
+                i += 1
+            elif commands[i + 1] == 0:
+                stack.append(0)
+                i += 2
+            else:
+                body = stack.pop()
+                stack[-1] += body * (commands[i + 2] | commands[i + 3] << 8)
+                i += 4
+        return stack[0]
+
+
+class RecordingDispatcher(EventDispatcher):
+    def __init__(self):
+        super().__init__()
+        self.events: list = []
+
+    def emit_async(self, event):
+        self.events.append(event)
+
+    def of_type(self, event_type: type) -> list:
+        return [e for e in list(self.events) if isinstance(e, event_type)]
+
+
+class ThreadManager:
+    def start_background_task(self, target, *args, **kwargs):
+        thread = threading.Thread(target=target, args=args, kwargs=kwargs, daemon=True)
+        thread.start()
+        return thread
+
+
+@pytest.fixture
+def pi() -> FakePi:
+    return FakePi()
+
+
+@pytest.fixture
+def dispatcher() -> RecordingDispatcher:
+    return RecordingDispatcher()
+
+
+@pytest.fixture
+def thread_manager() -> ThreadManager:
+    return ThreadManager()
@@ -0,0 +1,41 @@
+import time
+
+from servomotor.event.controller_event import ControllerPositionEvent, ControllerSegmentEvent
+from servomotor.scheduler.tick_scheduler import TickScheduler
+from servomotor.tracker.position_tracker import PositionTracker
+
+
+class FakeStepCounter:
+    def __init__(self, count: int = 0):
+        self.count = count
+
+
+def test_counted_position_comes_from_the_step_counter(dispatcher, thread_manager):
+    counter = FakeStepCounter(count=500)  # pulses of earlier motions are not part of this one
+    tracker = PositionTracker(1, dispatcher, thread_manager, TickScheduler(thread_manager), step_counter=counter)
+
+    tracker.begin_motion(current_position=100, forward=False, freq_hz=1000)
+    # Nowhere near 37 steps at 1000 Hz have elapsed, only the counted pulses move the position
+    counter.count += 37
+    assert tracker.position == 63
+
+    time.sleep(0.1)  # an elapsed time estimate would be ~100 steps by now
+    assert tracker.position == 63
+
+    tracker.finish_motion()
+    assert [e.position for e in dispatcher.of_type(ControllerPositionEvent)] == [63]
+
+
+def test_counted_motion_corrects_the_segment_from_the_scheduler(dispatcher, thread_manager):
+    counter = FakeStepCounter()
+    tracker = PositionTracker(1, dispatcher, thread_manager, TickScheduler(thread_manager), step_counter=counter)
+
+    tracker.begin_motion(current_position=0, forward=True, freq_hz=1000)
+    # The motor runs much slower than announced, the scheduled check sends a new segment
+    counter.count += 5
+    time.sleep(PositionTracker.MAX_UPDATE_S)
+    tracker.finish_motion()
+
+    segments = dispatcher.of_type(ControllerSegmentEvent)
+    assert len(segments) >= 2
+    assert segments[-1].freq_hz < 1000
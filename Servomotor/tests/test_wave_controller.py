@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from servomotor.controller.wave_controller import WavePWMController
+from servomotor.dto.controller_status import EMotorStatus
+from servomotor.dto.ramp_dto import ControllerRampDto
+from servomotor.dto.run_cmd_dto import ControllerRunDto
+from servomotor.event.controller_event import ControllerStatusEvent, ControllerStepsEvent
+from servomotor.wave.chain_encoder import ChainEncoder
+
+
+def motor(controller_id: int = 1, steps: int = 2000, freq_hz: int = 1000, gpio_step: int = 20) -> ControllerRunDto:
+    return ControllerRunDto(controller_id=controller_id, steps=steps, freq_hz=freq_hz, direction=True,
+                            gpio_step=gpio_step, gpio_home=5, gpio_direction=21)
+
+
+def test_stop_mid_move_returns_run_without_further_steps(pi, dispatcher, thread_manager):
+    controller = WavePWMController(dispatcher, pi, thread_manager, position_interval_s=0.02)
+    runner = threading.Thread(target=lambda: controller.run(run_cmd=[motor(steps=2000, freq_hz=1000)]))
+    runner.start()
+    time.sleep(0.3)
+
+    stopped_at = time.monotonic()
+    controller.stop()
+    runner.join(timeout=1.0)
+
+    assert not runner.is_alive()
+    assert time.monotonic() - stopped_at < 0.2
+    published = sum(e.steps for e in dispatcher.of_type(ControllerStepsEvent))
+    assert 200 < published < 500
+
+    time.sleep(0.1)
+    assert sum(e.steps for e in dispatcher.of_type(ControllerStepsEvent)) == published
+    assert controller.transmitter.owner is None
+
+
+def test_ramped_move_is_one_chain(pi, dispatcher, thread_manager):
+    controller = WavePWMController(dispatcher, pi, thread_manager)
+    # Both ramps in 16 bands with a cruise in between: 33 loops before unrolling the short ones
+    controller.run(run_cmd=[motor(steps=3000)], feed_hz=4000, ramp=ControllerRampDto(accel=40000))
+
+    assert len(pi.chains) == 1
+    assert ChainEncoder.stats(pi.chains[0]).loops <= ChainEncoder.MAX_CHAIN_LOOPS
+    assert len(pi.chains[0]) <= ChainEncoder.MAX_CHAIN_BYTES
+    assert sum(e.steps for e in dispatcher.of_type(ControllerStepsEvent)) == 3000
+
+
+def test_pipelined_moves_share_chains_until_a_direction_changes(pi, dispatcher, thread_manager):
+    controller = WavePWMController(dispatcher, pi, thread_manager)
+    forward = [motor(steps=100, freq_hz=2000), motor(controller_id=2, steps=50, freq_hz=1000, gpio_step=19)]
+    backward = [ControllerRunDto(controller_id=1, steps=80, freq_hz=2000, direction=False,
+                                 gpio_step=20, gpio_home=5, gpio_direction=21)]
+    stats = controller.run_pipelined([forward, forward, backward])
+
+    assert (stats.moves, stats.chains, len(stats.gaps_us)) == (3, 2, 1)
+    assert len(pi.chains) == 2
+    # Direction of motor 1 goes low right before the second chain
+    bank_writes = [call for call in pi.calls if call[0] in ("set_bank_1", "clear_bank_1")]
+    assert bank_writes[-1] == ("clear_bank_1", (1 << 21,))
+
+    steps_by_motor: dict[int, int] = {}
+    for event in dispatcher.of_type(ControllerStepsEvent):
+        steps_by_motor[event.motor_id] = steps_by_motor.get(event.motor_id, 0) + (event.steps if event.direction else -event.steps)
+    assert steps_by_motor == {1: 120, 2: 100}
+
+
+def test_status_reports_the_planned_rate_of_each_axis(pi, dispatcher, thread_manager):
+    controller = WavePWMController(dispatcher, pi, thread_manager)
+    # Coordinated move of 0.1 s: the axes run at 3000 and 4000 steps/s, whatever their freq_hz
+    controller.run(run_cmd=[motor(steps=300, freq_hz=1000), motor(controller_id=2, steps=400, freq_hz=1000, gpio_step=19)],
+                   feed_hz=5000)
+
+    running = {e.motor_id: e.freq_hz for e in dispatcher.of_type(ControllerStatusEvent) if e.status == EMotorStatus.RUNNING}
+    assert running[1] == pytest.approx(3000, rel=0.01)
+    assert running[2] == pytest.approx(4000, rel=0.01)